@@ -0,0 +1,40 @@
+import argparse
+import asyncio
+
+from beanie import init_beanie
+
+from app.config import get_maintenance_settings
+from app.db_handler.async_db_handler import AsyncDatabaseClient
+from app.models import DOCUMENT_MODELS
+from app.repositories.product_repository import ProductRepository
+from app.repositories.stats_repository import StatsRepository
+
+
+async def rebuild(product_repository: ProductRepository, stats_repository: StatsRepository) -> int:
+    await product_repository.write_type_stats(output_collection=stats_repository.collection_name)
+    product_type_count = len(await stats_repository.fetch_all())
+    print(f"Rebuilt catalogue statistics for {product_type_count} product type(s)")
+    return product_type_count
+
+
+async def main(command: str) -> int:
+    settings = get_maintenance_settings()
+    async_db_client = AsyncDatabaseClient(connection_string=settings.db_async_connection_string)
+    try:
+        await init_beanie(database=async_db_client.db_client.get_database(), document_models=DOCUMENT_MODELS)
+
+        match command:
+            case "rebuild":
+                await rebuild(product_repository=ProductRepository(), stats_repository=StatsRepository())
+                return 0
+            case _:
+                raise ValueError(f"Unknown command: {command}")
+    finally:
+        await async_db_client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the per product type statistics from the products")
+    parser.add_argument("command", choices=["rebuild"])
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(main(command=args.command)))
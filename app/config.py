@@ -1,13 +1,48 @@
 from functools import lru_cache
+from typing import Optional, Literal
 
 from pydantic_settings import BaseSettings
-from pydantic import Field
+from pydantic import Field, model_validator
+
+
+WORKER_POOL_HEADROOM = 4
 
 
 class Settings(BaseSettings):
     secret_key: str
     db_async_connection_string: str = Field(alias="MONGO_DB_CONNECTION_STRING")
     db_sync_connection_string: str = Field(alias="MONGO_DB_CONNECTION_STRING")
+    db_max_pool_size: int = Field(default=20, alias="MONGO_DB_MAX_POOL_SIZE")
+    db_min_pool_size: int = Field(default=0, alias="MONGO_DB_MIN_POOL_SIZE")
+    db_max_idle_time_ms: Optional[int] = Field(default=None, alias="MONGO_DB_MAX_IDLE_TIME_MS")
+    db_connect_timeout_ms: int = Field(default=5000, alias="MONGO_DB_CONNECT_TIMEOUT_MS")
+    db_server_selection_timeout_ms: int = Field(default=5000, alias="MONGO_DB_SERVER_SELECTION_TIMEOUT_MS")
+    db_socket_timeout_ms: Optional[int] = Field(default=None, alias="MONGO_DB_SOCKET_TIMEOUT_MS")
+    db_wait_queue_timeout_ms: Optional[int] = Field(default=None, alias="MONGO_DB_WAIT_QUEUE_TIMEOUT_MS")
+    db_pool_telemetry_enabled: bool = Field(default=True, alias="MONGO_DB_POOL_TELEMETRY_ENABLED")
+    stream_batch_size: int = Field(default=500, alias="STREAM_BATCH_SIZE")
+    product_type_denormalized: bool = Field(default=False, alias="PRODUCT_TYPE_DENORMALIZED")
+    query_diagnostics_enabled: bool = Field(default=False, alias="QUERY_DIAGNOSTICS_ENABLED")
+    query_diagnostics_sample_rate: float = Field(default=0.01, alias="QUERY_DIAGNOSTICS_SAMPLE_RATE")
+    query_diagnostics_max_concurrent_explains: int = Field(
+        default=4,
+        alias="QUERY_DIAGNOSTICS_MAX_CONCURRENT_EXPLAINS"
+    )
+    query_diagnostics_max_shapes: int = Field(default=500, alias="QUERY_DIAGNOSTICS_MAX_SHAPES")
+    cache_enabled: bool = Field(default=True, alias="CACHE_ENABLED")
+    cache_ttl_s: float = Field(default=30.0, alias="CACHE_TTL_S")
+    cache_max_size: int = Field(default=10000, alias="CACHE_MAX_SIZE")
+    live_updates_enabled: bool = Field(default=True, alias="LIVE_UPDATES_ENABLED")
+    live_updates_max_pending_events: int = Field(default=1000, alias="LIVE_UPDATES_MAX_PENDING_EVENTS")
+    live_updates_heartbeat_s: float = Field(default=15.0, alias="LIVE_UPDATES_HEARTBEAT_S")
+    rabbit_mq_host: Optional[str] = Field(default=None, alias="RABBIT_MQ_HOST")
+    rabbit_mq_port: int = Field(default=5672, alias="RABBIT_MQ_PORT")
+    rabbit_mq_user: Optional[str] = Field(default=None, alias="RABBIT_MQ_USER")
+    rabbit_mq_password: Optional[str] = Field(default=None, alias="RABBIT_MQ_PASSWORD")
+    rabbit_mq_entity_changes_exchange_name: str = Field(
+        default="entity_changes",
+        alias="RABBIT_MQ_ENTITY_CHANGES_EXCHANGE_NAME"
+    )
 
     class Config:
         env_file = None
@@ -18,6 +53,18 @@ def get_settings() -> Settings:
     return Settings()
 
 
+class MaintenanceSettings(BaseSettings):
+    db_async_connection_string: str = Field(alias="MONGO_DB_CONNECTION_STRING")
+
+    class Config:
+        env_file = None
+
+
+@lru_cache
+def get_maintenance_settings() -> MaintenanceSettings:
+    return MaintenanceSettings()
+
+
 class WorkerSettings(BaseSettings):
     rabbit_mq_exchange_name: str = Field(alias="RABBIT_MQ_EXCHANGE_NAME")
     rabbit_mq_exchange_name_dlx: str = Field(alias="RABBIT_MQ_EXCHANGE_NAME_DLX")
@@ -26,7 +73,59 @@ class WorkerSettings(BaseSettings):
     rabbit_mq_user: str = Field(alias="RABBIT_MQ_USER")
     rabbit_mq_password: str = Field(alias="RABBIT_MQ_PASSWORD")
     db_async_connection_string: str = Field(alias="MONGO_DB_CONNECTION_STRING")
-    delay_ms_dlx: int = Field(alias="DELAY_MS_DLX")
+    db_max_pool_size: Optional[int] = Field(default=None, alias="WORKER_MONGO_DB_MAX_POOL_SIZE")
+    db_min_pool_size: int = Field(default=0, alias="WORKER_MONGO_DB_MIN_POOL_SIZE")
+    db_max_idle_time_ms: Optional[int] = Field(default=None, alias="WORKER_MONGO_DB_MAX_IDLE_TIME_MS")
+    db_connect_timeout_ms: int = Field(default=5000, alias="WORKER_MONGO_DB_CONNECT_TIMEOUT_MS")
+    db_server_selection_timeout_ms: int = Field(default=5000, alias="WORKER_MONGO_DB_SERVER_SELECTION_TIMEOUT_MS")
+    db_socket_timeout_ms: Optional[int] = Field(default=None, alias="WORKER_MONGO_DB_SOCKET_TIMEOUT_MS")
+    db_wait_queue_timeout_ms: Optional[int] = Field(default=None, alias="WORKER_MONGO_DB_WAIT_QUEUE_TIMEOUT_MS")
+    db_pool_telemetry_enabled: bool = Field(default=True, alias="MONGO_DB_POOL_TELEMETRY_ENABLED")
+    retry_delays_ms: str = Field(default="100,1000,10000,60000", alias="RETRY_DELAYS_MS")
+    prefetch_count: int = Field(default=64, alias="RABBIT_MQ_PREFETCH_COUNT")
+    ack_batch_size: int = Field(default=32, alias="ACK_BATCH_SIZE")
+    ack_flush_interval_ms: int = Field(default=50, alias="ACK_FLUSH_INTERVAL_MS")
+    sync_batch_size: int = Field(default=1, alias="SYNC_BATCH_SIZE")
+    sync_batch_window_ms: int = Field(default=20, alias="SYNC_BATCH_WINDOW_MS")
+    reorder_buffer_size: int = Field(default=32, alias="REORDER_BUFFER_SIZE")
+    reorder_timeout_ms: int = Field(default=250, alias="REORDER_TIMEOUT_MS")
+    product_type_denormalized: bool = Field(default=False, alias="PRODUCT_TYPE_DENORMALIZED")
+    rabbit_mq_entity_changes_exchange_name: str = Field(
+        default="entity_changes",
+        alias="RABBIT_MQ_ENTITY_CHANGES_EXCHANGE_NAME"
+    )
+    partition_count: Optional[int] = Field(default=None, alias="WORKER_PARTITION_COUNT")
+    partitions: Optional[str] = Field(default=None, alias="WORKER_PARTITIONS")
+    partition_hash_header: str = Field(default="x-aggregate-id", alias="PARTITION_HASH_HEADER")
+    durable_queues: bool = Field(default=True, alias="RABBIT_MQ_DURABLE_QUEUES")
+    queue_type: Literal["classic", "quorum"] = Field(default="classic", alias="RABBIT_MQ_QUEUE_TYPE")
+    queue_max_length: Optional[int] = Field(default=None, alias="RABBIT_MQ_QUEUE_MAX_LENGTH")
+    queue_overflow: Literal["drop-head", "reject-publish", "reject-publish-dlx"] = Field(
+        default="reject-publish",
+        alias="RABBIT_MQ_QUEUE_OVERFLOW"
+    )
+    publisher_confirms: bool = Field(default=True, alias="RABBIT_MQ_PUBLISHER_CONFIRMS")
+    max_inflight_publishes: int = Field(default=256, alias="RABBIT_MQ_MAX_INFLIGHT_PUBLISHES")
+    metrics_host: str = Field(default="0.0.0.0", alias="WORKER_METRICS_HOST")
+    metrics_port: Optional[int] = Field(default=9100, alias="WORKER_METRICS_PORT")
+    slow_message_threshold_ms: float = Field(default=500, alias="SLOW_MESSAGE_THRESHOLD_MS")
+    outbox_timestamp_header: str = Field(default="x-outbox-created-at", alias="OUTBOX_TIMESTAMP_HEADER")
+
+    @model_validator(mode="after")
+    def size_pool_from_prefetch(self) -> "WorkerSettings":
+        if self.db_max_pool_size is None:
+            self.db_max_pool_size = self.prefetch_count + WORKER_POOL_HEADROOM
+        return self
+
+    @model_validator(mode="after")
+    def check_prefetch_covers_reorder_buffer(self) -> "WorkerSettings":
+        if self.reorder_buffer_size > 0 and self.prefetch_count < 2 * self.reorder_buffer_size:
+            raise ValueError(
+                f"RABBIT_MQ_PREFETCH_COUNT ({self.prefetch_count}) must be at least twice REORDER_BUFFER_SIZE "
+                f"({self.reorder_buffer_size}): held events stay unacked and pin the ack watermark, so every "
+                f"delivery after them counts against prefetch until the missing versions arrive"
+            )
+        return self
 
     class Config:
         env_file = None
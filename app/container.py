@@ -0,0 +1,96 @@
+from functools import cached_property
+from typing import Optional
+
+from beanie import init_beanie
+
+from app.config import Settings
+from app.db_handler.async_db_handler import AsyncDatabaseClient
+from app.db_handler.base import pool_options
+from app.db_handler.sync_db_handler import SyncDatabaseClient
+from app.db_sync.mq_client import get_entity_changes_mq_client
+from app.models import DOCUMENT_MODELS
+from app.r_services.cache import get_product_cache, get_product_type_cache
+from app.r_services.cache_invalidation import CacheInvalidationListener
+from app.r_services.change_feed import ChangeFeed
+from app.r_services.product_service import ProductService
+from app.r_services.product_type_loader import ProductTypeLoader
+from app.r_services.product_type_service import ProductTypeService
+from app.r_services.stats_service import StatsService
+from app.repositories.product_repository import ProductRepository
+from app.repositories.product_type_repository import ProductTypeRepository
+from app.repositories.query_diagnostics import get_query_diagnostics
+from app.repositories.search_prefix_repository import SearchPrefixRepository
+from app.repositories.stats_repository import StatsRepository
+from app.schemas.db_sync_schema import WorkerTypes
+
+
+class AppContainer:
+    def __init__(self, settings: Settings):
+        self._settings = settings
+        self.async_db_client = AsyncDatabaseClient(
+            connection_string=settings.db_async_connection_string,
+            **pool_options(settings, process_name="api_async")
+        )
+        self.product_cache = get_product_cache()
+        self.product_type_cache = get_product_type_cache()
+        diagnostics = get_query_diagnostics()
+        self.product_repository = ProductRepository(
+            product_type_denormalized=settings.product_type_denormalized,
+            diagnostics=diagnostics
+        )
+        self.product_type_repository = ProductTypeRepository(diagnostics=diagnostics)
+        self.search_prefix_repository = SearchPrefixRepository()
+        self.product_service = ProductService(
+            repository=self.product_repository,
+            cache=self.product_cache,
+            search_prefix_repository=self.search_prefix_repository
+        )
+        self.product_type_service = ProductTypeService(
+            repository=self.product_type_repository,
+            cache=self.product_type_cache,
+            search_prefix_repository=self.search_prefix_repository
+        )
+        self.stats_service = StatsService(
+            stats_repository=StatsRepository(),
+            product_type_repository=self.product_type_repository
+        )
+        self.cache_invalidation_listener: Optional[CacheInvalidationListener] = None
+        self.change_feed: Optional[ChangeFeed] = None
+
+    @cached_property
+    def sync_db_client(self) -> SyncDatabaseClient:
+        return SyncDatabaseClient(
+            connection_string=self._settings.db_sync_connection_string,
+            **pool_options(self._settings, process_name="api_sync")
+        )
+
+    async def start(self) -> None:
+        await init_beanie(database=self.async_db_client.db_client.get_database(), document_models=DOCUMENT_MODELS)
+        await self.async_db_client.warm_up()
+        if self.product_cache is not None or self.product_type_cache is not None:
+            self.cache_invalidation_listener = CacheInvalidationListener(
+                async_mq_client=get_entity_changes_mq_client(settings=self._settings, subscribe=True),
+                product_cache=self.product_cache,
+                product_type_cache=self.product_type_cache
+            )
+            await self.cache_invalidation_listener.start()
+        if self._settings.live_updates_enabled and self._settings.rabbit_mq_host:
+            self.change_feed = ChangeFeed(
+                async_mq_client=get_entity_changes_mq_client(settings=self._settings, subscribe=True),
+                fetchers={
+                    WorkerTypes.Product: self.product_service.fetch_many,
+                    WorkerTypes.ProductType: self.product_type_service.fetch_many
+                },
+                max_pending_events=self._settings.live_updates_max_pending_events,
+                product_type_loader_factory=lambda: ProductTypeLoader(repository=self.product_type_repository)
+            )
+            await self.change_feed.start()
+
+    async def stop(self) -> None:
+        if self.change_feed is not None:
+            await self.change_feed.stop()
+        if self.cache_invalidation_listener is not None:
+            await self.cache_invalidation_listener.stop()
+        await self.async_db_client.close()
+        if "sync_db_client" in self.__dict__:
+            self.sync_db_client.close()
@@ -1,3 +1,5 @@
+import asyncio
+
 from app.db_handler.base import BaseDatabaseClient
 from pymongo import AsyncMongoClient
 from fastapi import Request
@@ -7,10 +9,16 @@ class AsyncDatabaseClient(BaseDatabaseClient[AsyncMongoClient]):
     def _create_client(self) -> AsyncMongoClient:
         return AsyncMongoClient(
             self._connection_uri,
-            maxPoolSize=self._max_pool_size,
-            uuidRepresentation="standard"
+            **self._client_options()
         )
 
+    async def warm_up(self) -> None:
+        admin_database = self._client.admin
+        await asyncio.gather(*(admin_database.command("ping") for _ in range(max(self._min_pool_size, 1))))
+
+    async def close(self) -> None:
+        await self._client.close()
+
 
-def get_sync_db_session(request: Request) -> AsyncMongoClient:
-    return request.app.state.sync_db_handler.db_client
+def get_async_db_session(request: Request) -> AsyncMongoClient:
+    return request.app.state.container.async_db_client.db_client
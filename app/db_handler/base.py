@@ -1,15 +1,37 @@
 from abc import abstractmethod, ABC
-from typing import TypeVar, Generic
-from pymongo import MongoClient, AsyncMongoClient
+from typing import TypeVar, Generic, Optional
+from pymongo import MongoClient, AsyncMongoClient, monitoring
+
+from app.config import Settings, WorkerSettings
+from app.db_handler.pool_telemetry import pool_telemetry_listeners
+from app.metrics import get_metrics_registry
 
 
 ClientType = TypeVar("ClientType", bound=MongoClient | AsyncMongoClient)
 
 
 class BaseDatabaseClient(ABC, Generic[ClientType]):
-    def __init__(self, connection_string: str, pool_size: int = 20):
+    def __init__(
+            self,
+            connection_string: str,
+            pool_size: int = 20,
+            min_pool_size: int = 0,
+            max_idle_time_ms: Optional[int] = None,
+            connect_timeout_ms: Optional[int] = None,
+            server_selection_timeout_ms: Optional[int] = None,
+            socket_timeout_ms: Optional[int] = None,
+            wait_queue_timeout_ms: Optional[int] = None,
+            event_listeners: Optional[list[monitoring._EventListener]] = None
+    ):
         self._connection_uri = connection_string
         self._max_pool_size = pool_size
+        self._min_pool_size = min_pool_size
+        self._max_idle_time_ms = max_idle_time_ms
+        self._connect_timeout_ms = connect_timeout_ms
+        self._server_selection_timeout_ms = server_selection_timeout_ms
+        self._socket_timeout_ms = socket_timeout_ms
+        self._wait_queue_timeout_ms = wait_queue_timeout_ms
+        self._event_listeners = event_listeners
         self._client = self._create_client()
 
     @abstractmethod
@@ -19,3 +41,32 @@ class BaseDatabaseClient(ABC, Generic[ClientType]):
     def db_client(self) -> ClientType:
         return self._client
 
+    def _client_options(self) -> dict:
+        options = {
+            "maxPoolSize": self._max_pool_size,
+            "minPoolSize": self._min_pool_size,
+            "maxIdleTimeMS": self._max_idle_time_ms,
+            "connectTimeoutMS": self._connect_timeout_ms,
+            "serverSelectionTimeoutMS": self._server_selection_timeout_ms,
+            "socketTimeoutMS": self._socket_timeout_ms,
+            "waitQueueTimeoutMS": self._wait_queue_timeout_ms,
+            "event_listeners": self._event_listeners,
+            "uuidRepresentation": "standard"
+        }
+        return {option: value for option, value in options.items() if value is not None}
+
+
+def pool_options(settings: Settings | WorkerSettings, process_name: str) -> dict:
+    return {
+        "pool_size": settings.db_max_pool_size,
+        "min_pool_size": settings.db_min_pool_size,
+        "max_idle_time_ms": settings.db_max_idle_time_ms,
+        "connect_timeout_ms": settings.db_connect_timeout_ms,
+        "server_selection_timeout_ms": settings.db_server_selection_timeout_ms,
+        "socket_timeout_ms": settings.db_socket_timeout_ms,
+        "wait_queue_timeout_ms": settings.db_wait_queue_timeout_ms,
+        "event_listeners": pool_telemetry_listeners(
+            metrics_registry=get_metrics_registry(),
+            process_name=process_name
+        ) if settings.db_pool_telemetry_enabled else None
+    }
@@ -0,0 +1,143 @@
+import threading
+
+from pymongo import monitoring
+
+from app.metrics import MetricsRegistry
+
+
+CHECKOUT_WAIT_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+
+def _address_label(address: tuple) -> str:
+    host, port = address
+    return f"{host}:{port}"
+
+
+class PoolTelemetryListener(monitoring.ConnectionPoolListener):
+    def __init__(self, metrics_registry: MetricsRegistry, process_name: str):
+        self._process_name = process_name
+        self._max_pool_sizes: dict[str, int] = {}
+        self._in_use: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._checkout_wait = metrics_registry.histogram(
+            "mongo_pool_checkout_wait_ms",
+            "Time spent waiting to check out a pooled connection",
+            label_names=("process", "address"),
+            buckets=CHECKOUT_WAIT_BUCKETS_MS
+        )
+        self._checkout_failures = metrics_registry.counter(
+            "mongo_pool_checkout_failures_total",
+            "Connection check outs that failed",
+            label_names=("process", "address", "reason")
+        )
+        self._connections_in_use = metrics_registry.gauge(
+            "mongo_pool_connections_in_use",
+            "Connections currently checked out of the pool",
+            label_names=("process", "address")
+        )
+        self._connections_open = metrics_registry.gauge(
+            "mongo_pool_connections_open",
+            "Connections currently open in the pool",
+            label_names=("process", "address")
+        )
+        self._max_pool_size = metrics_registry.gauge(
+            "mongo_pool_max_size",
+            "Configured maximum pool size",
+            label_names=("process", "address")
+        )
+        self._saturation = metrics_registry.gauge(
+            "mongo_pool_saturation_ratio",
+            "Checked out connections divided by the maximum pool size",
+            label_names=("process", "address")
+        )
+
+    def pool_created(self, event: monitoring.PoolCreatedEvent) -> None:
+        address = _address_label(event.address)
+        max_pool_size = event.options.get("maxPoolSize") or 0
+        self._max_pool_sizes[address] = max_pool_size
+        self._max_pool_size.set(max_pool_size, process=self._process_name, address=address)
+
+    def pool_ready(self, event: monitoring.PoolReadyEvent) -> None:
+        pass
+
+    def pool_cleared(self, event: monitoring.PoolClearedEvent) -> None:
+        pass
+
+    def pool_closed(self, event: monitoring.PoolClosedEvent) -> None:
+        pass
+
+    def connection_created(self, event: monitoring.ConnectionCreatedEvent) -> None:
+        self._connections_open.inc(process=self._process_name, address=_address_label(event.address))
+
+    def connection_ready(self, event: monitoring.ConnectionReadyEvent) -> None:
+        pass
+
+    def connection_closed(self, event: monitoring.ConnectionClosedEvent) -> None:
+        self._connections_open.dec(process=self._process_name, address=_address_label(event.address))
+
+    def connection_check_out_started(self, event: monitoring.ConnectionCheckOutStartedEvent) -> None:
+        pass
+
+    def connection_check_out_failed(self, event: monitoring.ConnectionCheckOutFailedEvent) -> None:
+        address = _address_label(event.address)
+        self._checkout_failures.inc(process=self._process_name, address=address, reason=event.reason)
+        if event.duration is not None:
+            self._checkout_wait.observe(event.duration * 1000, process=self._process_name, address=address)
+
+    def connection_checked_out(self, event: monitoring.ConnectionCheckedOutEvent) -> None:
+        address = _address_label(event.address)
+        if event.duration is not None:
+            self._checkout_wait.observe(event.duration * 1000, process=self._process_name, address=address)
+        self._update_in_use(address, 1)
+
+    def connection_checked_in(self, event: monitoring.ConnectionCheckedInEvent) -> None:
+        self._update_in_use(_address_label(event.address), -1)
+
+    def _update_in_use(self, address: str, delta: int) -> None:
+        with self._lock:
+            in_use = max(self._in_use.get(address, 0) + delta, 0)
+            self._in_use[address] = in_use
+        self._connections_in_use.set(in_use, process=self._process_name, address=address)
+        max_pool_size = self._max_pool_sizes.get(address)
+        if max_pool_size:
+            self._saturation.set(in_use / max_pool_size, process=self._process_name, address=address)
+
+
+class CommandTelemetryListener(monitoring.CommandListener):
+    def __init__(self, metrics_registry: MetricsRegistry, process_name: str):
+        self._process_name = process_name
+        self._command_duration = metrics_registry.histogram(
+            "mongo_command_duration_ms",
+            "Server round trip time per command",
+            label_names=("process", "command")
+        )
+        self._command_failures = metrics_registry.counter(
+            "mongo_command_failures_total",
+            "Commands that returned an error",
+            label_names=("process", "command")
+        )
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        pass
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._command_duration.observe(
+            event.duration_micros / 1000,
+            process=self._process_name,
+            command=event.command_name
+        )
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._command_duration.observe(
+            event.duration_micros / 1000,
+            process=self._process_name,
+            command=event.command_name
+        )
+        self._command_failures.inc(process=self._process_name, command=event.command_name)
+
+
+def pool_telemetry_listeners(metrics_registry: MetricsRegistry, process_name: str) -> list[monitoring._EventListener]:
+    return [
+        PoolTelemetryListener(metrics_registry=metrics_registry, process_name=process_name),
+        CommandTelemetryListener(metrics_registry=metrics_registry, process_name=process_name)
+    ]
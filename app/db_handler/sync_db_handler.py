@@ -7,10 +7,12 @@ class SyncDatabaseClient(BaseDatabaseClient[MongoClient]):
     def _create_client(self) -> MongoClient:
         return MongoClient(
             self._connection_uri,
-            maxPoolSize=self._max_pool_size,
-            uuidRepresentation="standard"
+            **self._client_options()
         )
 
+    def close(self) -> None:
+        self._client.close()
+
 
 def get_sync_db_session(request: Request) -> MongoClient:
-    return request.app.state.sync_db_handler.db_client
+    return request.app.state.container.sync_db_client.db_client
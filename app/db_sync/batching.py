@@ -0,0 +1,115 @@
+import asyncio
+from dataclasses import dataclass, field
+from typing import Optional, Callable, Awaitable
+import uuid as uuid_pkg
+
+from aio_pika.abc import AbstractIncomingMessage
+
+from app.db_sync.tracing import MessageTrace
+from app.repositories.base import VersionedWrite
+from app.schemas.db_sync_schema import OutboxEventDTO, AggregateType
+
+
+@dataclass
+class PendingEvent:
+    message: AbstractIncomingMessage
+    event: OutboxEventDTO
+    trace: Optional[MessageTrace] = None
+
+
+@dataclass
+class FoldedOperation(VersionedWrite):
+    events: list[PendingEvent] = field(default_factory=list)
+
+    @classmethod
+    def from_event(cls, pending: PendingEvent, aggregate_id: uuid_pkg.UUID) -> "FoldedOperation":
+        payload = pending.event.payload
+        event_type = pending.event.event_type
+        return cls(
+            aggregate_id=aggregate_id,
+            event_type=event_type,
+            fields=payload.model_dump(exclude={'id'}, exclude_none=True),
+            base_version=None if event_type == AggregateType.CREATE else payload.entity_version - 1,
+            final_version=payload.entity_version,
+            events=[pending]
+        )
+
+    def absorb(self, pending: PendingEvent) -> bool:
+        payload = pending.event.payload
+        if payload.entity_version != self.final_version + 1:
+            return False
+        match pending.event.event_type:
+            case AggregateType.UPDATE if self.event_type in (AggregateType.CREATE, AggregateType.UPDATE):
+                self.fields.update(payload.model_dump(exclude={'id'}, exclude_none=True))
+            case AggregateType.DELETE if self.event_type == AggregateType.UPDATE:
+                self.event_type = AggregateType.DELETE
+                self.fields = {}
+            case _:
+                return False
+        self.final_version = payload.entity_version
+        self.events.append(pending)
+        return True
+
+
+def fold_events(events: list[PendingEvent]) -> tuple[list[FoldedOperation], list[PendingEvent]]:
+    operations: list[FoldedOperation] = []
+    operations_by_aggregate: dict[uuid_pkg.UUID, FoldedOperation] = {}
+    broken_chains: set[uuid_pkg.UUID] = set()
+    leftovers: list[PendingEvent] = []
+    for pending in events:
+        aggregate_id = getattr(pending.event.payload, "id", None)
+        if aggregate_id is None:
+            operations.append(FoldedOperation.from_event(pending=pending, aggregate_id=uuid_pkg.uuid4()))
+            continue
+        if aggregate_id in broken_chains:
+            leftovers.append(pending)
+            continue
+        operation = operations_by_aggregate.get(aggregate_id)
+        if operation is None:
+            operation = FoldedOperation.from_event(pending=pending, aggregate_id=aggregate_id)
+            operations_by_aggregate[aggregate_id] = operation
+            operations.append(operation)
+        elif not operation.absorb(pending):
+            broken_chains.add(aggregate_id)
+            leftovers.append(pending)
+    return operations, leftovers
+
+
+class EventBatcher:
+    def __init__(
+            self,
+            max_batch_size: int,
+            max_wait_s: float,
+            flush_callback: Callable[[list[PendingEvent]], Awaitable[None]]
+    ):
+        self._max_batch_size = max_batch_size
+        self._max_wait_s = max_wait_s
+        self._flush_callback = flush_callback
+        self._pending: list[PendingEvent] = []
+        self._timer: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+    async def add(self, pending: PendingEvent) -> None:
+        self._pending.append(pending)
+        if len(self._pending) >= self._max_batch_size:
+            self._cancel_timer()
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def flush(self) -> None:
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        async with self._flush_lock:
+            await self._flush_callback(batch)
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self._max_wait_s)
+        self._timer = None
+        await self.flush()
+
+    def _cancel_timer(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
@@ -0,0 +1,31 @@
+import asyncio
+import warnings
+
+from app.db_sync.exceptions import MQException
+from app.db_sync.mq_client import AsyncMQClient
+from app.schemas.db_sync_schema import EntityChangedDTO, EntityChangesDTO
+
+
+class EntityChangePublisher:
+    def __init__(self, async_mq_client: AsyncMQClient):
+        self._async_mq_client = async_mq_client
+
+    async def connect(self) -> None:
+        await self._async_mq_client.connect()
+
+    async def disconnect(self) -> None:
+        await self._async_mq_client.wait_for_publishes()
+        await self._async_mq_client.disconnect()
+
+    async def publish(self, changes: list[EntityChangedDTO]) -> None:
+        if not changes:
+            return
+        confirmation = await self._async_mq_client.publish_pipelined(
+            msg=EntityChangesDTO(changes=changes).model_dump_json()
+        )
+        confirmation.add_done_callback(self._warn_on_failure)
+
+    @staticmethod
+    def _warn_on_failure(confirmation: asyncio.Task) -> None:
+        if not confirmation.cancelled() and isinstance(confirmation.exception(), MQException):
+            warnings.warn(f"Failed to publish entity changes: {confirmation.exception()}")
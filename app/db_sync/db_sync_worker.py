@@ -1,47 +1,357 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+import uuid as uuid_pkg
+
 from aio_pika.abc import AbstractIncomingMessage
 from beanie import init_beanie
 from pydantic import ValidationError
 
 from app.db_handler.async_db_handler import AsyncDatabaseClient
-from app.db_sync.exceptions import VersionConflictError, VersionLowerThenExpected
+from app.db_sync.batching import EventBatcher, PendingEvent, FoldedOperation, fold_events
+from app.db_sync.change_publisher import EntityChangePublisher
+from app.db_sync.dispatcher import PartitionedDispatcher, AckBatcher
+from app.db_sync.exceptions import VersionConflictError, VersionLowerThenExpected, MQException
+from app.db_sync.metrics_server import MetricsServer
 from app.db_sync.mq_client import AsyncMQClient
-from app.models import Product, ProductType
+from app.db_sync.reordering import ReorderBuffer
+from app.db_sync.retries import retry_count, with_retry_count
+from app.db_sync.tracing import SyncPipelineTracer, MessageTrace
+from app.metrics import get_metrics_registry
+from app.models import DOCUMENT_MODELS
 from app.r_services.base import BaseService
+from app.r_services.services_exceptions import DBException
 from app.repositories.repositories_exceptions import NotFoundError
-from app.schemas.db_sync_schema import OutboxEventDTO, AggregateType
+from app.schemas.db_sync_schema import OutboxEventDTO, AggregateType, EntityChangedDTO, WorkerTypes, \
+    get_outbox_event_adapter
 
 import warnings
 
 
+parking_lot_logger = logging.getLogger("app.db_sync.parking_lot")
+
+PARKING_REJECTED_REQUEUE_DELAY_S = 5.0
+
+
 class DBSyncWorker:
-    def __init__(self, service: BaseService, async_mq_client: AsyncMQClient, async_mongo_client: AsyncDatabaseClient):
+    def __init__(
+            self,
+            service: BaseService,
+            aggregate_type: WorkerTypes,
+            async_mq_client: AsyncMQClient,
+            async_mongo_client: AsyncDatabaseClient,
+            change_publisher: Optional[EntityChangePublisher] = None,
+            ack_batch_size: int = 1,
+            ack_flush_interval_ms: int = 50,
+            batch_size: int = 1,
+            batch_window_ms: int = 20,
+            reorder_buffer_size: int = 0,
+            reorder_timeout_ms: int = 250,
+            tracer: Optional[SyncPipelineTracer] = None,
+            metrics_server: Optional[MetricsServer] = None
+    ):
         self._service = service
+        self._aggregate_type = aggregate_type
+        self._event_adapter = get_outbox_event_adapter(aggregate_type)
         self._async_mq_client = async_mq_client
+        self._change_publisher = change_publisher
         self._service_action_registry = {
             AggregateType.CREATE: self._service.create,
             AggregateType.UPDATE: self._service.update,
             AggregateType.DELETE: self._service.delete
         }
         self._async_mongo_client = async_mongo_client
+        self._dispatcher = PartitionedDispatcher()
+        self._ack_batcher = AckBatcher(
+            batch_size=ack_batch_size,
+            flush_interval_s=ack_flush_interval_ms / 1000
+        )
+        self._event_batcher = EventBatcher(
+            max_batch_size=batch_size,
+            max_wait_s=batch_window_ms / 1000,
+            flush_callback=self._apply_batch
+        ) if batch_size > 1 else None
+        self._tracer = tracer or SyncPipelineTracer(
+            metrics_registry=get_metrics_registry(),
+            worker_name=aggregate_type.value
+        )
+        self._metrics_server = metrics_server
+        self._settling: set[asyncio.Task] = set()
+        self._shutting_down = False
+        self._shutdown_complete = asyncio.Event()
+        self._reorder_buffer = ReorderBuffer(
+            max_events=reorder_buffer_size,
+            timeout_s=reorder_timeout_ms / 1000,
+            on_expired=self._dead_letter
+        ) if reorder_buffer_size > 0 else None
 
     async def handle_shutdown_signal(self, sig_name: str):
-        await self._async_mq_client.disconnect()
-
-    async def sync_db(self):
-        async def operation_strategy(message: AbstractIncomingMessage):
-            validated_data = OutboxEventDTO.model_validate_json(message.body)
+        if self._shutting_down:
+            return
+        self._shutting_down = True
+        try:
             try:
-                await self._service_action_registry[validated_data.event_type](validated_data.payload)
-            except (VersionConflictError, NotFoundError):
-                await self._async_mq_client.publish_data(msg=message.body, dead_letter_queue=True)
-            except (VersionLowerThenExpected, ValidationError) as e:
-                warnings.warn(f"{str(e)}, skipping operation")
-            finally:
-                await message.ack()
+                await self._async_mq_client.stop_consuming()
+            except MQException as e:
+                warnings.warn(f"{str(e)}, draining in-flight messages anyway")
+            if self._event_batcher is not None:
+                await self._event_batcher.flush()
+            await self._dispatcher.drain()
+            if self._reorder_buffer is not None:
+                await self._reorder_buffer.expire_all()
+            if self._settling:
+                await asyncio.gather(*self._settling, return_exceptions=True)
+            await self._ack_batcher.stop()
+            if self._change_publisher is not None:
+                await self._change_publisher.disconnect()
+            await self._async_mq_client.disconnect()
+            await self._async_mongo_client.close()
+            if self._metrics_server is not None:
+                await self._metrics_server.stop()
+        finally:
+            self._shutdown_complete.set()
 
+    async def sync_db(self):
+        if self._metrics_server is not None:
+            await self._metrics_server.start()
         await init_beanie(
             database=self._async_mongo_client.db_client.get_database(),
-            document_models=[Product, ProductType]
+            document_models=DOCUMENT_MODELS
         )
+        await self._async_mongo_client.warm_up()
         await self._async_mq_client.connect()
-        await self._async_mq_client.consume_data(operation_strategy)
+        if self._change_publisher is not None:
+            await self._change_publisher.connect()
+        self._ack_batcher.start()
+        try:
+            await self._async_mq_client.consume_data(self._dispatch_message)
+        finally:
+            if self._shutting_down:
+                await self._shutdown_complete.wait()
+
+    async def _dispatch_message(self, message: AbstractIncomingMessage) -> None:
+        trace = self._tracer.start(message)
+        self._ack_batcher.track(message)
+        try:
+            with trace.stage("decode"):
+                validated_data = self._event_adapter.validate_json(message.body)
+        except ValidationError as e:
+            warnings.warn(f"{str(e)}, skipping operation")
+            await self._complete(message=message, trace=trace, outcome="invalid")
+            return
+        trace.event_type = validated_data.event_type.value
+        trace.aggregate_id = self._partition_key(validated_data)
+        trace.mark()
+        if self._event_batcher is not None:
+            await self._event_batcher.add(PendingEvent(message=message, event=validated_data, trace=trace))
+            return
+        self._dispatcher.submit(
+            partition_key=self._partition_key(validated_data),
+            job=lambda: self._process_event(message=message, validated_data=validated_data, trace=trace)
+        )
+
+    async def _process_event(
+            self,
+            message: AbstractIncomingMessage,
+            validated_data: OutboxEventDTO,
+            trace: MessageTrace
+    ) -> None:
+        pending = PendingEvent(message=message, event=validated_data, trace=trace)
+        while pending is not None:
+            pending = await self._apply_event(pending)
+
+    async def _apply_event(self, pending: PendingEvent) -> Optional[PendingEvent]:
+        message, validated_data, trace = pending.message, pending.event, pending.trace
+        trace.record_since_mark("queue_wait")
+        aggregate_id = self._partition_key(validated_data)
+        version = validated_data.payload.entity_version
+        if self._is_ahead(aggregate_id, version) and self._hold(aggregate_id, pending):
+            return None
+        outcome = "applied"
+        try:
+            with trace.stage("write"):
+                result = await self._service_action_registry[validated_data.event_type](validated_data.payload)
+            with trace.stage("publish"):
+                await self._publish_changes([
+                    EntityChangedDTO(
+                        aggregate_type=self._aggregate_type,
+                        event_type=validated_data.event_type,
+                        id=result.id if result is not None else validated_data.payload.id,
+                        entity_version=version
+                    )
+                ])
+        except (VersionConflictError, NotFoundError):
+            outcome = None
+            if not self._hold(aggregate_id, pending):
+                await self._dead_letter(pending)
+        except (VersionLowerThenExpected, ValidationError) as e:
+            outcome = "skipped"
+            warnings.warn(f"{str(e)}, skipping operation")
+        except BaseException:
+            outcome = "failed"
+            raise
+        finally:
+            if outcome is not None:
+                await self._complete(message=message, trace=trace, outcome=outcome)
+        return self._release_next(aggregate_id, version) if outcome == "applied" else None
+
+    async def _dead_letter(self, pending: PendingEvent) -> None:
+        attempt = retry_count(pending.message.headers)
+        with pending.trace.stage("dead_letter"):
+            confirmation = await self._async_mq_client.publish_pipelined(
+                msg=pending.message.body,
+                dead_letter_queue=True,
+                headers=with_retry_count(pending.message.headers, attempt + 1),
+                retry_tier=attempt
+            )
+        parking = attempt >= self._async_mq_client.retry_tiers
+        settling = asyncio.create_task(
+            self._complete_when_confirmed(
+                message=pending.message,
+                trace=pending.trace,
+                confirmation=confirmation,
+                outcome="parked" if parking else "dead_lettered",
+                parking=parking
+            )
+        )
+        self._settling.add(settling)
+        settling.add_done_callback(self._settling.discard)
+
+    def _is_ahead(self, aggregate_id: Optional[uuid_pkg.UUID], version: int) -> bool:
+        return self._reorder_buffer is not None and aggregate_id is not None \
+            and self._reorder_buffer.is_ahead(aggregate_id, version)
+
+    def _hold(self, aggregate_id: Optional[uuid_pkg.UUID], pending: PendingEvent) -> bool:
+        return self._reorder_buffer is not None and aggregate_id is not None \
+            and self._reorder_buffer.hold(aggregate_id, pending)
+
+    def _release_next(self, aggregate_id: Optional[uuid_pkg.UUID], version: int) -> Optional[PendingEvent]:
+        if self._reorder_buffer is None or aggregate_id is None:
+            return None
+        return self._reorder_buffer.applied(aggregate_id, version)
+
+    async def _apply_batch(self, batch: list[PendingEvent]) -> None:
+        foldable, ahead = self._split_ahead(batch)
+        fallback_tasks = [self._submit_single(pending) for pending in ahead]
+        for pending in foldable:
+            pending.trace.record_since_mark("queue_wait")
+        operations, leftovers = fold_events(foldable)
+        write_started_at = time.perf_counter()
+        try:
+            unconfirmed = await self._service.apply_batch(writes=operations)
+        except DBException as e:
+            warnings.warn(f"{str(e)}, falling back to per-event processing")
+            unconfirmed = operations
+        write_ms = (time.perf_counter() - write_started_at) * 1000
+
+        unconfirmed_ids = {id(operation) for operation in unconfirmed}
+        confirmed = [operation for operation in operations if id(operation) not in unconfirmed_ids]
+        publish_started_at = time.perf_counter()
+        await self._publish_changes([self._operation_change(operation) for operation in confirmed])
+        publish_ms = (time.perf_counter() - publish_started_at) * 1000
+        released = []
+        for operation in confirmed:
+            next_pending = self._release_next(self._partition_key(operation.events[-1].event), operation.final_version)
+            if next_pending is not None:
+                released.append(next_pending)
+            for pending in operation.events:
+                pending.trace.record("bulk_write", write_ms)
+                pending.trace.record("publish", publish_ms)
+                await self._complete(message=pending.message, trace=pending.trace, outcome="applied")
+
+        fallback_ids = {id(pending) for pending in leftovers}
+        for operation in unconfirmed:
+            fallback_ids.update(id(pending) for pending in operation.events)
+
+        for pending in foldable:
+            if id(pending) not in fallback_ids:
+                continue
+            pending.trace.record("bulk_write", write_ms)
+            pending.trace.mark()
+            fallback_tasks.append(self._submit_single(pending))
+        for pending in released:
+            fallback_tasks.append(self._submit_single(pending))
+        if fallback_tasks:
+            await asyncio.gather(*fallback_tasks, return_exceptions=True)
+
+    def _split_ahead(self, batch: list[PendingEvent]) -> tuple[list[PendingEvent], list[PendingEvent]]:
+        foldable, ahead = [], []
+        ahead_ids = set()
+        for pending in batch:
+            aggregate_id = self._partition_key(pending.event)
+            if aggregate_id in ahead_ids or self._is_ahead(aggregate_id, pending.event.payload.entity_version):
+                ahead_ids.add(aggregate_id)
+                ahead.append(pending)
+            else:
+                foldable.append(pending)
+        return foldable, ahead
+
+    def _submit_single(self, pending: PendingEvent) -> asyncio.Task:
+        return self._dispatcher.submit(
+            partition_key=self._partition_key(pending.event),
+            job=lambda: self._process_event(
+                message=pending.message,
+                validated_data=pending.event,
+                trace=pending.trace
+            )
+        )
+
+    async def _complete(self, message: AbstractIncomingMessage, trace: MessageTrace, outcome: str) -> None:
+        with trace.stage("ack"):
+            await self._ack_batcher.complete(message)
+        self._tracer.finish(trace=trace, outcome=outcome)
+
+    async def _complete_when_confirmed(
+            self,
+            message: AbstractIncomingMessage,
+            trace: MessageTrace,
+            confirmation: asyncio.Task,
+            outcome: str,
+            parking: bool = False
+    ) -> None:
+        try:
+            await confirmation
+        except MQException as e:
+            if parking:
+                parking_lot_logger.error(
+                    "Parking lot rejected %s for aggregate %s after %d retries (%s), requeueing in %.0fs",
+                    trace.event_type,
+                    trace.aggregate_id,
+                    retry_count(message.headers),
+                    e,
+                    PARKING_REJECTED_REQUEUE_DELAY_S
+                )
+                await asyncio.sleep(PARKING_REJECTED_REQUEUE_DELAY_S)
+                await self._requeue(message=message, trace=trace, error=e, outcome="parking_rejected")
+                return
+            await self._requeue(message=message, trace=trace, error=e)
+            return
+        await self._complete(message=message, trace=trace, outcome=outcome)
+
+    async def _requeue(
+            self,
+            message: AbstractIncomingMessage,
+            trace: MessageTrace,
+            error: MQException,
+            outcome: str = "requeued"
+    ) -> None:
+        warnings.warn(f"{str(error)}, requeueing message")
+        await self._ack_batcher.release(message)
+        self._tracer.finish(trace=trace, outcome=outcome)
+
+    async def _publish_changes(self, changes: list[EntityChangedDTO]) -> None:
+        if self._change_publisher is not None:
+            await self._change_publisher.publish(changes)
+
+    def _operation_change(self, operation: FoldedOperation) -> EntityChangedDTO:
+        return EntityChangedDTO(
+            aggregate_type=self._aggregate_type,
+            event_type=operation.event_type,
+            id=operation.aggregate_id,
+            entity_version=operation.final_version
+        )
+
+    @staticmethod
+    def _partition_key(validated_data: OutboxEventDTO) -> Optional[uuid_pkg.UUID]:
+        return getattr(validated_data.payload, "id", None)
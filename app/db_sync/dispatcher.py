@@ -0,0 +1,137 @@
+import asyncio
+import heapq
+import warnings
+from typing import Hashable, Optional, Callable, Awaitable
+
+from aio_pika.abc import AbstractIncomingMessage
+from aio_pika.exceptions import ChannelInvalidStateError
+
+
+class PartitionedDispatcher:
+    def __init__(self):
+        self._partition_tails: dict[Hashable, asyncio.Task] = {}
+        self._in_flight: set[asyncio.Task] = set()
+
+    def submit(self, partition_key: Optional[Hashable], job: Callable[[], Awaitable[None]]) -> asyncio.Task:
+        previous = self._partition_tails.get(partition_key) if partition_key is not None else None
+        task = asyncio.create_task(self._run_after(previous=previous, job=job))
+        self._in_flight.add(task)
+        if partition_key is not None:
+            self._partition_tails[partition_key] = task
+        task.add_done_callback(lambda done: self._on_done(partition_key=partition_key, task=done))
+        return task
+
+    async def drain(self) -> None:
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    @staticmethod
+    async def _run_after(previous: Optional[asyncio.Task], job: Callable[[], Awaitable[None]]) -> None:
+        if previous is not None:
+            await asyncio.wait([previous])
+        await job()
+
+    def _on_done(self, partition_key: Optional[Hashable], task: asyncio.Task) -> None:
+        self._in_flight.discard(task)
+        if partition_key is not None and self._partition_tails.get(partition_key) is task:
+            del self._partition_tails[partition_key]
+        if not task.cancelled() and task.exception() is not None:
+            warnings.warn(f"Message processing failed: {task.exception()!r}")
+
+
+class AckBatcher:
+    def __init__(self, batch_size: int, flush_interval_s: float):
+        self._batch_size = batch_size
+        self._flush_interval_s = flush_interval_s
+        self._outstanding: dict[int, AbstractIncomingMessage] = {}
+        self._completed: list[int] = []
+        self._completed_messages: dict[int, AbstractIncomingMessage] = {}
+        self._ack_target: Optional[AbstractIncomingMessage] = None
+        self._ackable_count = 0
+        self._acked_up_to = 0
+        self._channel: Optional[object] = None
+        self._flusher: Optional[asyncio.Task] = None
+
+    def track(self, message: AbstractIncomingMessage) -> None:
+        channel = self._channel_of(message)
+        if channel is not self._channel:
+            self._reset(channel)
+        self._outstanding[message.delivery_tag] = message
+
+    async def complete(self, message: AbstractIncomingMessage) -> None:
+        if self._is_stale(message):
+            return
+        delivery_tag = message.delivery_tag
+        self._outstanding.pop(delivery_tag, None)
+        heapq.heappush(self._completed, delivery_tag)
+        self._completed_messages[delivery_tag] = message
+        self._advance_watermark()
+        if self._ackable_count >= self._batch_size:
+            await self.flush()
+
+    async def release(self, message: AbstractIncomingMessage) -> None:
+        if self._is_stale(message):
+            return
+        self._outstanding.pop(message.delivery_tag, None)
+        try:
+            await message.nack(requeue=True)
+        except Exception as e:
+            warnings.warn(f"Failed to requeue delivery {message.delivery_tag}: {e!r}")
+        self._advance_watermark()
+
+    async def flush(self) -> None:
+        target = self._ack_target
+        if target is None or target.delivery_tag <= self._acked_up_to:
+            return
+        self._acked_up_to = target.delivery_tag
+        self._ack_target = None
+        self._ackable_count = 0
+        try:
+            await target.ack(multiple=True)
+        except Exception as e:
+            warnings.warn(f"Failed to ack deliveries up to {target.delivery_tag}: {e!r}")
+
+    def start(self) -> None:
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_periodically())
+
+    async def stop(self) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        await self.flush()
+
+    def _reset(self, channel: Optional[object]) -> None:
+        self._channel = channel
+        self._outstanding.clear()
+        self._completed.clear()
+        self._completed_messages.clear()
+        self._ack_target = None
+        self._ackable_count = 0
+        self._acked_up_to = 0
+
+    def _is_stale(self, message: AbstractIncomingMessage) -> bool:
+        return self._channel_of(message) is not self._channel
+
+    @staticmethod
+    def _channel_of(message: AbstractIncomingMessage) -> Optional[object]:
+        try:
+            return message.channel
+        except ChannelInvalidStateError:
+            return None
+
+    def _advance_watermark(self) -> None:
+        lowest_outstanding = next(iter(self._outstanding), None)
+        while self._completed and (lowest_outstanding is None or self._completed[0] < lowest_outstanding):
+            delivery_tag = heapq.heappop(self._completed)
+            self._ack_target = self._completed_messages.pop(delivery_tag)
+            self._ackable_count += 1
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self._flush_interval_s)
+            await self.flush()
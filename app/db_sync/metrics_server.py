@@ -0,0 +1,46 @@
+import asyncio
+import warnings
+from typing import Optional
+
+from app.metrics import MetricsRegistry, PROMETHEUS_CONTENT_TYPE
+
+
+class MetricsServer:
+    def __init__(self, metrics_registry: MetricsRegistry, host: str, port: int):
+        self._metrics_registry = metrics_registry
+        self._host = host
+        self._port = port
+        self._server: Optional[asyncio.Server] = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle_connection, host=self._host, port=self._port)
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+                await self._respond(writer, "200 OK", PROMETHEUS_CONTENT_TYPE, self._metrics_registry.render())
+            else:
+                await self._respond(writer, "404 Not Found", "text/plain; charset=utf-8", "Not Found\n")
+        except Exception as e:
+            warnings.warn(f"Failed to serve metrics request: {e!r}")
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: str, content_type: str, body: str) -> None:
+        payload = body.encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(payload)}\r\n"
+            f"Connection: close\r\n\r\n".encode("latin-1") + payload
+        )
+        await writer.drain()
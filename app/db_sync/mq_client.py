@@ -1,11 +1,18 @@
 import asyncio
 from enum import Enum
-from typing import Union, Callable, Awaitable
+from typing import Union, Callable, Awaitable, Optional
 import aio_pika
 from aio_pika.abc import AbstractIncomingMessage
-from aio_pika.exceptions import AMQPConnectionError, AMQPChannelError
-from app.config import WorkerSettings
+from aio_pika.exceptions import AMQPConnectionError, AMQPChannelError, DeliveryError
+from app.config import WorkerSettings, Settings
 from app.db_sync.exceptions import MQConsumeException, MQException, MQConnectionException, MQPublishException
+from app.db_sync.partitions import DEFAULT_PARTITION_HASH_HEADER, PARTITION_BINDING_WEIGHT, partition_exchange_name, \
+    partition_queue_name, parse_partitions
+from app.db_sync.retries import PARKING_LOT_SUFFIX, parse_retry_delays
+
+
+PARTITION_EXCHANGE_TYPE = "x-consistent-hash"
+DEFAULT_MAX_INFLIGHT_PUBLISHES = 256
 
 
 class ExchangeType(Enum):
@@ -15,19 +22,42 @@ class ExchangeType(Enum):
     HEADERS = 'headers'
 
 
+class QueueType(Enum):
+    CLASSIC = 'classic'
+    QUORUM = 'quorum'
+
+
+class QueueOverflow(Enum):
+    DROP_HEAD = 'drop-head'
+    REJECT_PUBLISH = 'reject-publish'
+    REJECT_PUBLISH_DLX = 'reject-publish-dlx'
+
+
 class AsyncMQClient:
     def __init__(
             self,
             exchange_type: ExchangeType,
             exchange_name: str,
             routing_key: str,
-            exchange_name_dlx: str,
-            routing_key_dlx: str,
             host: str,
             port: int,
             user: str,
             password: str,
-            delay_ms_dlx: int
+            exchange_name_dlx: Optional[str] = None,
+            routing_key_dlx: Optional[str] = None,
+            retry_delays_ms: Optional[list[int]] = None,
+            prefetch_count: int = 1,
+            bind_queue: bool = True,
+            mandatory_publish: bool = True,
+            partition_count: Optional[int] = None,
+            partitions: Optional[list[int]] = None,
+            partition_hash_header: str = DEFAULT_PARTITION_HASH_HEADER,
+            durable_queues: bool = False,
+            queue_type: QueueType = QueueType.CLASSIC,
+            queue_max_length: Optional[int] = None,
+            queue_overflow: QueueOverflow = QueueOverflow.REJECT_PUBLISH,
+            publisher_confirms: bool = True,
+            max_inflight_publishes: int = DEFAULT_MAX_INFLIGHT_PUBLISHES
     ):
         self._asyncio_event_handler = asyncio.Event()
         self._exchange_type = exchange_type
@@ -39,15 +69,68 @@ class AsyncMQClient:
         self._port = port
         self._user = user
         self._password = password
-        self._delay_ms_dlx = delay_ms_dlx
+        self._retry_delays_ms = retry_delays_ms or []
+        self._prefetch_count = prefetch_count
+        self._bind_queue = bind_queue
+        self._mandatory_publish = mandatory_publish
+        self._partition_count = partition_count
+        self._partitions = partitions if partitions is not None else list(range(partition_count or 0))
+        self._partition_hash_header = partition_hash_header
+        self._durable_queues = durable_queues or partition_count is not None or queue_type == QueueType.QUORUM
+        self._queue_type = queue_type
+        self._queue_max_length = queue_max_length
+        self._queue_overflow = queue_overflow
+        self._publisher_confirms = publisher_confirms
+        self._inflight_window = asyncio.Semaphore(max_inflight_publishes)
+        self._inflight_publishes: set[asyncio.Task] = set()
         self._connection = None
         self._channel = None
         self._exchange = None
         self._queue = None
+        self._partition_queues = []
+        self._consumer_tags: list[tuple] = []
         self._exchange_dlx = None
-        self._queue_dlx = None
+        self._queues_dlx = []
+        self._queue_parked = None
+
+    @property
+    def retry_tiers(self) -> int:
+        return len(self._retry_delays_ms)
 
-    async def publish_data(self, msg: Union[bytes, str], dead_letter_queue: bool = False):
+    @property
+    def partitioned(self) -> bool:
+        return bool(self._partition_count)
+
+    async def publish_pipelined(
+            self,
+            msg: Union[bytes, str],
+            dead_letter_queue: bool = False,
+            headers: Optional[dict] = None,
+            retry_tier: int = 0
+    ) -> asyncio.Task:
+        await self._inflight_window.acquire()
+        confirmation = asyncio.create_task(
+            self.publish_data(msg=msg, dead_letter_queue=dead_letter_queue, headers=headers, retry_tier=retry_tier)
+        )
+        self._inflight_publishes.add(confirmation)
+        confirmation.add_done_callback(self._on_publish_settled)
+        return confirmation
+
+    async def wait_for_publishes(self) -> None:
+        if self._inflight_publishes:
+            await asyncio.gather(*self._inflight_publishes, return_exceptions=True)
+
+    def _on_publish_settled(self, confirmation: asyncio.Task) -> None:
+        self._inflight_publishes.discard(confirmation)
+        self._inflight_window.release()
+
+    async def publish_data(
+            self,
+            msg: Union[bytes, str],
+            dead_letter_queue: bool = False,
+            headers: Optional[dict] = None,
+            retry_tier: int = 0
+    ):
         if self._channel is None or self._channel.is_closed:
             raise MQConnectionException(
                 "Not connected to RabbitMQ. Use 'async with AsyncMQClient(...) as client:'"
@@ -60,20 +143,27 @@ class AsyncMQClient:
         try:
             message = aio_pika.Message(
                 body=msg,
+                headers=headers,
                 delivery_mode=aio_pika.DeliveryMode.PERSISTENT
             )
             if dead_letter_queue:
+                if self._exchange_dlx is None:
+                    raise MQPublishException("Dead letter exchange is not configured for this client")
                 await self._exchange_dlx.publish(
                     message=message,
-                    routing_key=self._routing_key_dlx,
+                    routing_key=self._retry_routing_key(retry_tier),
                     mandatory=True
                 )
             else:
                 await self._exchange.publish(
                     message=message,
                     routing_key=self._routing_key,
-                    mandatory=True
+                    mandatory=self._mandatory_publish
                 )
+        except MQPublishException:
+            raise
+        except DeliveryError as e:
+            raise MQPublishException(f"Broker did not confirm publish: {e}") from e
         except AMQPChannelError as e:
             raise MQPublishException(f"Channel error during publish: {e}") from e
         except AMQPConnectionError as e:
@@ -87,7 +177,8 @@ class AsyncMQClient:
                 "Not connected to RabbitMQ. Use 'async with AsyncMQClient(...) as client:'"
             )
         try:
-            await self._queue.consume(callback_fn)
+            for queue in self._partition_queues or [self._queue]:
+                self._consumer_tags.append((queue, await queue.consume(callback_fn)))
             await self._asyncio_event_handler.wait()
         except AMQPChannelError as e:
             raise MQConsumeException(f"Channel error during consuming data: {e}") from e
@@ -96,16 +187,20 @@ class AsyncMQClient:
         except Exception as e:
             raise MQException(f"Unexpected error during consuming data: {e}") from e
 
+    async def stop_consuming(self) -> None:
+        consumer_tags, self._consumer_tags = self._consumer_tags, []
+        try:
+            for queue, consumer_tag in consumer_tags:
+                await queue.cancel(consumer_tag)
+        except AMQPChannelError as e:
+            raise MQConsumeException(f"Channel error cancelling consumers: {e}") from e
+        except AMQPConnectionError as e:
+            raise MQConnectionException(f"Connection error cancelling consumers: {e}") from e
+
     async def connect(self) -> None:
         try:
-            self._connection = await aio_pika.connect_robust(
-                host=self._host,
-                port=self._port,
-                login=self._user,
-                password=self._password
-            )
-            self._channel = await self._connection.channel()
-            await self._channel.set_qos(prefetch_count=1)
+            await self._open_channel()
+            await self._channel.set_qos(prefetch_count=self._prefetch_count, global_=self.partitioned)
 
             self._exchange = await self._channel.declare_exchange(
                 name=self._exchange_name,
@@ -113,41 +208,68 @@ class AsyncMQClient:
                 durable=True
             )
 
-            self._exchange_dlx = await self._channel.declare_exchange(
-                name=self._exchange_name_dlx,
-                type=self._exchange_type.value,
-                durable=True
-            )
-
-            self._queue = await self._channel.declare_queue(
-                name="",
-                exclusive=True
-            )
-
-            self._queue_dlx = await self._channel.declare_queue(
-                name="",
-                exclusive=True,
-                arguments={
-                    'x-message-ttl': self._delay_ms_dlx,
-                    'x-dead-letter-exchange': self._exchange_name,
-                    'x-dead-letter-routing-key': self._routing_key
-                }
-            )
-
-            await self._queue.bind(
-                exchange=self._exchange,
-                routing_key=self._routing_key
-            )
+            if self._bind_queue and self.partitioned:
+                await self._declare_partitions()
+            elif self._bind_queue and self._durable_queues:
+                self._queue = await self._channel.declare_queue(
+                    name=f"{self._exchange_name}.{self._routing_key}",
+                    durable=True,
+                    arguments=self._queue_arguments({"x-single-active-consumer": True})
+                )
+                await self._queue.bind(
+                    exchange=self._exchange,
+                    routing_key=self._routing_key
+                )
+            elif self._bind_queue:
+                self._queue = await self._channel.declare_queue(
+                    name="",
+                    exclusive=True
+                )
+                await self._queue.bind(
+                    exchange=self._exchange,
+                    routing_key=self._routing_key
+                )
 
-            await self._queue_dlx.bind(
-                exchange=self._exchange_dlx,
-                routing_key=self._routing_key_dlx
-            )
+            if self._exchange_name_dlx:
+                self._exchange_dlx = await self._channel.declare_exchange(
+                    name=self._exchange_name_dlx,
+                    type=self._exchange_type.value,
+                    durable=True
+                )
+                await self._declare_retry_tiers()
         except AMQPConnectionError as e:
             raise MQConnectionException(f"Failed to connect to RabbitMQ: {e}") from e
         except Exception as e:
             raise MQConnectionException(f"Unexpected error connecting to RabbitMQ: {e}") from e
 
+    async def connect_parking_lot(self) -> None:
+        if not self._exchange_name_dlx:
+            raise MQConnectionException("Parking lot is not configured for this client")
+        try:
+            await self._open_channel()
+            self._exchange = await self._channel.get_exchange(name=self._exchange_name, ensure=True)
+            self._queue_parked = await self._channel.declare_queue(
+                name=f"{self._exchange_name_dlx}.{self._retry_routing_key(self.retry_tiers)}",
+                passive=True
+            )
+        except AMQPChannelError as e:
+            await self.disconnect()
+            raise MQConnectionException(f"Parking lot does not exist, start the worker first: {e}") from e
+        except AMQPConnectionError as e:
+            raise MQConnectionException(f"Failed to connect to RabbitMQ: {e}") from e
+
+    async def _open_channel(self) -> None:
+        self._connection = await aio_pika.connect_robust(
+            host=self._host,
+            port=self._port,
+            login=self._user,
+            password=self._password
+        )
+        self._channel = await self._connection.channel(
+            publisher_confirms=self._publisher_confirms,
+            on_return_raises=self._publisher_confirms
+        )
+
     async def disconnect(self):
         try:
             if self._connection and not self._connection.is_closed:
@@ -159,8 +281,82 @@ class AsyncMQClient:
             self._channel = None
             self._exchange = None
             self._queue = None
+            self._partition_queues = []
+            self._consumer_tags = []
+            self._exchange_dlx = None
+            self._queues_dlx = []
+            self._queue_parked = None
             self._asyncio_event_handler.set()
 
+    async def _declare_partitions(self) -> None:
+        partition_exchange = await self._channel.declare_exchange(
+            name=partition_exchange_name(self._exchange_name, self._routing_key),
+            type=PARTITION_EXCHANGE_TYPE,
+            durable=True,
+            arguments={"hash-header": self._partition_hash_header}
+        )
+        await partition_exchange.bind(self._exchange, routing_key=self._routing_key)
+        queues = {}
+        for partition in range(self._partition_count):
+            queue = await self._channel.declare_queue(
+                name=partition_queue_name(self._exchange_name, self._routing_key, partition),
+                durable=True,
+                arguments=self._queue_arguments({"x-single-active-consumer": True})
+            )
+            await queue.bind(exchange=partition_exchange, routing_key=PARTITION_BINDING_WEIGHT)
+            queues[partition] = queue
+        self._partition_queues = [queues[partition] for partition in self._partitions]
+
+    async def _declare_retry_tiers(self) -> None:
+        for retry_tier, delay_ms in enumerate(self._retry_delays_ms):
+            routing_key = self._retry_routing_key(retry_tier)
+            arguments = {
+                'x-message-ttl': delay_ms,
+                'x-dead-letter-exchange': self._exchange_name,
+                'x-dead-letter-routing-key': self._routing_key
+            }
+            queue = await self._channel.declare_queue(
+                name=f"{self._exchange_name_dlx}.{routing_key}" if self._durable_queues else "",
+                exclusive=not self._durable_queues,
+                durable=self._durable_queues,
+                arguments=self._queue_arguments(arguments) if self._durable_queues else arguments
+            )
+            await queue.bind(exchange=self._exchange_dlx, routing_key=routing_key)
+            self._queues_dlx.append(queue)
+
+        routing_key = self._retry_routing_key(self.retry_tiers)
+        self._queue_parked = await self._channel.declare_queue(
+            name=f"{self._exchange_name_dlx}.{routing_key}",
+            durable=True,
+            arguments=self._parking_lot_arguments()
+        )
+        await self._queue_parked.bind(exchange=self._exchange_dlx, routing_key=routing_key)
+
+    def _retry_routing_key(self, retry_tier: int) -> str:
+        if retry_tier >= self.retry_tiers:
+            return f"{self._routing_key_dlx}.{PARKING_LOT_SUFFIX}"
+        return f"{self._routing_key_dlx}.t{retry_tier}"
+
+    async def get_parked(self) -> Optional[AbstractIncomingMessage]:
+        if self._queue_parked is None:
+            raise MQConsumeException("Parking lot is not configured for this client")
+        try:
+            return await self._queue_parked.get(no_ack=False, fail=False)
+        except AMQPChannelError as e:
+            raise MQConsumeException(f"Channel error reading the parking lot: {e}") from e
+        except AMQPConnectionError as e:
+            raise MQConnectionException(f"Connection error reading the parking lot: {e}") from e
+
+    def _parking_lot_arguments(self) -> dict:
+        return {"x-queue-type": self._queue_type.value}
+
+    def _queue_arguments(self, arguments: dict) -> dict:
+        arguments = {**arguments, "x-queue-type": self._queue_type.value}
+        if self._queue_max_length is not None:
+            arguments["x-max-length"] = self._queue_max_length
+            arguments["x-overflow"] = self._queue_overflow.value
+        return arguments
+
 
 def get_async_mq_client(
         settings: WorkerSettings,
@@ -176,7 +372,37 @@ def get_async_mq_client(
         port=settings.rabbit_mq_port,
         user=settings.rabbit_mq_user,
         password=settings.rabbit_mq_password,
-        delay_ms_dlx=settings.delay_ms_dlx,
+        retry_delays_ms=parse_retry_delays(settings.retry_delays_ms),
+        prefetch_count=settings.prefetch_count,
+        partition_count=settings.partition_count,
+        partitions=parse_partitions(
+            spec=settings.partitions,
+            partition_count=settings.partition_count
+        ) if settings.partition_count else None,
+        partition_hash_header=settings.partition_hash_header,
+        durable_queues=settings.durable_queues,
+        queue_type=QueueType(settings.queue_type),
+        queue_max_length=settings.queue_max_length,
+        queue_overflow=QueueOverflow(settings.queue_overflow),
+        publisher_confirms=settings.publisher_confirms,
+        max_inflight_publishes=settings.max_inflight_publishes
+    )
+
+
+def get_entity_changes_mq_client(
+        settings: WorkerSettings | Settings,
+        subscribe: bool
+) -> AsyncMQClient:
+    return AsyncMQClient(
+        exchange_type=ExchangeType.FANOUT,
+        exchange_name=settings.rabbit_mq_entity_changes_exchange_name,
+        routing_key="",
+        host=settings.rabbit_mq_host,
+        port=settings.rabbit_mq_port,
+        user=settings.rabbit_mq_user,
+        password=settings.rabbit_mq_password,
+        bind_queue=subscribe,
+        mandatory_publish=False,
     )
 
 
@@ -0,0 +1,29 @@
+from typing import Optional
+
+
+DEFAULT_PARTITION_HASH_HEADER = "x-aggregate-id"
+PARTITION_BINDING_WEIGHT = "1"
+
+
+def partition_exchange_name(exchange_name: str, routing_key: str) -> str:
+    return f"{exchange_name}.{routing_key}.partitioned"
+
+
+def partition_queue_name(exchange_name: str, routing_key: str, partition: int) -> str:
+    return f"{exchange_name}.{routing_key}.p{partition}"
+
+
+def parse_partitions(spec: Optional[str], partition_count: int) -> list[int]:
+    if not spec:
+        return list(range(partition_count))
+    partitions = sorted({int(partition) for partition in spec.split(",") if partition.strip()})
+    invalid = [partition for partition in partitions if not 0 <= partition < partition_count]
+    if invalid:
+        raise ValueError(f"Partitions {invalid} are outside of 0..{partition_count - 1}")
+    return partitions
+
+
+def split_partitions(partitions: list[int], process_count: int) -> list[list[int]]:
+    if not 0 < process_count <= len(partitions):
+        raise ValueError(f"Cannot spread {len(partitions)} partition(s) over {process_count} process(es)")
+    return [partitions[process_index::process_count] for process_index in range(process_count)]
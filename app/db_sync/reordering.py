@@ -0,0 +1,84 @@
+import asyncio
+from collections import OrderedDict, defaultdict
+from typing import Optional, Callable, Awaitable
+import uuid as uuid_pkg
+
+from app.db_sync.batching import PendingEvent
+
+
+MAX_TRACKED_AGGREGATES = 10000
+
+
+class ReorderBuffer:
+    def __init__(
+            self,
+            max_events: int,
+            timeout_s: float,
+            on_expired: Callable[[PendingEvent], Awaitable[None]]
+    ):
+        self._max_events = max_events
+        self._timeout_s = timeout_s
+        self._on_expired = on_expired
+        self._held: dict[uuid_pkg.UUID, dict[int, PendingEvent]] = defaultdict(dict)
+        self._timers: dict[tuple[uuid_pkg.UUID, int], asyncio.TimerHandle] = {}
+        self._applied_versions: OrderedDict[uuid_pkg.UUID, int] = OrderedDict()
+        self._expiring: set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._timers)
+
+    def is_ahead(self, aggregate_id: uuid_pkg.UUID, version: int) -> bool:
+        applied_version = self._applied_versions.get(aggregate_id)
+        return applied_version is not None and version > applied_version + 1
+
+    def hold(self, aggregate_id: uuid_pkg.UUID, pending: PendingEvent) -> bool:
+        version = pending.event.payload.entity_version
+        if len(self) >= self._max_events or version in self._held[aggregate_id]:
+            return False
+        self._held[aggregate_id][version] = pending
+        self._timers[(aggregate_id, version)] = asyncio.get_running_loop().call_later(
+            self._timeout_s,
+            self._expire,
+            aggregate_id,
+            version
+        )
+        if pending.trace is not None:
+            pending.trace.mark()
+        return True
+
+    def applied(self, aggregate_id: uuid_pkg.UUID, version: int) -> Optional[PendingEvent]:
+        self._applied_versions[aggregate_id] = max(version, self._applied_versions.get(aggregate_id, version))
+        self._applied_versions.move_to_end(aggregate_id)
+        if len(self._applied_versions) > MAX_TRACKED_AGGREGATES:
+            self._applied_versions.popitem(last=False)
+        pending = self._release(aggregate_id, version + 1)
+        if pending is not None and pending.trace is not None:
+            pending.trace.record_since_mark("reorder_wait")
+        return pending
+
+    async def expire_all(self) -> None:
+        for aggregate_id, version in list(self._timers):
+            self._expire(aggregate_id, version)
+        if self._expiring:
+            await asyncio.gather(*self._expiring, return_exceptions=True)
+
+    def _expire(self, aggregate_id: uuid_pkg.UUID, version: int) -> None:
+        pending = self._release(aggregate_id, version)
+        if pending is None:
+            return
+        if pending.trace is not None:
+            pending.trace.record_since_mark("reorder_wait")
+        expiring = asyncio.create_task(self._on_expired(pending))
+        self._expiring.add(expiring)
+        expiring.add_done_callback(self._expiring.discard)
+
+    def _release(self, aggregate_id: uuid_pkg.UUID, version: int) -> Optional[PendingEvent]:
+        timer = self._timers.pop((aggregate_id, version), None)
+        if timer is None:
+            return None
+        timer.cancel()
+        held = self._held[aggregate_id]
+        pending = held.pop(version)
+        if not held:
+            del self._held[aggregate_id]
+        return pending
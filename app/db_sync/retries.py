@@ -0,0 +1,24 @@
+from typing import Optional
+
+
+RETRY_COUNT_HEADER = "x-retry-count"
+PARKING_LOT_SUFFIX = "parked"
+DEFAULT_RETRY_DELAYS_MS = "100,1000,10000,60000"
+
+
+def parse_retry_delays(spec: str) -> list[int]:
+    delays = [int(delay) for delay in spec.split(",") if delay.strip()]
+    if not delays or any(delay <= 0 for delay in delays):
+        raise ValueError(f"Retry delays must be a non-empty list of positive milliseconds, got {spec!r}")
+    return delays
+
+
+def retry_count(headers: Optional[dict]) -> int:
+    try:
+        return max(int((headers or {}).get(RETRY_COUNT_HEADER, 0)), 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def with_retry_count(headers: Optional[dict], count: int) -> dict:
+    return {**(headers or {}), RETRY_COUNT_HEADER: count}
@@ -0,0 +1,150 @@
+import json
+import logging
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Optional, Iterator, Any
+import uuid as uuid_pkg
+
+from aio_pika.abc import AbstractIncomingMessage
+
+from app.metrics import MetricsRegistry
+
+
+slow_message_logger = logging.getLogger("app.db_sync.slow_messages")
+
+DEFAULT_OUTBOX_TIMESTAMP_HEADER = "x-outbox-created-at"
+LAG_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 300000)
+
+
+@dataclass
+class MessageTrace:
+    delivery_tag: int
+    received_at: float
+    outbox_created_at: Optional[float] = None
+    event_type: Optional[str] = None
+    aggregate_id: Optional[uuid_pkg.UUID] = None
+    stages_ms: dict[str, float] = field(default_factory=dict)
+    _marked_at: Optional[float] = None
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - started_at) * 1000)
+
+    def record(self, name: str, duration_ms: float) -> None:
+        self.stages_ms[name] = self.stages_ms.get(name, 0.0) + duration_ms
+
+    def mark(self) -> None:
+        self._marked_at = time.perf_counter()
+
+    def record_since_mark(self, name: str) -> None:
+        if self._marked_at is not None:
+            self.record(name, (time.perf_counter() - self._marked_at) * 1000)
+            self._marked_at = None
+
+    @property
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.received_at) * 1000
+
+
+class SyncPipelineTracer:
+    def __init__(
+            self,
+            metrics_registry: MetricsRegistry,
+            worker_name: str,
+            slow_message_threshold_ms: float = 500,
+            outbox_timestamp_header: str = DEFAULT_OUTBOX_TIMESTAMP_HEADER
+    ):
+        self._worker_name = worker_name
+        self._slow_message_threshold_ms = slow_message_threshold_ms
+        self._outbox_timestamp_header = outbox_timestamp_header
+        self._stage_duration = metrics_registry.histogram(
+            "sync_stage_duration_ms",
+            "Time spent per sync pipeline stage",
+            label_names=("worker", "stage")
+        )
+        self._message_duration = metrics_registry.histogram(
+            "sync_message_duration_ms",
+            "Time from delivery to completion per message",
+            label_names=("worker", "outcome")
+        )
+        self._end_to_end_lag = metrics_registry.histogram(
+            "sync_end_to_end_lag_ms",
+            "Time from the outbox write to completion in the read model",
+            label_names=("worker",),
+            buckets=LAG_BUCKETS_MS
+        )
+        self._messages = metrics_registry.counter(
+            "sync_messages_total",
+            "Processed messages by outcome",
+            label_names=("worker", "outcome")
+        )
+        self._slow_messages = metrics_registry.counter(
+            "sync_slow_messages_total",
+            "Messages slower than the slow message threshold",
+            label_names=("worker",)
+        )
+
+    def start(self, message: AbstractIncomingMessage) -> MessageTrace:
+        return MessageTrace(
+            delivery_tag=message.delivery_tag,
+            received_at=time.perf_counter(),
+            outbox_created_at=self._outbox_created_at(message)
+        )
+
+    def finish(self, trace: MessageTrace, outcome: str) -> None:
+        total_ms = trace.total_ms
+        for stage, duration_ms in trace.stages_ms.items():
+            self._stage_duration.observe(duration_ms, worker=self._worker_name, stage=stage)
+        self._message_duration.observe(total_ms, worker=self._worker_name, outcome=outcome)
+        self._messages.inc(worker=self._worker_name, outcome=outcome)
+        lag_ms = None
+        if trace.outbox_created_at is not None:
+            lag_ms = max(time.time() - trace.outbox_created_at, 0.0) * 1000
+            self._end_to_end_lag.observe(lag_ms, worker=self._worker_name)
+        if total_ms >= self._slow_message_threshold_ms:
+            self._slow_messages.inc(worker=self._worker_name)
+            slow_message_logger.warning(json.dumps({
+                "worker": self._worker_name,
+                "delivery_tag": trace.delivery_tag,
+                "event_type": trace.event_type,
+                "aggregate_id": str(trace.aggregate_id) if trace.aggregate_id else None,
+                "outcome": outcome,
+                "total_ms": round(total_ms, 3),
+                "end_to_end_lag_ms": round(lag_ms, 3) if lag_ms is not None else None,
+                "stages_ms": {stage: round(duration_ms, 3) for stage, duration_ms in trace.stages_ms.items()}
+            }))
+
+    def _outbox_created_at(self, message: AbstractIncomingMessage) -> Optional[float]:
+        header_value = (message.headers or {}).get(self._outbox_timestamp_header)
+        if header_value is not None:
+            return _to_epoch_seconds(header_value)
+        if message.timestamp is not None:
+            return _to_epoch_seconds(message.timestamp)
+        return None
+
+
+def _to_epoch_seconds(value: Any) -> Optional[float]:
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    if isinstance(value, bytes):
+        value = value.decode("utf-8")
+    if isinstance(value, (int, float)):
+        return value / 1000 if value > 1e11 else float(value)
+    if isinstance(value, str):
+        try:
+            return _to_epoch_seconds(float(value))
+        except ValueError:
+            pass
+        try:
+            return _to_epoch_seconds(datetime.fromisoformat(value))
+        except ValueError:
+            return None
+    return None
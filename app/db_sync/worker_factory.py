@@ -1,8 +1,14 @@
+from typing import Optional
+
 from app.db_handler.async_db_handler import AsyncDatabaseClient
+from app.db_sync.change_publisher import EntityChangePublisher
 from app.db_sync.db_sync_worker import DBSyncWorker
+from app.db_sync.metrics_server import MetricsServer
 from app.db_sync.mq_client import AsyncMQClient
+from app.db_sync.tracing import SyncPipelineTracer, DEFAULT_OUTBOX_TIMESTAMP_HEADER
+from app.metrics import get_metrics_registry
 from app.r_services.service_factory import ServiceFactory
-from app.schemas.db_sync_schema import WorkerTypeValue
+from app.schemas.db_sync_schema import WorkerTypeValue, WorkerTypes
 
 
 class WorkerFactory:
@@ -10,11 +16,31 @@ class WorkerFactory:
             self,
             async_mq_client: AsyncMQClient,
             service_factory: ServiceFactory,
-            async_mongo_client: AsyncDatabaseClient
+            async_mongo_client: AsyncDatabaseClient,
+            entity_changes_mq_client: Optional[AsyncMQClient] = None,
+            ack_batch_size: int = 1,
+            ack_flush_interval_ms: int = 50,
+            batch_size: int = 1,
+            batch_window_ms: int = 20,
+            reorder_buffer_size: int = 0,
+            reorder_timeout_ms: int = 250,
+            slow_message_threshold_ms: float = 500,
+            outbox_timestamp_header: str = DEFAULT_OUTBOX_TIMESTAMP_HEADER,
+            metrics_server: Optional[MetricsServer] = None
     ):
         self._service_factory = service_factory
         self._async_mq_client = async_mq_client
         self._async_mongo_client = async_mongo_client
+        self._entity_changes_mq_client = entity_changes_mq_client
+        self._ack_batch_size = ack_batch_size
+        self._ack_flush_interval_ms = ack_flush_interval_ms
+        self._batch_size = batch_size
+        self._batch_window_ms = batch_window_ms
+        self._reorder_buffer_size = reorder_buffer_size
+        self._reorder_timeout_ms = reorder_timeout_ms
+        self._slow_message_threshold_ms = slow_message_threshold_ms
+        self._outbox_timestamp_header = outbox_timestamp_header
+        self._metrics_server = metrics_server
 
     def create_worker(self, worker_type: WorkerTypeValue):
         return DBSyncWorker(
@@ -22,5 +48,22 @@ class WorkerFactory:
             service=self._service_factory.create_service(
                 worker_type=worker_type
             ),
-            async_mongo_client=self._async_mongo_client
+            aggregate_type=WorkerTypes(worker_type),
+            async_mongo_client=self._async_mongo_client,
+            change_publisher=EntityChangePublisher(
+                async_mq_client=self._entity_changes_mq_client
+            ) if self._entity_changes_mq_client is not None else None,
+            ack_batch_size=self._ack_batch_size,
+            ack_flush_interval_ms=self._ack_flush_interval_ms,
+            batch_size=self._batch_size,
+            batch_window_ms=self._batch_window_ms,
+            reorder_buffer_size=self._reorder_buffer_size,
+            reorder_timeout_ms=self._reorder_timeout_ms,
+            tracer=SyncPipelineTracer(
+                metrics_registry=get_metrics_registry(),
+                worker_name=worker_type,
+                slow_message_threshold_ms=self._slow_message_threshold_ms,
+                outbox_timestamp_header=self._outbox_timestamp_header
+            ),
+            metrics_server=self._metrics_server
         )
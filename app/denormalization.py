@@ -0,0 +1,67 @@
+import argparse
+import asyncio
+
+from beanie import init_beanie
+
+from app.config import get_maintenance_settings
+from app.db_handler.async_db_handler import AsyncDatabaseClient
+from app.models import DOCUMENT_MODELS
+from app.repositories.product_repository import ProductRepository
+from app.repositories.product_type_repository import ProductTypeRepository
+
+
+BACKFILL_BATCH_SIZE = 500
+DRIFT_SAMPLE_SIZE = 20
+
+
+async def check(product_repository: ProductRepository) -> int:
+    drifted = 0
+    async for document in product_repository.iterate_snapshot_drift():
+        if drifted < DRIFT_SAMPLE_SIZE:
+            print(f"Product {document['_id']} has stale product type snapshot ({document.get('product_type_id')})")
+        drifted += 1
+    print(f"{drifted} product(s) with stale product type snapshot")
+    return drifted
+
+
+async def backfill(product_repository: ProductRepository, product_type_repository: ProductTypeRepository) -> int:
+    product_type_ids = set()
+    async for document in product_repository.iterate_snapshot_drift():
+        product_type_ids.add(document.get("product_type_id"))
+
+    modified = 0
+    pending_ids = list(product_type_ids)
+    for start in range(0, len(pending_ids), BACKFILL_BATCH_SIZE):
+        batch_ids = pending_ids[start:start + BACKFILL_BATCH_SIZE]
+        snapshots = await product_type_repository.fetch_snapshots(reference_ids=batch_ids)
+        modified += await product_repository.overwrite_product_type_snapshots(
+            snapshots={product_type_id: snapshots.get(product_type_id) for product_type_id in batch_ids}
+        )
+    print(f"Backfilled product type snapshot on {modified} product(s)")
+    return modified
+
+
+async def main(command: str) -> int:
+    settings = get_maintenance_settings()
+    async_db_client = AsyncDatabaseClient(connection_string=settings.db_async_connection_string)
+    try:
+        await init_beanie(database=async_db_client.db_client.get_database(), document_models=DOCUMENT_MODELS)
+
+        product_repository = ProductRepository(product_type_denormalized=True)
+        match command:
+            case "check":
+                return 1 if await check(product_repository=product_repository) else 0
+            case "backfill":
+                await backfill(product_repository=product_repository, product_type_repository=ProductTypeRepository())
+                return 0
+            case _:
+                raise ValueError(f"Unknown command: {command}")
+    finally:
+        await async_db_client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check or backfill denormalized product type snapshots")
+    parser.add_argument("command", choices=["check", "backfill"])
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(main(command=args.command)))
@@ -0,0 +1,81 @@
+import argparse
+import asyncio
+from dataclasses import dataclass
+from typing import Type
+
+from beanie import Document, init_beanie
+from pymongo import IndexModel
+
+from app.config import get_maintenance_settings
+from app.db_handler.async_db_handler import AsyncDatabaseClient
+from app.models import DOCUMENT_MODELS
+
+
+DEFAULT_ID_INDEX = "_id_"
+
+
+@dataclass
+class IndexDrift:
+    collection: str
+    index_name: str
+    problem: str
+
+
+def declared_indexes(model: Type[Document]) -> dict[str, list]:
+    declared = {}
+    for index in model.get_settings().indexes or []:
+        index_model = index.index if hasattr(index, "index") else IndexModel(index)
+        declared[index_model.document["name"]] = list(index_model.document["key"].items())
+    return declared
+
+
+async def report_index_drift(models: list[Type[Document]]) -> list[IndexDrift]:
+    drift = []
+    for model in models:
+        collection = model.get_pymongo_collection()
+        live = {
+            name: details["key"]
+            for name, details in (await collection.index_information()).items()
+            if name != DEFAULT_ID_INDEX
+        }
+        declared = declared_indexes(model)
+        for name, key in declared.items():
+            if name not in live:
+                drift.append(IndexDrift(collection=collection.name, index_name=name, problem="missing"))
+            elif not _is_text_index(live[name]) and list(live[name]) != key:
+                drift.append(
+                    IndexDrift(collection=collection.name, index_name=name, problem=f"key {live[name]} != {key}")
+                )
+        for name in live.keys() - declared.keys():
+            drift.append(IndexDrift(collection=collection.name, index_name=name, problem="not declared"))
+    return drift
+
+
+def _is_text_index(key: list) -> bool:
+    return any(direction == "text" for _, direction in key)
+
+
+async def main(command: str) -> int:
+    settings = get_maintenance_settings()
+    async_db_client = AsyncDatabaseClient(connection_string=settings.db_async_connection_string)
+    try:
+        await init_beanie(
+            database=async_db_client.db_client.get_database(),
+            document_models=DOCUMENT_MODELS,
+            skip_indexes=command == "check"
+        )
+        drift = await report_index_drift(DOCUMENT_MODELS)
+    finally:
+        await async_db_client.close()
+    for entry in drift:
+        print(f"{entry.collection}.{entry.index_name}: {entry.problem}")
+    if not drift:
+        print("Indexes are in sync with model declarations")
+    return 1 if drift else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report or fix index drift against the live database")
+    parser.add_argument("command", choices=["check", "sync"])
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(main(command=args.command)))
@@ -1,16 +1,28 @@
-from beanie import init_beanie
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from starlette.middleware.sessions import SessionMiddleware
 
 from app.config import get_settings
-from app.db_handler.async_db_handler import AsyncDatabaseClient
-from app.models import Product, ProductType
-from app.routers import r_router
-
-app = FastAPI()
+from app.container import AppContainer
+from app.routers import r_router, metrics_router
 
 settings = get_settings()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    container = AppContainer(settings=settings)
+    await container.start()
+    app.state.container = container
+    try:
+        yield
+    finally:
+        await container.stop()
+
+
+app = FastAPI(lifespan=lifespan)
+
 app.add_middleware(
     SessionMiddleware,
     secret_key=settings.secret_key,
@@ -18,12 +30,5 @@ app.add_middleware(
     max_age=3600,
 )
 
-@app.on_event("startup")
-async def startup():
-    async_db_client = AsyncDatabaseClient(
-        connection_string=settings.db_async_connection_string
-    )
-    await init_beanie(database=async_db_client.db_client.get_database(), document_models=[Product, ProductType])
-
-
 app.include_router(r_router)
+app.include_router(metrics_router)
@@ -1,7 +1,10 @@
+from typing import Optional, List, Type
+
 import pymongo
+from pymongo import IndexModel
 from beanie import Document, init_beanie
 import uuid as uuid_pkg
-from pydantic import Field
+from pydantic import BaseModel, Field
 
 
 class ProductType(Document):
@@ -15,10 +18,18 @@ class ProductType(Document):
 
     class Settings:
         indexes = [
-            [("description", pymongo.TEXT)]
+            [("description", pymongo.TEXT)],
+            IndexModel([("name", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)], name="name_id"),
         ]
 
 
+class ProductTypeSnapshot(BaseModel):
+    id: uuid_pkg.UUID = Field(..., description="Id of the embedded product type")
+    name: str = Field(..., description="Name of the product type")
+    description: str = Field(..., description="Description of the product type")
+    entity_version: int = Field(..., description="Version of the embedded product type")
+
+
 class Product(Document):
     id: uuid_pkg.UUID = Field(
         default_factory=uuid_pkg.uuid4,
@@ -29,13 +40,54 @@ class Product(Document):
     quantity: int = Field(..., description="Quantity of products")
     price: float = Field(..., description="Price of single product")
     entity_version: int = Field(..., description="Document version")
+    product_type: Optional[ProductTypeSnapshot] = Field(
+        default=None,
+        description="Denormalized snapshot of related product type"
+    )
+
+    class Settings:
+        indexes = [
+            [("name", pymongo.TEXT)],
+            IndexModel(
+                [("product_type_id", pymongo.ASCENDING), ("price", pymongo.ASCENDING)],
+                name="product_type_id_price"
+            ),
+            IndexModel([("price", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)], name="price_id"),
+            IndexModel([("quantity", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)], name="quantity_id"),
+            IndexModel([("name", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)], name="name_id"),
+        ]
+
+
+class SearchPrefix(Document):
+    id: str = Field(..., primary_key=True, description="Aggregate type and entity id, joined with a colon")
+    aggregate_type: str = Field(..., description="Aggregate type of the indexed entity")
+    entity_id: uuid_pkg.UUID = Field(..., description="Id of the indexed entity")
+    label: str = Field(..., description="Label returned as the suggestion")
+    prefixes: List[str] = Field(..., description="Edge n-grams of every label term")
+    entity_version: int = Field(..., description="Version of the entity the prefixes were built from")
 
     class Settings:
         indexes = [
-            [("name", pymongo.TEXT)]
+            IndexModel(
+                [("aggregate_type", pymongo.ASCENDING), ("prefixes", pymongo.ASCENDING), ("label", pymongo.ASCENDING)],
+                name="aggregate_type_prefixes_label"
+            ),
         ]
 
 
+class ProductTypeStats(Document):
+    id: uuid_pkg.UUID = Field(..., primary_key=True, description="Id of the summarized product type")
+    product_count: int = Field(default=0, description="Number of products of the type")
+    total_quantity: int = Field(default=0, description="Sum of product quantities")
+    price_sum: float = Field(default=0, description="Sum of product prices, used to derive the average")
+    min_price: Optional[float] = Field(default=None, description="Lowest product price")
+    max_price: Optional[float] = Field(default=None, description="Highest product price")
+    bounds_version: int = Field(default=0, description="Bumped on every write that may move the price bounds")
+
+
+DOCUMENT_MODELS: List[Type[Document]] = [Product, ProductType, SearchPrefix, ProductTypeStats]
+
+
 if __name__ == "__main__":
     async def init_db(async_client):
         print(async_client.db_client.get_database())
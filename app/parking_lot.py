@@ -0,0 +1,77 @@
+import argparse
+import asyncio
+from typing import Optional
+
+from aio_pika.abc import AbstractIncomingMessage
+from pydantic import ValidationError
+
+from app.config import get_worker_settings
+from app.db_sync.mq_client import AsyncMQClient, get_async_mq_client
+from app.db_sync.retries import RETRY_COUNT_HEADER, retry_count
+from app.schemas.db_sync_schema import WorkerTypes, get_outbox_event_adapter
+
+
+def describe(message: AbstractIncomingMessage, worker_type: WorkerTypes) -> str:
+    try:
+        event = get_outbox_event_adapter(worker_type).validate_json(message.body)
+    except ValidationError:
+        return f"retries={retry_count(message.headers)} undecodable body={message.body[:200]!r}"
+    return (
+        f"retries={retry_count(message.headers)} {event.event_type.value} "
+        f"id={getattr(event.payload, 'id', None)} entity_version={event.payload.entity_version}"
+    )
+
+
+async def inspect(async_mq_client: AsyncMQClient, worker_type: WorkerTypes, limit: Optional[int]) -> int:
+    inspected = 0
+    while limit is None or inspected < limit:
+        message = await async_mq_client.get_parked()
+        if message is None:
+            break
+        print(describe(message=message, worker_type=worker_type))
+        inspected += 1
+    print(f"Inspected {inspected} parked {worker_type.value} message(s)")
+    return inspected
+
+
+async def replay(async_mq_client: AsyncMQClient, worker_type: WorkerTypes, limit: Optional[int]) -> int:
+    replayed = 0
+    while limit is None or replayed < limit:
+        message = await async_mq_client.get_parked()
+        if message is None:
+            break
+        headers = {key: value for key, value in (message.headers or {}).items() if key != RETRY_COUNT_HEADER}
+        await async_mq_client.publish_data(msg=message.body, headers=headers)
+        await message.ack()
+        replayed += 1
+    print(f"Replayed {replayed} parked {worker_type.value} message(s)")
+    return replayed
+
+
+async def main(command: str, worker_type: WorkerTypes, limit: Optional[int]) -> int:
+    async_mq_client = get_async_mq_client(settings=get_worker_settings(), worker_type=worker_type.value)
+    await async_mq_client.connect_parking_lot()
+    try:
+        match command:
+            case "inspect":
+                await inspect(async_mq_client=async_mq_client, worker_type=worker_type, limit=limit)
+            case "replay":
+                await replay(async_mq_client=async_mq_client, worker_type=worker_type, limit=limit)
+            case _:
+                raise ValueError(f"Unknown command: {command}")
+    finally:
+        await async_mq_client.disconnect()
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or replay sync events parked after their last retry")
+    parser.add_argument("command", choices=["inspect", "replay"])
+    parser.add_argument("worker_type", choices=[member.value for member in WorkerTypes])
+    parser.add_argument("--limit", type=int)
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(main(
+        command=args.command,
+        worker_type=WorkerTypes(args.worker_type),
+        limit=args.limit
+    )))
@@ -1,88 +1,459 @@
 import abc
-from typing import TypeVar, Generic, List, Type
+from dataclasses import dataclass
+from typing import TypeVar, Generic, Type, Optional, AsyncIterator, NoReturn
 import uuid as uuid_pkg
 
 from pydantic import BaseModel
 
 from app.db_sync.exceptions import VersionConflictError, VersionLowerThenExpected
-from app.r_services.services_exceptions import DBException
-from app.repositories.base import BaseRepository
-from app.repositories.repositories_exceptions import DatabaseOperationError
+from app.r_services.cache import EntityCache
+from app.r_services.change_feed import ChangeFeed, Subscription
+from app.r_services.etags import Tagged, EntityVersions, entity_etag, page_etag
+from app.r_services.pagination import encode_cursor, decode_cursor, ID_SORT_FIELD, RELEVANCE_SORT
+from app.r_services.projection import FieldSelection, parse_field_selection, to_projection, output_schema_for, \
+    full_selection
+from app.r_services.services_exceptions import DBException, InvalidSearchError
+from app.repositories.base import BaseRepository, VersionedWrite, TEXT_SCORE_FIELD
+from app.repositories.repositories_exceptions import DatabaseOperationError, NotFoundError
 from app.r_services.filter_builder import MongoCriteriaFilterBuilder
-from app.schemas.base_schemas import FetchDTO, CreateDTO, UpdateDTO, DeleteDTO
+from app.r_services.search_prefixes import label_prefixes, query_prefixes
+from app.repositories.search_prefix_repository import SearchPrefixRepository, IndexedLabel
+from app.schemas.db_sync_schema import AggregateType, WorkerTypes
+from app.schemas.base_schemas import FetchDTO, CreateDTO, UpdateDTO, DeleteDTO, PageOut, SuggestDTO, SuggestionOut, \
+    SuggestionsOut
 
 
 OutputDTOSchema = TypeVar('OutputDTOSchema', bound=BaseModel)
 
 
+@dataclass
+class EntityChange:
+    previous: Optional[dict]
+    current: Optional[dict]
+
+
 class BaseService(abc.ABC, Generic[OutputDTOSchema]):
-    def __init__(self, repository: BaseRepository, output_schema: Type[OutputDTOSchema]):
+    def __init__(
+            self,
+            repository: BaseRepository,
+            output_schema: Type[OutputDTOSchema],
+            aggregate_type: WorkerTypes,
+            cache: Optional[EntityCache[OutputDTOSchema]] = None,
+            search_prefix_repository: Optional[SearchPrefixRepository] = None
+    ):
         self._repository = repository
-        self._query_builder = MongoCriteriaFilterBuilder()
         self._schema_out = output_schema
+        self._aggregate_type = aggregate_type
+        self._cache = cache
+        self._search_prefix_repository = search_prefix_repository
+
+    async def fetch_single_record(
+            self,
+            reference_id: uuid_pkg.UUID,
+            fields: Optional[str] = None
+    ) -> OutputDTOSchema:
+        return (await self.fetch_tagged_record(reference_id=reference_id, fields=fields)).value
+
+    async def fetch_tagged_record(
+            self,
+            reference_id: uuid_pkg.UUID,
+            fields: Optional[str] = None
+    ) -> Tagged[OutputDTOSchema]:
+        selection = parse_field_selection(fields=fields, output_schema=self._schema_out)
+        output_schema = output_schema_for(output_schema=self._schema_out, selection=selection)
+        cached = self._get_cached(reference_id)
+        if cached is not None:
+            return Tagged(
+                value=cached if selection is None else output_schema.model_validate(cached),
+                etag=self._entity_etag(document=cached.model_dump(), selection=selection)
+            )
+        try:
+            fetched_data = await self._repository.fetch_single_record(
+                reference=reference_id,
+                projection=self._with_versions(projection=self._projection(selection), selection=selection),
+                **self._read_options(selection)
+            )
+            [fetched_data] = await self._resolve_related(entities=[fetched_data], selection=selection)
+            etag = self._entity_etag(document=fetched_data, selection=selection)
+            if selection is not None:
+                return Tagged(value=output_schema.model_validate(fetched_data), etag=etag)
+            return Tagged(value=self._cache_result(self._schema_out.model_validate(fetched_data)), etag=etag)
+        except DatabaseOperationError as e:
+            raise DBException(e) from e
 
-    async def fetch_single_record(self, reference_id: uuid_pkg.UUID) -> OutputDTOSchema:
+    async def fetch_etag(self, reference_id: uuid_pkg.UUID, fields: Optional[str] = None) -> str:
+        selection = parse_field_selection(fields=fields, output_schema=self._schema_out)
+        cached = self._get_cached(reference_id)
+        if cached is not None:
+            return self._entity_etag(document=cached.model_dump(), selection=selection)
         try:
-            fetched_data = await self._repository.fetch_single_record(reference=reference_id)
-            return self._schema_out.model_validate(fetched_data)
+            document = await self._repository.fetch_single_record(
+                reference=reference_id,
+                projection=self._version_projection(selection),
+                **self._read_options(selection)
+            )
+            [document] = await self._resolve_related(entities=[document], selection=selection)
+            return self._entity_etag(document=document, selection=selection)
         except DatabaseOperationError as e:
             raise DBException(e) from e
 
-    async def fetch(self, filter_data: FetchDTO) -> List[OutputDTOSchema]:
+    async def fetch(self, filter_data: FetchDTO) -> PageOut[OutputDTOSchema]:
+        return (await self.fetch_tagged(filter_data=filter_data)).value
+
+    async def fetch_tagged(self, filter_data: FetchDTO) -> Tagged[PageOut[OutputDTOSchema]]:
+        selection = self._parse_fetch_selection(filter_data)
         search_criteria = await self._build_search_criteria(data=filter_data)
         try:
-            fetched_data_list = await self._repository.fetch(filter_data=search_criteria.query)
-            return [self._schema_out.model_validate(fetched_data) for fetched_data in fetched_data_list]
+            fetched_data_list = await self._repository.fetch(
+                filter_data=search_criteria.query,
+                sort=search_criteria.sort,
+                limit=search_criteria.limit,
+                projection=self._with_versions(projection=self._projection(selection), selection=selection),
+                rank_by_text_score=search_criteria.rank_by_text_score,
+                ranked_keyset=search_criteria.ranked_keyset,
+                **self._read_options(selection)
+            )
+            fetched_data_list = await self._resolve_related(entities=fetched_data_list, selection=selection)
+            return Tagged(
+                value=self._build_page(
+                    fetched_data_list=fetched_data_list,
+                    filter_data=filter_data,
+                    output_schema=output_schema_for(output_schema=self._schema_out, selection=selection)
+                ),
+                etag=self._page_etag(documents=fetched_data_list, filter_data=filter_data, selection=selection)
+            )
+        except DatabaseOperationError as e:
+            raise DBException(e) from e
+
+    async def fetch_page_etag(self, filter_data: FetchDTO) -> str:
+        selection = self._parse_fetch_selection(filter_data)
+        search_criteria = await self._build_search_criteria(data=filter_data)
+        try:
+            documents = await self._repository.fetch(
+                filter_data=search_criteria.query,
+                sort=search_criteria.sort,
+                limit=search_criteria.limit,
+                projection=self._version_projection(selection),
+                rank_by_text_score=search_criteria.rank_by_text_score,
+                ranked_keyset=search_criteria.ranked_keyset,
+                **self._read_options(selection)
+            )
+            documents = await self._resolve_related(entities=documents, selection=selection)
+            return self._page_etag(documents=documents, filter_data=filter_data, selection=selection)
         except DatabaseOperationError as e:
             raise DBException(e) from e
 
+    async def stream(self, filter_data: FetchDTO, batch_size: Optional[int] = None) -> AsyncIterator[OutputDTOSchema]:
+        selection = self._parse_fetch_selection(filter_data)
+        search_criteria = await self._build_search_criteria(data=filter_data)
+        return self._validate_stream(
+            self._resolve_related_stream(
+                entities=self._repository.iterate(
+                    filter_data=search_criteria.query,
+                    sort=search_criteria.sort,
+                    batch_size=batch_size,
+                    projection=self._projection(selection),
+                    rank_by_text_score=search_criteria.rank_by_text_score,
+                    ranked_keyset=search_criteria.ranked_keyset,
+                    **self._read_options(selection)
+                ),
+                selection=selection,
+                batch_size=batch_size
+            ),
+            output_schema=output_schema_for(output_schema=self._schema_out, selection=selection)
+        )
+
+    async def fetch_many(self, reference_ids: list[uuid_pkg.UUID]) -> list[OutputDTOSchema]:
+        try:
+            documents = await self._repository.fetch(
+                filter_data={"_id": {"$in": reference_ids}},
+                projection=self._projection(None),
+                **self._read_options(None)
+            )
+            documents = await self._resolve_related(entities=documents, selection=None)
+        except NotFoundError:
+            return []
+        except DatabaseOperationError as e:
+            raise DBException(e) from e
+        return [self._schema_out.model_validate(document) for document in documents]
+
+    def subscribe(self, change_feed: ChangeFeed, filter_data: FetchDTO) -> Subscription:
+        selection = parse_field_selection(fields=filter_data.fields, output_schema=self._schema_out)
+        return change_feed.subscribe(
+            aggregate_type=self._aggregate_type,
+            matches=lambda entity: self.matches(filter_data=filter_data, entity=entity),
+            output_schema=output_schema_for(output_schema=self._schema_out, selection=selection)
+        )
+
+    async def suggest(self, data: SuggestDTO) -> SuggestionsOut:
+        prefixes = query_prefixes(data.q)
+        if self._search_prefix_repository is None or not prefixes:
+            return SuggestionsOut(items=[])
+        try:
+            suggestions = await self._search_prefix_repository.suggest(
+                aggregate_type=self._aggregate_type.value,
+                prefixes=prefixes,
+                limit=data.limit
+            )
+        except DatabaseOperationError as e:
+            raise DBException(e) from e
+        return SuggestionsOut(
+            items=[SuggestionOut(id=suggestion["entity_id"], name=suggestion["label"]) for suggestion in suggestions]
+        )
+
     async def update(self, data: UpdateDTO) -> OutputDTOSchema:
         try:
-            await self._verify_aggregate_version(
-                reference_id=data.id,
-                expected_version=data.entity_version
+            fields = data.model_dump(
+                exclude={'id'},
+                exclude_none=True
             )
-            updated_document = await self._repository.update(
+            await self._prepare_writes([fields])
+            updated = await self._repository.update(
                 reference_id=data.id,
-                data=data.model_dump(
-                    exclude={'id'},
-                    exclude_none=True
-                )
+                data=fields,
+                expected_version=data.entity_version
             )
+            if updated is None:
+                await self._raise_version_mismatch(reference_id=data.id, expected_version=data.entity_version)
+            previous_document, updated_document = updated
+            await self._record_changes([EntityChange(previous=previous_document, current={**previous_document, **fields})])
+            if "name" in fields:
+                await self._index_labels([
+                    self._indexed_label(
+                        entity_id=updated_document.id,
+                        label=updated_document.name,
+                        entity_version=updated_document.entity_version
+                    )
+                ])
             return self._schema_out.model_validate(updated_document)
         except DatabaseOperationError as e:
             raise DBException(e) from e
 
     async def delete(self, data: DeleteDTO) -> None:
         try:
-            await self._verify_aggregate_version(
-                reference_id=data.id,
-                expected_version=data.entity_version
-            )
-            await self._repository.delete(reference_id=data.id)
+            deleted_document = await self._repository.delete(reference_id=data.id, expected_version=data.entity_version)
+            if deleted_document is None:
+                await self._raise_version_mismatch(reference_id=data.id, expected_version=data.entity_version)
+            await self._record_changes([EntityChange(previous=deleted_document, current=None)])
+            await self._unindex_labels([data.id])
         except DatabaseOperationError as e:
             raise DBException(e) from e
 
     async def create(self, data: CreateDTO) -> OutputDTOSchema:
         try:
-            added_document = await self._repository.create(data=data.model_dump())
+            fields = data.model_dump(exclude_none=True)
+            await self._prepare_writes([fields])
+            added_document = await self._repository.create(data=fields)
+            await self._record_changes([EntityChange(previous=None, current=fields)])
+            await self._index_labels([
+                self._indexed_label(
+                    entity_id=added_document.id,
+                    label=added_document.name,
+                    entity_version=added_document.entity_version
+                )
+            ])
             return self._schema_out.model_validate(added_document)
         except DatabaseOperationError as e:
             raise DBException(e) from e
 
-    async def _verify_aggregate_version(self, reference_id: uuid_pkg.UUID, expected_version: int) -> None:
-        if expected_version is None:
-            raise ValueError("Missing version in payload")
+    async def apply_batch(self, writes: list[VersionedWrite]) -> list[VersionedWrite]:
+        try:
+            await self._prepare_writes([write.fields for write in writes if write.event_type != AggregateType.DELETE])
+            change_projection = self._change_projection()
+            previous_documents = await self._repository.fetch_fields(
+                reference_ids=[write.aggregate_id for write in writes],
+                projection=change_projection
+            ) if change_projection is not None else {}
+            unconfirmed = await self._repository.bulk_apply(writes=writes)
+            unconfirmed_ids = {id(write) for write in unconfirmed}
+            confirmed = [write for write in writes if id(write) not in unconfirmed_ids]
+            if change_projection is not None:
+                await self._record_changes([
+                    change for change in (
+                        self._batch_change(write=write, previous_document=previous_documents.get(write.aggregate_id))
+                        for write in confirmed
+                    )
+                    if change is not None
+                ])
+            await self._index_labels([
+                self._indexed_label(
+                    entity_id=write.aggregate_id,
+                    label=write.fields["name"],
+                    entity_version=write.final_version
+                )
+                for write in confirmed
+                if write.event_type != AggregateType.DELETE and "name" in write.fields
+            ])
+            await self._unindex_labels([
+                write.aggregate_id for write in confirmed if write.event_type == AggregateType.DELETE
+            ])
+            return unconfirmed
+        except DatabaseOperationError as e:
+            raise DBException(e) from e
+
+    async def _prepare_writes(self, field_sets: list[dict]) -> None:
+        return None
+
+    def _change_projection(self) -> Optional[dict]:
+        return None
+
+    async def _record_changes(self, changes: list[EntityChange]) -> None:
+        return None
+
+    @staticmethod
+    def _batch_change(write: VersionedWrite, previous_document: Optional[dict]) -> Optional[EntityChange]:
+        if write.event_type == AggregateType.CREATE:
+            return EntityChange(previous=None, current=write.fields) if previous_document is None else None
+        if previous_document is None or previous_document.get("entity_version") != write.base_version:
+            return None
+        if write.event_type == AggregateType.DELETE:
+            return EntityChange(previous=previous_document, current=None)
+        return EntityChange(previous=previous_document, current={**previous_document, **write.fields})
+
+    async def _index_labels(self, labels: list[IndexedLabel]) -> None:
+        if self._search_prefix_repository is not None:
+            await self._search_prefix_repository.sync(aggregate_type=self._aggregate_type.value, labels=labels)
+
+    async def _unindex_labels(self, entity_ids: list[uuid_pkg.UUID]) -> None:
+        if self._search_prefix_repository is not None:
+            await self._search_prefix_repository.remove(aggregate_type=self._aggregate_type.value, entity_ids=entity_ids)
+
+    @staticmethod
+    def _indexed_label(entity_id: uuid_pkg.UUID, label: str, entity_version: int) -> IndexedLabel:
+        return IndexedLabel(
+            entity_id=entity_id,
+            label=label,
+            prefixes=label_prefixes(label),
+            entity_version=entity_version
+        )
+
+    def _read_options(self, selection: Optional[FieldSelection]) -> dict:
+        return {}
+
+    async def _resolve_related(self, entities: list, selection: Optional[FieldSelection]) -> list:
+        return entities
+
+    def _resolve_related_stream(
+            self,
+            entities: AsyncIterator,
+            selection: Optional[FieldSelection],
+            batch_size: Optional[int] = None
+    ) -> AsyncIterator:
+        return entities
+
+    def _projection(self, selection: Optional[FieldSelection]) -> dict:
+        return to_projection(selection if selection is not None else full_selection(self._schema_out))
 
-        current = await self.fetch_single_record(reference_id)
-        if not current or current.entity_version + 1 < expected_version:
+    def _version_projection(self, selection: Optional[FieldSelection]) -> dict:
+        return {"id": 1, "entity_version": 1}
+
+    def _with_versions(self, projection: dict, selection: Optional[FieldSelection]) -> dict:
+        merged = dict(projection)
+        for path in self._version_projection(selection):
+            if path.partition(".")[0] not in merged:
+                merged[path] = 1
+        return merged
+
+    def _document_versions(self, document: dict, selection: Optional[FieldSelection]) -> EntityVersions:
+        return (document["entity_version"],)
+
+    def _entity_etag(self, document: dict, selection: Optional[FieldSelection]) -> str:
+        return entity_etag(
+            reference_id=document["id"],
+            versions=self._document_versions(document=document, selection=selection),
+            selection=selection
+        )
+
+    def _page_etag(self, documents: list[dict], filter_data: FetchDTO, selection: Optional[FieldSelection]) -> str:
+        return page_etag(
+            filter_data=filter_data,
+            page_versions=[
+                (document["id"], self._document_versions(document=document, selection=selection))
+                for document in documents
+            ]
+        )
+
+    def _parse_fetch_selection(self, filter_data: FetchDTO) -> Optional[FieldSelection]:
+        return parse_field_selection(
+            fields=filter_data.fields,
+            output_schema=self._schema_out,
+            required=("id", filter_data.sort_by)
+        )
+
+    async def _raise_version_mismatch(self, reference_id: uuid_pkg.UUID, expected_version: int) -> NoReturn:
+        current_version = await self._repository.fetch_version(reference_id=reference_id)
+        if current_version is None:
+            raise NotFoundError(reference_id)
+        if current_version + 1 <= expected_version:
             raise VersionConflictError(
-                f"Expected {expected_version}, got {current.entity_version}"
-            )
-        elif current.entity_version + 1 > expected_version:
-            raise VersionLowerThenExpected(
-                f"Expected {expected_version} is lower than {current.entity_version}, something is wrong!"
+                f"Expected {expected_version}, got {current_version}"
             )
+        raise VersionLowerThenExpected(
+            f"Expected {expected_version} is lower than {current_version}, something is wrong!"
+        )
+
+    def _get_cached(self, reference_id: uuid_pkg.UUID) -> Optional[OutputDTOSchema]:
+        if self._cache is None:
+            return None
+        return self._cache.get(reference_id)
+
+    def _cache_result(self, result: OutputDTOSchema) -> OutputDTOSchema:
+        if self._cache is not None:
+            self._cache.put(key=result.id, value=result, version=result.entity_version)
+        return result
+
+    @staticmethod
+    def _add_pagination(query_builder: MongoCriteriaFilterBuilder, data: FetchDTO) -> None:
+        if data.sort_by == RELEVANCE_SORT:
+            if not query_builder.has_text_search:
+                raise InvalidSearchError("Sorting by relevance requires a text search term")
+            if data.after:
+                last_score, last_id = decode_cursor(cursor=data.after, sort_field=TEXT_SCORE_FIELD)
+                query_builder.add_score_keyset_after(score_field=TEXT_SCORE_FIELD, last_score=last_score, last_id=last_id)
+            query_builder.set_text_score_sort(score_field=TEXT_SCORE_FIELD)
+            query_builder.set_limit(data.limit + 1)
+            return
+        sort_field = data.sort_by or ID_SORT_FIELD
+        if data.after:
+            last_value, last_id = decode_cursor(cursor=data.after, sort_field=sort_field)
+            query_builder.add_keyset_after(sort_field=sort_field, last_value=last_value, last_id=last_id)
+        query_builder.set_sort(sort_field)
+        query_builder.set_limit(data.limit + 1)
+
+    def _build_page(
+            self,
+            fetched_data_list: list,
+            filter_data: FetchDTO,
+            output_schema: Type[BaseModel]
+    ) -> PageOut[OutputDTOSchema]:
+        items = [output_schema.model_validate(fetched_data) for fetched_data in fetched_data_list]
+        next_cursor = None
+        if len(items) > filter_data.limit:
+            items = items[:filter_data.limit]
+            last_item = items[-1]
+            sort_field = filter_data.sort_by or ID_SORT_FIELD
+            if sort_field == RELEVANCE_SORT:
+                sort_field = TEXT_SCORE_FIELD
+                sort_value = fetched_data_list[filter_data.limit - 1][TEXT_SCORE_FIELD]
+            else:
+                sort_value = None if sort_field == ID_SORT_FIELD else getattr(last_item, sort_field)
+            next_cursor = encode_cursor(sort_field=sort_field, sort_value=sort_value, reference_id=last_item.id)
+        return PageOut[output_schema](items=items, next_cursor=next_cursor)
+
+    async def _validate_stream(
+            self,
+            entities: AsyncIterator,
+            output_schema: Type[BaseModel]
+    ) -> AsyncIterator[OutputDTOSchema]:
+        try:
+            async for entity in entities:
+                yield output_schema.model_validate(entity)
+        except DatabaseOperationError as e:
+            raise DBException(e) from e
+
+    @abc.abstractmethod
+    def matches(self, filter_data: FetchDTO, entity: OutputDTOSchema) -> bool:
+        raise NotImplementedError
 
     @abc.abstractmethod
     async def _build_search_criteria(self, data: BaseModel):
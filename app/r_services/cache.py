@@ -0,0 +1,75 @@
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import TypeVar, Generic, Optional, Callable
+import uuid as uuid_pkg
+
+from app.config import get_settings
+from app.schemas.product_schemas import ProductOut
+from app.schemas.product_type_schemas import ProductTypeOut
+
+
+CachedValue = TypeVar('CachedValue')
+
+
+class EntityCache(Generic[CachedValue]):
+    def __init__(self, max_size: int, ttl_s: float):
+        self._max_size = max_size
+        self._ttl_s = ttl_s
+        self._entries: OrderedDict[uuid_pkg.UUID, tuple[float, int, CachedValue]] = OrderedDict()
+        self._version_watermarks: OrderedDict[uuid_pkg.UUID, int] = OrderedDict()
+
+    def get(self, key: uuid_pkg.UUID) -> Optional[CachedValue]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, _, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: uuid_pkg.UUID, value: CachedValue, version: int) -> None:
+        if version < self._version_watermarks.get(key, version):
+            return
+        self._entries[key] = (time.monotonic() + self._ttl_s, version, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: uuid_pkg.UUID, version: int) -> None:
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] < version:
+            del self._entries[key]
+        self._version_watermarks[key] = max(version, self._version_watermarks.get(key, version))
+        self._version_watermarks.move_to_end(key)
+        while len(self._version_watermarks) > self._max_size:
+            self._version_watermarks.popitem(last=False)
+
+    def invalidate_where(self, predicate: Callable[[CachedValue], bool]) -> None:
+        for key in [key for key, (_, _, value) in self._entries.items() if predicate(value)]:
+            del self._entries[key]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+@lru_cache
+def get_product_cache() -> Optional[EntityCache[ProductOut]]:
+    return _entity_cache()
+
+
+@lru_cache
+def get_product_type_cache() -> Optional[EntityCache[ProductTypeOut]]:
+    return _entity_cache()
+
+
+def _entity_cache() -> Optional[EntityCache]:
+    settings = get_settings()
+    if not settings.cache_enabled or not settings.rabbit_mq_host:
+        return None
+    return EntityCache(max_size=settings.cache_max_size, ttl_s=settings.cache_ttl_s)
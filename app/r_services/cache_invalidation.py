@@ -0,0 +1,56 @@
+import asyncio
+import warnings
+from typing import Optional
+
+from aio_pika.abc import AbstractIncomingMessage
+from pydantic import ValidationError
+
+from app.db_sync.exceptions import MQException
+from app.db_sync.mq_client import AsyncMQClient
+from app.r_services.cache import EntityCache
+from app.schemas.db_sync_schema import EntityChangesDTO, EntityChangedDTO, WorkerTypes
+from app.schemas.product_schemas import ProductOut
+from app.schemas.product_type_schemas import ProductTypeOut
+
+
+class CacheInvalidationListener:
+    def __init__(
+            self,
+            async_mq_client: AsyncMQClient,
+            product_cache: EntityCache[ProductOut],
+            product_type_cache: EntityCache[ProductTypeOut]
+    ):
+        self._async_mq_client = async_mq_client
+        self._product_cache = product_cache
+        self._product_type_cache = product_type_cache
+        self._consumer_task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        await self._async_mq_client.connect()
+        self._consumer_task = asyncio.create_task(self._async_mq_client.consume_data(self._on_message))
+
+    async def stop(self) -> None:
+        await self._async_mq_client.disconnect()
+        if self._consumer_task is not None:
+            try:
+                await self._consumer_task
+            except MQException as e:
+                warnings.warn(f"Cache invalidation consumer stopped with error: {e}")
+            self._consumer_task = None
+
+    def apply(self, change: EntityChangedDTO) -> None:
+        match change.aggregate_type:
+            case WorkerTypes.Product:
+                self._product_cache.invalidate(key=change.id, version=change.entity_version)
+            case WorkerTypes.ProductType:
+                self._product_type_cache.invalidate(key=change.id, version=change.entity_version)
+                self._product_cache.invalidate_where(lambda product: product.product_type_id == change.id)
+
+    async def _on_message(self, message: AbstractIncomingMessage) -> None:
+        try:
+            for change in EntityChangesDTO.model_validate_json(message.body).changes:
+                self.apply(change)
+        except ValidationError as e:
+            warnings.warn(f"{str(e)}, skipping invalidation")
+        finally:
+            await message.ack()
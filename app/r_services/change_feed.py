@@ -0,0 +1,224 @@
+import asyncio
+import logging
+import warnings
+from collections import defaultdict
+from typing import Optional, Callable, Awaitable, Type
+import uuid as uuid_pkg
+
+from aio_pika.abc import AbstractIncomingMessage
+from fastapi import Request
+from pydantic import BaseModel, ValidationError
+from pydantic_core import to_json
+
+from app.db_sync.exceptions import MQException
+from app.db_sync.mq_client import AsyncMQClient
+from app.r_services.product_type_loader import ProductTypeLoader, bind_product_type_loader
+from app.r_services.services_exceptions import DBException
+from app.schemas.db_sync_schema import EntityChangesDTO, EntityChangedDTO, WorkerTypes, AggregateType
+from app.streaming import sse_frame
+
+
+REMOVE_EVENT = "remove"
+DEFAULT_MAX_PENDING_EVENTS = 1000
+
+change_feed_logger = logging.getLogger("app.r_services.change_feed")
+
+EntityFetcher = Callable[[list[uuid_pkg.UUID]], Awaitable[list[BaseModel]]]
+EntityRenderer = Callable[[Type[BaseModel], BaseModel], bytes]
+
+
+class Subscription:
+    def __init__(
+            self,
+            aggregate_type: WorkerTypes,
+            matches: Callable[[BaseModel], bool],
+            output_schema: Type[BaseModel],
+            max_pending_events: int,
+            on_close: Callable[["Subscription"], None]
+    ):
+        self.aggregate_type = aggregate_type
+        self._matches = matches
+        self._output_schema = output_schema
+        self._events: asyncio.Queue[Optional[bytes]] = asyncio.Queue(maxsize=max_pending_events + 1)
+        self._max_pending_events = max_pending_events
+        self._visible_ids: set[uuid_pkg.UUID] = set()
+        self._on_close = on_close
+        self._closed = False
+
+    async def next_event(self) -> Optional[bytes]:
+        return await self._events.get()
+
+    def offer(self, change: EntityChangedDTO, entity: Optional[BaseModel], render: EntityRenderer) -> None:
+        if entity is None or change.event_type == AggregateType.DELETE:
+            self._visible_ids.discard(change.id)
+            self._push(sse_frame(
+                event=AggregateType.DELETE.value,
+                event_id=f"{change.id}-{change.entity_version}",
+                data=to_json({"id": change.id, "entity_version": change.entity_version})
+            ))
+        elif self._matches(entity):
+            self._visible_ids.add(change.id)
+            self._push(sse_frame(
+                event=change.event_type.value,
+                event_id=f"{change.id}-{entity.entity_version}",
+                data=render(self._output_schema, entity)
+            ))
+        elif change.event_type == AggregateType.UPDATE or change.id in self._visible_ids:
+            self._visible_ids.discard(change.id)
+            self._push(sse_frame(
+                event=REMOVE_EVENT,
+                event_id=f"{change.id}-{entity.entity_version}",
+                data=to_json({"id": change.id, "entity_version": entity.entity_version})
+            ))
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._events.put_nowait(None)
+        self._on_close(self)
+
+    def _push(self, frame: bytes) -> None:
+        if self._closed:
+            return
+        if self._events.qsize() >= self._max_pending_events:
+            warnings.warn("Live update subscriber fell behind, closing its stream")
+            self.close()
+            return
+        self._events.put_nowait(frame)
+
+
+class ChangeFeed:
+    def __init__(
+            self,
+            async_mq_client: AsyncMQClient,
+            fetchers: dict[WorkerTypes, EntityFetcher],
+            max_pending_events: int = DEFAULT_MAX_PENDING_EVENTS,
+            product_type_loader_factory: Optional[Callable[[], ProductTypeLoader]] = None
+    ):
+        self._async_mq_client = async_mq_client
+        self._fetchers = fetchers
+        self._product_type_loader_factory = product_type_loader_factory
+        self._max_pending_events = max_pending_events
+        self._subscriptions: dict[WorkerTypes, set[Subscription]] = defaultdict(set)
+        self._pending_changes: asyncio.Queue[list[EntityChangedDTO]] = asyncio.Queue(maxsize=max_pending_events)
+        self._consumer_task: Optional[asyncio.Task] = None
+        self._fan_out_task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        await self._async_mq_client.connect()
+        self._consumer_task = asyncio.create_task(self._async_mq_client.consume_data(self._on_message))
+        self._start_fan_out()
+
+    async def stop(self) -> None:
+        self._close_all()
+        await self._async_mq_client.disconnect()
+        if self._consumer_task is not None:
+            try:
+                await self._consumer_task
+            except MQException as e:
+                warnings.warn(f"Change feed consumer stopped with error: {e}")
+            self._consumer_task = None
+        if self._fan_out_task is not None:
+            fan_out_task, self._fan_out_task = self._fan_out_task, None
+            fan_out_task.cancel()
+            try:
+                await fan_out_task
+            except asyncio.CancelledError:
+                pass
+
+    def subscribe(
+            self,
+            aggregate_type: WorkerTypes,
+            matches: Callable[[BaseModel], bool],
+            output_schema: Type[BaseModel]
+    ) -> Subscription:
+        subscription = Subscription(
+            aggregate_type=aggregate_type,
+            matches=matches,
+            output_schema=output_schema,
+            max_pending_events=self._max_pending_events,
+            on_close=self._unsubscribe
+        )
+        self._subscriptions[aggregate_type].add(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription: Subscription) -> None:
+        self._subscriptions[subscription.aggregate_type].discard(subscription)
+
+    async def _on_message(self, message: AbstractIncomingMessage) -> None:
+        try:
+            changes = EntityChangesDTO.model_validate_json(message.body).changes
+            if any(self._subscriptions.get(change.aggregate_type) for change in changes):
+                self._pending_changes.put_nowait(changes)
+        except asyncio.QueueFull:
+            change_feed_logger.warning("Live update fan-out fell behind, closing all subscriber streams")
+            self._close_all()
+        except ValidationError as e:
+            warnings.warn(f"{str(e)}, skipping live update")
+        finally:
+            await message.ack()
+
+    def _close_all(self) -> None:
+        for subscriptions in list(self._subscriptions.values()):
+            for subscription in list(subscriptions):
+                subscription.close()
+
+    def _start_fan_out(self) -> None:
+        self._fan_out_task = asyncio.create_task(self._fan_out_forever())
+        self._fan_out_task.add_done_callback(self._on_fan_out_done)
+
+    def _on_fan_out_done(self, task: asyncio.Task) -> None:
+        if task is not self._fan_out_task or task.cancelled():
+            return
+        change_feed_logger.error("Live update fan-out stopped, restarting it", exc_info=task.exception())
+        self._start_fan_out()
+
+    async def _fan_out_forever(self) -> None:
+        while True:
+            changes = await self._pending_changes.get()
+            while not self._pending_changes.empty():
+                changes = changes + self._pending_changes.get_nowait()
+            try:
+                await self._fan_out(changes)
+            except Exception:
+                change_feed_logger.exception("Failed to fan out %d live update(s), skipping them", len(changes))
+
+    async def _fan_out(self, changes: list[EntityChangedDTO]) -> None:
+        if self._product_type_loader_factory is not None:
+            bind_product_type_loader(self._product_type_loader_factory())
+        latest_changes: dict[tuple[WorkerTypes, uuid_pkg.UUID], EntityChangedDTO] = {}
+        for change in changes:
+            key = (change.aggregate_type, change.id)
+            if key not in latest_changes or latest_changes[key].entity_version < change.entity_version:
+                latest_changes[key] = change
+        changes_by_type: dict[WorkerTypes, list[EntityChangedDTO]] = defaultdict(list)
+        for (aggregate_type, _), change in latest_changes.items():
+            changes_by_type[aggregate_type].append(change)
+
+        rendered: dict[tuple[Type[BaseModel], uuid_pkg.UUID], bytes] = {}
+
+        def render(output_schema: Type[BaseModel], entity: BaseModel) -> bytes:
+            key = (output_schema, entity.id)
+            if key not in rendered:
+                rendered[key] = to_json(output_schema.model_validate(entity, from_attributes=True))
+            return rendered[key]
+
+        for aggregate_type, type_changes in changes_by_type.items():
+            subscriptions = self._subscriptions.get(aggregate_type)
+            if not subscriptions or aggregate_type not in self._fetchers:
+                continue
+            live_ids = [change.id for change in type_changes if change.event_type != AggregateType.DELETE]
+            try:
+                fetched = await self._fetchers[aggregate_type](live_ids) if live_ids else []
+            except DBException as e:
+                warnings.warn(f"{str(e)}, skipping live update")
+                continue
+            entities = {entity.id: entity for entity in fetched}
+            for change in type_changes:
+                for subscription in list(subscriptions):
+                    subscription.offer(change=change, entity=entities.get(change.id), render=render)
+
+
+def get_change_feed(request: Request) -> Optional[ChangeFeed]:
+    return request.app.state.container.change_feed
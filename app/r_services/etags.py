@@ -0,0 +1,49 @@
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Generic, TypeVar, Optional
+import uuid as uuid_pkg
+
+from pydantic import BaseModel
+
+from app.r_services.projection import FieldSelection
+
+
+TaggedValue = TypeVar('TaggedValue')
+
+EntityVersions = tuple[Optional[int], ...]
+
+
+@dataclass
+class Tagged(Generic[TaggedValue]):
+    value: TaggedValue
+    etag: str
+
+
+def entity_etag(reference_id: uuid_pkg.UUID, versions: EntityVersions, selection: Optional[FieldSelection]) -> str:
+    tag = f"{reference_id}-{_format_versions(versions)}"
+    if selection is not None:
+        tag = f"{tag}-{_digest(_selection_key(selection))[:12]}"
+    return f'"{tag}"'
+
+
+def page_etag(filter_data: BaseModel, page_versions: list[tuple[uuid_pkg.UUID, EntityVersions]]) -> str:
+    page_key = [filter_data.model_dump(mode="json")] + [
+        f"{reference_id}-{_format_versions(versions)}" for reference_id, versions in page_versions
+    ]
+    return f'"{_digest(page_key)[:32]}"'
+
+
+def _format_versions(versions: EntityVersions) -> str:
+    return ".".join("0" if version is None else str(version) for version in versions)
+
+
+def _selection_key(selection: FieldSelection) -> list:
+    return sorted(
+        [field_name, sorted(nested) if nested is not None else None]
+        for field_name, nested in selection.items()
+    )
+
+
+def _digest(value) -> str:
+    return hashlib.sha256(json.dumps(value, separators=(",", ":")).encode("utf-8")).hexdigest()
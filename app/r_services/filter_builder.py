@@ -1,15 +1,29 @@
-from typing import Optional, Any
+from typing import Optional, Any, List, Tuple
 
 from pydantic import BaseModel
 
+import pymongo
+
 
 class MongoCriteriaFilter(BaseModel):
     query: dict
+    sort: List[Tuple[str, int]] = []
+    limit: Optional[int] = None
+    rank_by_text_score: bool = False
+    ranked_keyset: Optional[dict] = None
 
 
 class MongoCriteriaFilterBuilder:
     def __init__(self):
         self._criteria: dict = {}
+        self._sort: List[Tuple[str, int]] = []
+        self._limit: Optional[int] = None
+        self._rank_by_text_score = False
+        self._ranked_keyset: Optional[dict] = None
+
+    @property
+    def has_text_search(self) -> bool:
+        return "$text" in self._criteria
 
     def add_text_search(self, field_value: Optional[str]) -> None:
         if field_value:
@@ -38,5 +52,43 @@ class MongoCriteriaFilterBuilder:
                 if field_value is not None:
                     self._criteria[f"{parent_field}.{field_name}"] = field_value
 
+    def add_keyset_after(self, sort_field: str, last_value: Any, last_id: Any) -> None:
+        if sort_field == "_id":
+            seek_condition = {"_id": {"$gt": last_id}}
+        else:
+            seek_condition = {
+                "$or": [
+                    {sort_field: {"$gt": last_value}},
+                    {sort_field: last_value, "_id": {"$gt": last_id}}
+                ]
+            }
+        self._criteria.setdefault("$and", []).append(seek_condition)
+
+    def add_score_keyset_after(self, score_field: str, last_score: float, last_id: Any) -> None:
+        self._ranked_keyset = {
+            "$or": [
+                {score_field: {"$lt": last_score}},
+                {score_field: last_score, "_id": {"$gt": last_id}}
+            ]
+        }
+
+    def set_text_score_sort(self, score_field: str) -> None:
+        self._rank_by_text_score = True
+        self._sort = [(score_field, pymongo.DESCENDING), ("_id", pymongo.ASCENDING)]
+
+    def set_sort(self, sort_field: str) -> None:
+        self._sort = [(sort_field, pymongo.ASCENDING)]
+        if sort_field != "_id":
+            self._sort.append(("_id", pymongo.ASCENDING))
+
+    def set_limit(self, limit: Optional[int]) -> None:
+        self._limit = limit
+
     def build(self) -> MongoCriteriaFilter:
-        return MongoCriteriaFilter(query=self._criteria)
\ No newline at end of file
+        return MongoCriteriaFilter(
+            query=self._criteria,
+            sort=self._sort,
+            limit=self._limit,
+            rank_by_text_score=self._rank_by_text_score,
+            ranked_keyset=self._ranked_keyset
+        )
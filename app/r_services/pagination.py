@@ -0,0 +1,28 @@
+import base64
+import json
+from typing import Any, Tuple
+import uuid as uuid_pkg
+
+from app.r_services.services_exceptions import InvalidCursorError
+
+
+ID_SORT_FIELD = "_id"
+RELEVANCE_SORT = "relevance"
+
+
+def encode_cursor(sort_field: str, sort_value: Any, reference_id: uuid_pkg.UUID) -> str:
+    raw = json.dumps({"s": sort_field, "v": sort_value, "id": str(reference_id)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_field: str) -> Tuple[Any, uuid_pkg.UUID]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        decoded = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if decoded["s"] != sort_field:
+            raise InvalidCursorError(f"Cursor was issued for sort '{decoded['s']}', not '{sort_field}'")
+        return decoded["v"], uuid_pkg.UUID(decoded["id"])
+    except InvalidCursorError:
+        raise
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursorError(f"Malformed cursor: {cursor}") from e
@@ -1,36 +1,55 @@
-from typing import List
+import warnings
+from collections import defaultdict
+from typing import Optional, AsyncIterator
 
-from fastapi import Depends
+from fastapi import Depends, Request
 import uuid as uuid_pkg
 
 from app.r_services.services_exceptions import DBException
-from app.repositories.product_repository import get_product_repository
-from app.repositories.repositories_exceptions import DatabaseOperationError
+from app.repositories.repositories_exceptions import NotFoundError, DatabaseOperationError
+from app.schemas.db_sync_schema import WorkerTypes
 from app.schemas.product_schemas import ProductOut, ProductFetch, ProductCreate, ProductUpdate, ProductDelete
 
 from app.repositories.product_repository import ProductRepository
-from app.r_services.base import BaseService
-from app.r_services.filter_builder import MongoCriteriaFilter
+from app.repositories.product_type_repository import ProductTypeRepository
+from app.repositories.search_prefix_repository import SearchPrefixRepository
+from app.repositories.stats_repository import StatsRepository, ProductTypeStatsDelta
+from app.r_services.base import BaseService, EntityChange
+from app.r_services.cache import EntityCache
+from app.r_services.etags import EntityVersions
+from app.r_services.search_prefixes import text_matches
+from app.r_services.projection import FieldSelection
+from app.r_services.product_type_loader import ProductTypeLoader, get_product_type_loader, \
+    bind_product_type_loader, current_product_type_loader
+from app.r_services.filter_builder import MongoCriteriaFilter, MongoCriteriaFilterBuilder
 
 
-class ProductService(BaseService[ProductOut]):
-    def __init__(self, repository: ProductRepository):
-        super().__init__(repository=repository, output_schema=ProductOut)
+STATS_FIELDS = {"product_type_id": 1, "quantity": 1, "price": 1, "entity_version": 1}
+MAX_PRICE_BOUNDS_ATTEMPTS = 5
 
-    async def fetch_single_record(self, reference_id: uuid_pkg.UUID) -> ProductOut:
-        try:
-            fetched_data = await self._repository.fetch_single_record(reference=reference_id, fetch_related=True)
-            return self._schema_out.model_validate(fetched_data)
-        except DatabaseOperationError as e:
-            raise DBException(e) from e
 
-    async def fetch(self, filter_data: ProductFetch) -> List[ProductOut]:
-        search_criteria = await self._build_search_criteria(data=filter_data)
-        try:
-            fetched_data_list = await self._repository.fetch(filter_data=search_criteria.query, fetch_related=True)
-            return [self._schema_out.model_validate(fetched_data) for fetched_data in fetched_data_list]
-        except DatabaseOperationError as e:
-            raise DBException(e) from e
+class ProductService(BaseService[ProductOut]):
+    def __init__(
+            self,
+            repository: ProductRepository,
+            cache: Optional[EntityCache[ProductOut]] = None,
+            product_type_repository: Optional[ProductTypeRepository] = None,
+            search_prefix_repository: Optional[SearchPrefixRepository] = None,
+            stats_repository: Optional[StatsRepository] = None
+    ):
+        super().__init__(
+            repository=repository,
+            output_schema=ProductOut,
+            aggregate_type=WorkerTypes.Product,
+            cache=cache,
+            search_prefix_repository=search_prefix_repository
+        )
+        self._product_type_repository = product_type_repository
+        self._stats_repository = stats_repository
+
+    @property
+    def _product_type_loader(self) -> Optional[ProductTypeLoader]:
+        return current_product_type_loader()
 
     async def update(self, data: ProductUpdate) -> ProductOut:
         return await super().update(data=data)
@@ -41,20 +60,170 @@ class ProductService(BaseService[ProductOut]):
     async def create(self, data: ProductCreate) -> ProductOut:
         return await super().create(data=data)
 
+    async def _prepare_writes(self, field_sets: list[dict]) -> None:
+        if self._product_type_repository is None:
+            return
+        product_type_ids = list({fields["product_type_id"] for fields in field_sets if fields.get("product_type_id")})
+        if not product_type_ids:
+            return
+        snapshots = await self._product_type_repository.fetch_snapshots(reference_ids=product_type_ids)
+        for fields in field_sets:
+            if fields.get("product_type_id"):
+                fields["product_type"] = snapshots.get(fields["product_type_id"])
+
+    def _change_projection(self) -> Optional[dict]:
+        return STATS_FIELDS if self._stats_repository is not None else None
+
+    async def _record_changes(self, changes: list[EntityChange]) -> None:
+        if self._stats_repository is None:
+            return
+        deltas = self._stats_deltas(changes)
+        if not deltas:
+            return
+        await self._stats_repository.apply_deltas(deltas=deltas)
+        stale_bounds = [product_type_id for product_type_id, delta in deltas.items() if delta.price_removed]
+        for _ in range(MAX_PRICE_BOUNDS_ATTEMPTS):
+            if not stale_bounds:
+                return
+            bounds_versions = await self._stats_repository.fetch_bounds_versions(product_type_ids=stale_bounds)
+            stale_bounds = await self._stats_repository.set_price_bounds(
+                bounds=await self._repository.fetch_price_bounds(product_type_ids=list(bounds_versions)),
+                bounds_versions=bounds_versions
+            )
+        if stale_bounds:
+            warnings.warn(f"Price bounds of product types {stale_bounds} kept changing, leaving them for a stats rebuild")
+
+    @classmethod
+    def _stats_deltas(cls, changes: list[EntityChange]) -> dict[uuid_pkg.UUID, ProductTypeStatsDelta]:
+        deltas = defaultdict(ProductTypeStatsDelta)
+        for change in changes:
+            previous = cls._stats_values(change.previous)
+            current = cls._stats_values(change.current)
+            if previous == current:
+                continue
+            if previous is not None:
+                product_type_id, quantity, price = previous
+                deltas[product_type_id].remove(quantity=quantity, price=price)
+            if current is not None:
+                product_type_id, quantity, price = current
+                deltas[product_type_id].add(quantity=quantity, price=price)
+        return dict(deltas)
+
+    @staticmethod
+    def _stats_values(document: Optional[dict]) -> Optional[tuple[uuid_pkg.UUID, int, float]]:
+        if document is None:
+            return None
+        return document["product_type_id"], document["quantity"], document["price"]
+
+    def _read_options(self, selection: Optional[FieldSelection]) -> dict:
+        return {"fetch_related": self._selects_product_type(selection) and not self._joins_product_types(selection)}
+
+    def _version_projection(self, selection: Optional[FieldSelection]) -> dict:
+        projection = super()._version_projection(selection)
+        if self._selects_product_type(selection):
+            projection["product_type.entity_version"] = 1
+            if self._joins_product_types(selection):
+                projection["product_type_id"] = 1
+        return projection
+
+    def _document_versions(self, document: dict, selection: Optional[FieldSelection]) -> EntityVersions:
+        versions = super()._document_versions(document=document, selection=selection)
+        if not self._selects_product_type(selection):
+            return versions
+        return versions + ((document.get("product_type") or {}).get("entity_version"),)
+
+    def _projection(self, selection: Optional[FieldSelection]) -> dict:
+        projection = super()._projection(selection)
+        if self._joins_product_types(selection):
+            projection["product_type_id"] = 1
+        return projection
+
+    async def _resolve_related(self, entities: list, selection: Optional[FieldSelection]) -> list:
+        if not self._joins_product_types(selection):
+            return entities
+        product_types = await self._product_type_loader.load_many(
+            entity["product_type_id"] for entity in entities if entity.get("product_type_id")
+        )
+        for entity in entities:
+            entity["product_type"] = product_types.get(entity.get("product_type_id"))
+        return entities
+
+    def _resolve_related_stream(
+            self,
+            entities: AsyncIterator,
+            selection: Optional[FieldSelection],
+            batch_size: Optional[int] = None
+    ) -> AsyncIterator:
+        if not self._joins_product_types(selection):
+            return entities
+        return self._join_stream(entities=entities, selection=selection, batch_size=batch_size or 1)
+
+    async def _join_stream(
+            self,
+            entities: AsyncIterator,
+            selection: Optional[FieldSelection],
+            batch_size: int
+    ) -> AsyncIterator[dict]:
+        batch = []
+        async for entity in entities:
+            batch.append(entity)
+            if len(batch) >= batch_size:
+                for joined_entity in await self._resolve_related(entities=batch, selection=selection):
+                    yield joined_entity
+                batch = []
+        for joined_entity in await self._resolve_related(entities=batch, selection=selection):
+            yield joined_entity
+
+    def _joins_product_types(self, selection: Optional[FieldSelection]) -> bool:
+        return (
+            self._product_type_loader is not None
+            and not self._repository.product_type_denormalized
+            and self._selects_product_type(selection)
+        )
+
+    async def _ensure_product_type_exists(self, product_type_id: uuid_pkg.UUID) -> None:
+        if self._product_type_loader is None:
+            return
+        try:
+            product_type = await self._product_type_loader.load(product_type_id)
+        except DatabaseOperationError as e:
+            raise DBException(e) from e
+        if product_type is None:
+            raise NotFoundError(product_type_id)
+
+    @staticmethod
+    def _selects_product_type(selection: Optional[FieldSelection]) -> bool:
+        return selection is None or "product_type" in selection
+
+    def matches(self, filter_data: ProductFetch, entity: ProductOut) -> bool:
+        return (
+            (not filter_data.name or text_matches(search=filter_data.name, text=entity.name))
+            and (filter_data.product_type_id is None or entity.product_type_id == filter_data.product_type_id)
+            and (filter_data.gt_price is None or entity.price > filter_data.gt_price)
+            and (filter_data.lt_price is None or entity.price < filter_data.lt_price)
+            and (filter_data.quantity is None or entity.quantity == filter_data.quantity)
+        )
+
     async def _build_search_criteria(self, data: ProductFetch) -> MongoCriteriaFilter:
+        query_builder = MongoCriteriaFilterBuilder()
         if data.name:
-            self._query_builder.add_text_search(data.name)
+            query_builder.add_text_search(data.name)
         if data.product_type_id:
-            related_product_type = await self.fetch_single_record(reference_id=data.product_type_id)
-            self._query_builder.add_nested_fields("product_type_id", related_product_type)
+            await self._ensure_product_type_exists(data.product_type_id)
+            query_builder.add_exact_match("product_type_id", data.product_type_id)
         if data.gt_price is not None:
-            self._query_builder.add_greater_than("price", data.gt_price)
+            query_builder.add_greater_than("price", data.gt_price)
         if data.lt_price is not None:
-            self._query_builder.add_less_than("price", data.lt_price)
+            query_builder.add_less_than("price", data.lt_price)
         if data.quantity is not None:
-            self._query_builder.add_exact_match("quantity", data.quantity)
-        return self._query_builder.build()
+            query_builder.add_exact_match("quantity", data.quantity)
+        self._add_pagination(query_builder=query_builder, data=data)
+        return query_builder.build()
 
 
-def get_product_service(repository: ProductRepository = Depends(get_product_repository)) -> ProductService:
-    return ProductService(repository=repository)
+async def get_product_service(
+        request: Request,
+        product_type_loader: ProductTypeLoader = Depends(get_product_type_loader)
+) -> ProductService:
+    bind_product_type_loader(product_type_loader)
+    return request.app.state.container.product_service
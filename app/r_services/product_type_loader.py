@@ -0,0 +1,64 @@
+import asyncio
+from contextvars import ContextVar
+from typing import Optional, Iterable
+import uuid as uuid_pkg
+
+from fastapi import Depends
+
+from app.repositories.product_type_repository import ProductTypeRepository, get_product_type_repository
+
+
+class ProductTypeLoader:
+    def __init__(self, repository: ProductTypeRepository):
+        self._repository = repository
+        self._futures: dict[uuid_pkg.UUID, asyncio.Future] = {}
+        self._queue: list[uuid_pkg.UUID] = []
+        self._dispatch_task: Optional[asyncio.Task] = None
+
+    async def load(self, reference_id: uuid_pkg.UUID) -> Optional[dict]:
+        product_types = await self.load_many([reference_id])
+        return product_types[reference_id]
+
+    async def load_many(self, reference_ids: Iterable[uuid_pkg.UUID]) -> dict[uuid_pkg.UUID, Optional[dict]]:
+        loop = asyncio.get_running_loop()
+        unique_ids = list(dict.fromkeys(reference_ids))
+        for reference_id in unique_ids:
+            if reference_id not in self._futures:
+                self._futures[reference_id] = loop.create_future()
+                self._queue.append(reference_id)
+        if self._queue and self._dispatch_task is None:
+            self._dispatch_task = loop.create_task(self._dispatch())
+        results = await asyncio.gather(*(self._futures[reference_id] for reference_id in unique_ids))
+        return dict(zip(unique_ids, results))
+
+    async def _dispatch(self) -> None:
+        batch, self._queue = self._queue, []
+        self._dispatch_task = None
+        try:
+            snapshots = await self._repository.fetch_snapshots(reference_ids=batch)
+        except Exception as e:
+            for reference_id in batch:
+                self._futures.pop(reference_id).set_exception(e)
+            return
+        for reference_id in batch:
+            self._futures[reference_id].set_result(snapshots.get(reference_id))
+
+
+_request_product_type_loader: ContextVar[Optional[ProductTypeLoader]] = ContextVar(
+    "request_product_type_loader",
+    default=None
+)
+
+
+def bind_product_type_loader(loader: ProductTypeLoader) -> None:
+    _request_product_type_loader.set(loader)
+
+
+def current_product_type_loader() -> Optional[ProductTypeLoader]:
+    return _request_product_type_loader.get()
+
+
+def get_product_type_loader(
+        repository: ProductTypeRepository = Depends(get_product_type_repository)
+) -> ProductTypeLoader:
+    return ProductTypeLoader(repository=repository)
@@ -1,6 +1,6 @@
-from typing import List
+from typing import Optional
 
-from fastapi import Depends
+from fastapi import Request
 import uuid as uuid_pkg
 
 from app.r_services.services_exceptions import DBException
@@ -8,47 +8,90 @@ from app.repositories.repositories_exceptions import DatabaseOperationError
 from app.schemas.product_type_schemas import ProductTypeOut, ProductTypeFetch, ProductTypeCreate, ProductTypeDelete, \
     ProductTypeUpdate
 
-from app.repositories.product_type_repository import ProductTypeRepository, get_product_type_repository
+from app.repositories.product_type_repository import ProductTypeRepository
 from app.r_services.base import BaseService
+from app.repositories.base import VersionedWrite
+from app.repositories.product_repository import ProductRepository
+from app.repositories.search_prefix_repository import SearchPrefixRepository
+from app.schemas.db_sync_schema import AggregateType, WorkerTypes
+from app.r_services.cache import EntityCache
+from app.r_services.search_prefixes import text_matches
 
-from app.r_services.filter_builder import MongoCriteriaFilter
+from app.r_services.filter_builder import MongoCriteriaFilter, MongoCriteriaFilterBuilder
 
 
 class ProductTypeService(BaseService[ProductTypeOut]):
-    def __init__(self, repository: ProductTypeRepository):
-        super().__init__(repository=repository, output_schema=ProductTypeOut)
+    def __init__(
+            self,
+            repository: ProductTypeRepository,
+            cache: Optional[EntityCache[ProductTypeOut]] = None,
+            product_repository: Optional[ProductRepository] = None,
+            search_prefix_repository: Optional[SearchPrefixRepository] = None
+    ):
+        super().__init__(
+            repository=repository,
+            output_schema=ProductTypeOut,
+            aggregate_type=WorkerTypes.ProductType,
+            cache=cache,
+            search_prefix_repository=search_prefix_repository
+        )
+        self._product_repository = product_repository
 
-    async def fetch_single_record(self, reference_id: uuid_pkg.UUID) -> ProductTypeOut:
+    async def update(self, data: ProductTypeUpdate) -> ProductTypeOut:
+        updated = await super().update(data=data)
+        await self._propagate_snapshots({updated.id: (updated.entity_version, updated.model_dump())})
+        return updated
+
+    async def delete(self, data: ProductTypeDelete) -> None:
+        await super().delete(data=data)
+        await self._propagate_snapshots({data.id: (data.entity_version, None)})
+
+    async def create(self, data: ProductTypeCreate) -> ProductTypeOut:
+        created = await super().create(data=data)
+        await self._propagate_snapshots({created.id: (created.entity_version, created.model_dump())})
+        return created
+
+    async def apply_batch(self, writes: list[VersionedWrite]) -> list[VersionedWrite]:
+        unconfirmed = await super().apply_batch(writes=writes)
+        if self._product_repository is None:
+            return unconfirmed
+        unconfirmed_ids = {id(write) for write in unconfirmed}
+        confirmed = [write for write in writes if id(write) not in unconfirmed_ids]
         try:
-            fetched_data = await self._repository.fetch_single_record(reference=reference_id)
-            return self._schema_out.model_validate(fetched_data)
+            snapshots = await self._repository.fetch_snapshots(
+                reference_ids=[write.aggregate_id for write in confirmed if write.event_type != AggregateType.DELETE]
+            )
         except DatabaseOperationError as e:
             raise DBException(e) from e
+        await self._propagate_snapshots({
+            write.aggregate_id: (write.final_version, snapshots.get(write.aggregate_id))
+            for write in confirmed
+        })
+        return unconfirmed
 
-    async def fetch(self, filter_data: ProductTypeFetch) -> List[ProductTypeOut]:
-        search_criteria = await self._build_search_criteria(data=filter_data)
+    async def _propagate_snapshots(self, snapshots: dict[uuid_pkg.UUID, tuple[int, Optional[dict]]]) -> None:
+        if self._product_repository is None:
+            return
         try:
-            fetched_data_list = await self._repository.fetch(filter_data=search_criteria.query)
-            return [self._schema_out.model_validate(fetched_data) for fetched_data in fetched_data_list]
+            await self._product_repository.sync_product_type_snapshots(snapshots=snapshots)
         except DatabaseOperationError as e:
             raise DBException(e) from e
 
-    async def update(self, data: ProductTypeUpdate) -> ProductTypeOut:
-        return await super().update(data=data)
-
-    async def delete(self, data: ProductTypeDelete) -> None:
-        return await super().delete(data=data)
-
-    async def create(self, data: ProductTypeCreate) -> ProductTypeOut:
-        return await super().create(data=data)
+    def matches(self, filter_data: ProductTypeFetch, entity: ProductTypeOut) -> bool:
+        return (
+            (not filter_data.name or entity.name == filter_data.name)
+            and (not filter_data.description or text_matches(search=filter_data.description, text=entity.description))
+        )
 
     async def _build_search_criteria(self, data: ProductTypeFetch) -> MongoCriteriaFilter:
+        query_builder = MongoCriteriaFilterBuilder()
         if data.name:
-            self._query_builder.add_exact_match("name", data.name)
+            query_builder.add_exact_match("name", data.name)
         if data.description:
-            self._query_builder.add_text_search(data.description)
-        return self._query_builder.build()
+            query_builder.add_text_search(data.description)
+        self._add_pagination(query_builder=query_builder, data=data)
+        return query_builder.build()
 
 
-def get_product_type_service(repository: ProductTypeRepository = Depends(get_product_type_repository)) -> ProductTypeService:
-    return ProductTypeService(repository=repository)
+def get_product_type_service(request: Request) -> ProductTypeService:
+    return request.app.state.container.product_type_service
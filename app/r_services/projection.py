@@ -0,0 +1,109 @@
+from functools import lru_cache
+from typing import Optional, Type, Iterable, Union, get_args, get_origin
+
+from pydantic import BaseModel, ConfigDict, create_model, field_validator, field_serializer
+
+from app.r_services.services_exceptions import InvalidFieldSelectionError
+
+
+FieldSelection = dict[str, Optional[frozenset[str]]]
+
+
+def parse_field_selection(
+        fields: Optional[str],
+        output_schema: Type[BaseModel],
+        required: Iterable[Optional[str]] = ("id",)
+) -> Optional[FieldSelection]:
+    if not fields:
+        return None
+    selection: dict[str, Optional[set[str]]] = {}
+    for path in (path.strip() for path in fields.split(",")):
+        if not path:
+            continue
+        field_name, _, nested_field_name = path.partition(".")
+        if field_name not in output_schema.model_fields:
+            raise InvalidFieldSelectionError(f"Unknown field: {path}")
+        if not nested_field_name:
+            selection[field_name] = None
+            continue
+        nested_schema = _nested_schema(output_schema, field_name)
+        if nested_schema is None or nested_field_name not in nested_schema.model_fields:
+            raise InvalidFieldSelectionError(f"Unknown field: {path}")
+        if field_name in selection and selection[field_name] is None:
+            continue
+        selection.setdefault(field_name, set()).add(nested_field_name)
+    for field_name in required:
+        if field_name and field_name in output_schema.model_fields:
+            selection[field_name] = None
+    return {
+        field_name: frozenset(nested) if nested is not None else None
+        for field_name, nested in selection.items()
+    }
+
+
+def full_selection(output_schema: Type[BaseModel]) -> FieldSelection:
+    return {field_name: None for field_name in output_schema.model_fields}
+
+
+def to_projection(selection: Optional[FieldSelection]) -> Optional[dict]:
+    if selection is None:
+        return None
+    projection = {}
+    for field_name, nested in selection.items():
+        if nested is None:
+            projection[field_name] = 1
+        else:
+            projection.update({f"{field_name}.{nested_field_name}": 1 for nested_field_name in nested})
+    return projection
+
+
+def output_schema_for(output_schema: Type[BaseModel], selection: Optional[FieldSelection]) -> Type[BaseModel]:
+    if selection is None:
+        return output_schema
+    return _trimmed_schema(output_schema, tuple(sorted(selection.items(), key=lambda item: item[0])))
+
+
+@lru_cache(maxsize=256)
+def _trimmed_schema(
+        output_schema: Type[BaseModel],
+        selection: tuple[tuple[str, Optional[frozenset[str]]], ...]
+) -> Type[BaseModel]:
+    field_definitions = {}
+    validators = {}
+    for field_name, nested in selection:
+        field_info = output_schema.model_fields[field_name]
+        nested_schema = _nested_schema(output_schema, field_name)
+        if nested_schema is None:
+            field_definitions[field_name] = (field_info.annotation, field_info)
+            continue
+        if nested is not None:
+            nested_schema = _trimmed_schema(nested_schema, tuple((name, None) for name in sorted(nested)))
+        field_definitions[field_name] = (Optional[nested_schema], None)
+        validators[f"{field_name}_allow_empty_dict"] = field_validator(field_name, mode="before")(_empty_dict_to_none)
+        validators[f"{field_name}_serialize_empty_dict"] = field_serializer(field_name)(_none_to_empty_dict)
+    suffix = "_".join(field_name for field_name, _ in selection)
+    return create_model(
+        f"{output_schema.__name__}_{suffix}",
+        __config__=ConfigDict(from_attributes=True),
+        __validators__=validators,
+        **field_definitions
+    )
+
+
+def _nested_schema(output_schema: Type[BaseModel], field_name: str) -> Optional[Type[BaseModel]]:
+    annotation = output_schema.model_fields[field_name].annotation
+    candidates = get_args(annotation) if get_origin(annotation) is Union else (annotation,)
+    for candidate in candidates:
+        if isinstance(candidate, type) and issubclass(candidate, BaseModel):
+            return candidate
+    return None
+
+
+def _empty_dict_to_none(cls, value):
+    if value == {}:
+        return None
+    return value
+
+
+def _none_to_empty_dict(self, value):
+    return {} if value is None else value
@@ -0,0 +1,34 @@
+import re
+import unicodedata
+
+
+MAX_PREFIX_LENGTH = 20
+MAX_QUERY_TERMS = 5
+
+_TERM_SEPARATOR = re.compile(r"[\W_]+")
+
+
+def normalize_terms(text: str) -> list[str]:
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    folded = "".join(character for character in decomposed if not unicodedata.combining(character))
+    return [term for term in _TERM_SEPARATOR.split(folded) if term]
+
+
+def label_prefixes(label: str) -> list[str]:
+    prefixes = set()
+    for term in normalize_terms(label):
+        prefixes.update(term[:length] for length in range(1, min(len(term), MAX_PREFIX_LENGTH) + 1))
+    return sorted(prefixes)
+
+
+def query_prefixes(query: str) -> list[str]:
+    return list(dict.fromkeys(term[:MAX_PREFIX_LENGTH] for term in normalize_terms(query)))[:MAX_QUERY_TERMS]
+
+
+def text_matches(search: str, text: str) -> bool:
+    text_terms = normalize_terms(text)
+    return any(
+        text_term.startswith(search_term)
+        for search_term in normalize_terms(search)
+        for text_term in text_terms
+    )
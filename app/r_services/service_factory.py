@@ -2,16 +2,31 @@ from app.r_services.product_service import ProductService
 from app.r_services.product_type_service import ProductTypeService
 from app.repositories.product_repository import ProductRepository
 from app.repositories.product_type_repository import ProductTypeRepository
+from app.repositories.search_prefix_repository import SearchPrefixRepository
+from app.repositories.stats_repository import StatsRepository
 from app.schemas.db_sync_schema import WorkerTypes, WorkerTypeValue
 
 
 class ServiceFactory:
-    @classmethod
-    def create_service(cls, worker_type: WorkerTypeValue):
+    def __init__(self, product_type_denormalized: bool = False):
+        self._product_type_denormalized = product_type_denormalized
+
+    def create_service(self, worker_type: WorkerTypeValue):
         match worker_type:
             case WorkerTypes.Product:
-                return ProductService(repository=ProductRepository())
+                return ProductService(
+                    repository=ProductRepository(product_type_denormalized=self._product_type_denormalized),
+                    product_type_repository=ProductTypeRepository() if self._product_type_denormalized else None,
+                    search_prefix_repository=SearchPrefixRepository(),
+                    stats_repository=StatsRepository()
+                )
             case WorkerTypes.ProductType:
-                return ProductTypeService(repository=ProductTypeRepository())
+                return ProductTypeService(
+                    repository=ProductTypeRepository(),
+                    product_repository=ProductRepository(
+                        product_type_denormalized=True
+                    ) if self._product_type_denormalized else None,
+                    search_prefix_repository=SearchPrefixRepository()
+                )
             case _:
                 raise ValueError(f"Unknown worker type: {worker_type}")
@@ -1,2 +1,14 @@
 class DBException(Exception):
     pass
+
+
+class InvalidCursorError(Exception):
+    pass
+
+
+class InvalidFieldSelectionError(Exception):
+    pass
+
+
+class InvalidSearchError(Exception):
+    pass
@@ -0,0 +1,71 @@
+from typing import Optional
+
+from fastapi import Request
+import uuid as uuid_pkg
+
+from app.r_services.services_exceptions import DBException
+from app.repositories.product_type_repository import ProductTypeRepository
+from app.repositories.repositories_exceptions import DatabaseOperationError
+from app.repositories.stats_repository import StatsRepository
+from app.schemas.stats_schemas import ProductTypeStatsOut, ProductTypeStatsListOut, CatalogueStatsOut
+
+
+class StatsService:
+    def __init__(self, stats_repository: StatsRepository, product_type_repository: ProductTypeRepository):
+        self._stats_repository = stats_repository
+        self._product_type_repository = product_type_repository
+
+    async def fetch_product_type_stats(self) -> ProductTypeStatsListOut:
+        try:
+            documents = await self._stats_repository.fetch_all()
+            snapshots = await self._product_type_repository.fetch_snapshots(
+                reference_ids=[document["_id"] for document in documents]
+            )
+        except DatabaseOperationError as e:
+            raise DBException(e) from e
+        return ProductTypeStatsListOut(
+            items=[self._to_output(document=document, snapshot=snapshots.get(document["_id"])) for document in documents]
+        )
+
+    async def fetch_single_product_type_stats(self, product_type_id: uuid_pkg.UUID) -> ProductTypeStatsOut:
+        try:
+            document = await self._stats_repository.fetch_single_record(reference=product_type_id)
+            snapshots = await self._product_type_repository.fetch_snapshots(reference_ids=[product_type_id])
+        except DatabaseOperationError as e:
+            raise DBException(e) from e
+        return self._to_output(document=document, snapshot=snapshots.get(product_type_id))
+
+    async def fetch_catalogue_stats(self) -> CatalogueStatsOut:
+        try:
+            documents = await self._stats_repository.fetch_all()
+        except DatabaseOperationError as e:
+            raise DBException(e) from e
+        product_count = sum(document["product_count"] for document in documents)
+        price_sum = sum(document["price_sum"] for document in documents)
+        min_prices = [document["min_price"] for document in documents if document.get("min_price") is not None]
+        max_prices = [document["max_price"] for document in documents if document.get("max_price") is not None]
+        return CatalogueStatsOut(
+            product_type_count=len(documents),
+            product_count=product_count,
+            total_quantity=sum(document["total_quantity"] for document in documents),
+            min_price=min(min_prices, default=None),
+            max_price=max(max_prices, default=None),
+            avg_price=price_sum / product_count if product_count else None
+        )
+
+    @staticmethod
+    def _to_output(document: dict, snapshot: Optional[dict]) -> ProductTypeStatsOut:
+        product_count = document["product_count"]
+        return ProductTypeStatsOut(
+            product_type_id=document["_id"],
+            product_type_name=snapshot["name"] if snapshot else None,
+            product_count=product_count,
+            total_quantity=document["total_quantity"],
+            min_price=document.get("min_price"),
+            max_price=document.get("max_price"),
+            avg_price=document["price_sum"] / product_count if product_count else None
+        )
+
+
+def get_stats_service(request: Request) -> StatsService:
+    return request.app.state.container.stats_service
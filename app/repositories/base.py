@@ -1,25 +1,62 @@
-from typing import TypeVar, Generic
+from dataclasses import dataclass
+from typing import TypeVar, Generic, Optional, AsyncIterator, Tuple
 import uuid as uuid_pkg
 from abc import ABC, abstractmethod
 
-from pymongo.errors import PyMongoError
-from beanie.operators import Set
+import pymongo
+from pymongo import InsertOne, UpdateOne, DeleteOne, ReturnDocument
+from pymongo.errors import PyMongoError, BulkWriteError
+from beanie.odm.utils.dump import get_dict
 
 from app.models import Product, ProductType
+from app.repositories.query_diagnostics import QueryDiagnostics
 from app.repositories.repositories_exceptions import DatabaseOperationError
+from app.schemas.db_sync_schema import AggregateType
 
 DocumentType = TypeVar('DocumentType', bound=[Product, ProductType])
 
+TEXT_SCORE_FIELD = "text_score"
+
+
+@dataclass
+class VersionedWrite:
+    aggregate_id: uuid_pkg.UUID
+    event_type: AggregateType
+    fields: dict
+    base_version: Optional[int]
+    final_version: int
+
+    def is_confirmed_by(self, current_version: Optional[int], previous_version: Optional[int] = None) -> bool:
+        if self.event_type == AggregateType.DELETE:
+            return previous_version == self.base_version and current_version is None
+        return current_version == self.final_version
+
 
 class BaseRepository(ABC, Generic[DocumentType]):
-    def __init__(self, model: DocumentType):
+    def __init__(self, model: DocumentType, diagnostics: Optional[QueryDiagnostics] = None):
         self._model = model
+        self._diagnostics = diagnostics
 
     @abstractmethod
     async def fetch_single_record(self, reference: uuid_pkg.UUID, **kwargs) -> DocumentType: ...
 
     @abstractmethod
-    async def fetch(self, filter_data: dict,  **kwargs) -> list[DocumentType]: ...
+    async def fetch(
+            self,
+            filter_data: dict,
+            sort: Optional[list] = None,
+            limit: Optional[int] = None,
+            **kwargs
+    ) -> list[DocumentType]: ...
+
+    @abstractmethod
+    def iterate(
+            self,
+            filter_data: dict,
+            sort: Optional[list] = None,
+            batch_size: Optional[int] = None,
+            **kwargs
+    ) -> AsyncIterator[DocumentType]: ...
 
     async def create(self, data: dict) -> DocumentType:
         try:
@@ -28,17 +65,182 @@ class BaseRepository(ABC, Generic[DocumentType]):
         except PyMongoError as e:
             raise DatabaseOperationError(str(e)) from e
 
-    async def update(self, reference_id: uuid_pkg.UUID, data: dict) -> DocumentType:
+    async def update(
+            self,
+            reference_id: uuid_pkg.UUID,
+            data: dict,
+            expected_version: int
+    ) -> Optional[Tuple[dict, DocumentType]]:
         try:
-            entity = await self._model.get(reference_id)
-            await entity.update(Set(data))
-            return entity
+            previous_document = await self._model.get_pymongo_collection().find_one_and_update(
+                {"_id": reference_id, "entity_version": expected_version - 1},
+                {"$set": data},
+                return_document=ReturnDocument.BEFORE
+            )
+            if previous_document is None:
+                return None
+            return previous_document, self._model.model_validate({**previous_document, **data})
         except PyMongoError as e:
             raise DatabaseOperationError(str(e)) from e
 
-    async def delete(self, reference_id: uuid_pkg.UUID) -> None:
+    async def delete(self, reference_id: uuid_pkg.UUID, expected_version: int) -> Optional[dict]:
         try:
-            entity = await self._model.get(reference_id)
-            await entity.delete()
+            return await self._model.get_pymongo_collection().find_one_and_delete(
+                {"_id": reference_id, "entity_version": expected_version - 1}
+            )
         except PyMongoError as e:
             raise DatabaseOperationError(str(e)) from e
+
+    async def fetch_version(self, reference_id: uuid_pkg.UUID) -> Optional[int]:
+        try:
+            document = await self._model.get_pymongo_collection().find_one(
+                {"_id": reference_id},
+                {"entity_version": 1}
+            )
+            return document["entity_version"] if document else None
+        except PyMongoError as e:
+            raise DatabaseOperationError(str(e)) from e
+
+    async def bulk_apply(self, writes: list[VersionedWrite]) -> list[VersionedWrite]:
+        if not writes:
+            return []
+        requests = [self._to_bulk_request(write) for write in writes]
+        try:
+            deleted_ids = [write.aggregate_id for write in writes if write.event_type == AggregateType.DELETE]
+            previous_versions = await self.fetch_versions(deleted_ids) if deleted_ids else {}
+            try:
+                result = await self._model.get_pymongo_collection().bulk_write(requests, ordered=False)
+                applied_count = result.inserted_count + result.matched_count + result.deleted_count
+                has_write_errors = False
+            except BulkWriteError as e:
+                applied_count = e.details.get("nInserted", 0) + e.details.get("nMatched", 0) + e.details.get("nRemoved", 0)
+                has_write_errors = True
+            if not has_write_errors and applied_count == len(writes):
+                return []
+            current_versions = await self.fetch_versions([write.aggregate_id for write in writes])
+            return [
+                write for write in writes
+                if not write.is_confirmed_by(
+                    current_version=current_versions.get(write.aggregate_id),
+                    previous_version=previous_versions.get(write.aggregate_id)
+                )
+            ]
+        except PyMongoError as e:
+            raise DatabaseOperationError(str(e)) from e
+
+    async def fetch_versions(self, reference_ids: list[uuid_pkg.UUID]) -> dict[uuid_pkg.UUID, int]:
+        try:
+            cursor = self._model.get_pymongo_collection().find(
+                {"_id": {"$in": reference_ids}},
+                {"entity_version": 1}
+            )
+            return {document["_id"]: document["entity_version"] async for document in cursor}
+        except PyMongoError as e:
+            raise DatabaseOperationError(str(e)) from e
+
+    async def fetch_fields(self, reference_ids: list[uuid_pkg.UUID], projection: dict) -> dict[uuid_pkg.UUID, dict]:
+        if not reference_ids:
+            return {}
+        try:
+            cursor = self._model.get_pymongo_collection().find({"_id": {"$in": reference_ids}}, projection)
+            return {document["_id"]: document async for document in cursor}
+        except PyMongoError as e:
+            raise DatabaseOperationError(str(e)) from e
+
+    async def _find_one_projected(self, reference: uuid_pkg.UUID, projection: dict) -> Optional[dict]:
+        document = await self._model.get_pymongo_collection().find_one(
+            {"_id": reference},
+            self._to_mongo_projection(projection)
+        )
+        return self._from_projected(document) if document else None
+
+    def _find_projected(
+            self,
+            filter_data: dict,
+            projection: dict,
+            sort: Optional[list] = None,
+            limit: Optional[int] = None,
+            batch_size: Optional[int] = None
+    ) -> AsyncIterator[dict]:
+        cursor = self._model.get_pymongo_collection().find(filter_data, self._to_mongo_projection(projection))
+        if sort:
+            cursor = cursor.sort(sort)
+        if limit:
+            cursor = cursor.limit(limit)
+        if batch_size:
+            cursor = cursor.batch_size(batch_size)
+        return self._iterate_projected(cursor)
+
+    def _find_ranked(
+            self,
+            filter_data: dict,
+            projection: dict,
+            ranked_keyset: Optional[dict] = None,
+            limit: Optional[int] = None,
+            batch_size: Optional[int] = None
+    ) -> AsyncIterator[dict]:
+        pipeline = self._ranked_stages(match=filter_data, ranked_keyset=ranked_keyset, limit=limit)
+        pipeline.append({"$project": {**self._to_mongo_projection(projection), TEXT_SCORE_FIELD: 1}})
+        self._observe_aggregate(pipeline)
+        return self._iterate_aggregated(pipeline=pipeline, batch_size=batch_size)
+
+    async def _iterate_aggregated(self, pipeline: list[dict], batch_size: Optional[int] = None) -> AsyncIterator[dict]:
+        cursor = await self._model.get_pymongo_collection().aggregate(
+            pipeline,
+            **({"batchSize": batch_size} if batch_size else {})
+        )
+        async for document in cursor:
+            yield self._from_projected(document)
+
+    @staticmethod
+    def _ranked_stages(match: dict, ranked_keyset: Optional[dict] = None, limit: Optional[int] = None) -> list[dict]:
+        pipeline = [
+            {"$match": match},
+            {"$set": {TEXT_SCORE_FIELD: {"$meta": "textScore"}}}
+        ]
+        if ranked_keyset:
+            pipeline.append({"$match": ranked_keyset})
+        pipeline.append({"$sort": {TEXT_SCORE_FIELD: pymongo.DESCENDING, "_id": pymongo.ASCENDING}})
+        if limit:
+            pipeline.append({"$limit": limit})
+        return pipeline
+
+    async def _iterate_projected(self, cursor) -> AsyncIterator[dict]:
+        async for document in cursor:
+            yield self._from_projected(document)
+
+    @staticmethod
+    def _to_mongo_projection(projection: dict) -> dict:
+        return {"_id" if field == "id" else field: value for field, value in projection.items()}
+
+    @staticmethod
+    def _from_projected(document: dict) -> dict:
+        document["id"] = document.pop("_id")
+        return document
+
+    def _observe_find(self, filter_data: dict, sort: Optional[list] = None, limit: Optional[int] = None) -> None:
+        if self._diagnostics is not None:
+            self._diagnostics.observe_find(
+                collection=self._model.get_pymongo_collection(),
+                query=filter_data,
+                sort=sort,
+                limit=limit
+            )
+
+    def _observe_aggregate(self, pipeline: list[dict]) -> None:
+        if self._diagnostics is not None:
+            self._diagnostics.observe_aggregate(collection=self._model.get_pymongo_collection(), pipeline=pipeline)
+
+    def _to_bulk_request(self, write: VersionedWrite) -> InsertOne | UpdateOne | DeleteOne:
+        match write.event_type:
+            case AggregateType.CREATE:
+                return InsertOne(get_dict(self._model(id=write.aggregate_id, **write.fields), to_db=True))
+            case AggregateType.UPDATE:
+                return UpdateOne(
+                    {"_id": write.aggregate_id, "entity_version": write.base_version},
+                    {"$set": write.fields}
+                )
+            case AggregateType.DELETE:
+                return DeleteOne({"_id": write.aggregate_id, "entity_version": write.base_version})
+            case _:
+                raise ValueError(f"Unknown event type: {write.event_type}")
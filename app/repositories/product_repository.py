@@ -1,48 +1,46 @@
+import asyncio
+from typing import Optional, AsyncIterator, Tuple
+
+from fastapi import Request
+
+import pymongo
+from pymongo import UpdateMany
 from pymongo.errors import PyMongoError
 import uuid as uuid_pkg
 
 from app.models import Product
-from app.repositories.base import BaseRepository
+from app.repositories.base import BaseRepository, TEXT_SCORE_FIELD
+from app.repositories.query_diagnostics import QueryDiagnostics
 from app.repositories.repositories_exceptions import DatabaseOperationError, NotFoundError
 
 
 class ProductRepository(BaseRepository[Product]):
-    def __init__(self):
-        super().__init__(Product)
+    def __init__(self, product_type_denormalized: bool = False, diagnostics: Optional[QueryDiagnostics] = None):
+        super().__init__(Product, diagnostics=diagnostics)
+        self._product_type_denormalized = product_type_denormalized
+
+    @property
+    def product_type_denormalized(self) -> bool:
+        return self._product_type_denormalized
 
-    async def fetch_single_record(self, reference: uuid_pkg.UUID, fetch_related: bool = False, **kwargs) -> Product:
+    async def fetch_single_record(
+            self,
+            reference: uuid_pkg.UUID,
+            fetch_related: bool = False,
+            projection: Optional[dict] = None,
+            **kwargs
+    ) -> Product | dict:
         try:
-            if fetch_related:
-                pipeline = [
-                    {"$match": {"_id": reference}},
-                    {
-                        "$lookup": {
-                            "from": "ProductType",
-                            "localField": "product_type_id",
-                            "foreignField": "_id",
-                            "as": "product_type"
-                        }
-                    },
-                    {
-                        "$unwind": {
-                            "path": "$product_type",
-                            "preserveNullAndEmptyArrays": True
-                        }
-                    },
-                    {
-                        "$set": {
-                            "id": "$_id",
-                            "product_type.id": "$product_type._id"
-                        }
-                    },
-                    {
-                        "$unset": ["_id", "product_type._id"]
-                    }
-                ]
+            if fetch_related and not self._product_type_denormalized:
+                pipeline = self._build_related_pipeline(match={"_id": reference}, projection=projection)
                 result = await self._model.aggregate(pipeline).to_list(length=1)
                 if not result:
                     raise NotFoundError(reference)
                 entity = result[0]
+            elif projection is not None:
+                entity = await self._find_one_projected(reference=reference, projection=projection)
+                if entity is None:
+                    raise NotFoundError(reference)
             else:
                 entity = await self._model.get(reference)
                 if entity is None:
@@ -52,38 +50,45 @@ class ProductRepository(BaseRepository[Product]):
         except PyMongoError as e:
             raise DatabaseOperationError(str(e)) from e
 
-    async def fetch(self, filter_data: dict, fetch_related: bool = False, **kwargs) -> list[Product]:
+    async def fetch(
+            self,
+            filter_data: dict,
+            sort: Optional[list] = None,
+            limit: Optional[int] = None,
+            fetch_related: bool = False,
+            projection: Optional[dict] = None,
+            rank_by_text_score: bool = False,
+            ranked_keyset: Optional[dict] = None,
+            **kwargs
+    ) -> list[Product | dict]:
         try:
-            if fetch_related:
-                pipeline = [
-                    {"$match": filter_data},
-                    {
-                        "$lookup": {
-                            "from": "ProductType",
-                            "localField": "product_type_id",
-                            "foreignField": "_id",
-                            "as": "product_type"
-                        }
-                    },
-                    {
-                        "$unwind": {
-                            "path": "$product_type",
-                            "preserveNullAndEmptyArrays": True
-                        }
-                    },
-                    {
-                        "$set": {
-                            "id": "$_id",
-                            "product_type.id": "$product_type._id"
-                        }
-                    },
-                    {
-                        "$unset": ["_id", "product_type._id"]
-                    }
+            if fetch_related and not self._product_type_denormalized:
+                pipeline = self._build_related_pipeline(
+                    match=filter_data,
+                    sort=sort,
+                    limit=limit,
+                    projection=projection,
+                    rank_by_text_score=rank_by_text_score,
+                    ranked_keyset=ranked_keyset
+                )
+                self._observe_aggregate(pipeline)
+                entities = await self._model.aggregate(pipeline).to_list(length=limit)
+            elif rank_by_text_score:
+                entities = [
+                    entity async for entity in self._find_ranked(
+                        filter_data=filter_data, projection=projection, ranked_keyset=ranked_keyset, limit=limit
+                    )
+                ]
+            elif projection is not None:
+                self._observe_find(filter_data=filter_data, sort=sort, limit=limit)
+                entities = [
+                    entity async for entity in self._find_projected(
+                        filter_data=filter_data, projection=projection, sort=sort, limit=limit
+                    )
                 ]
-                entities = await self._model.aggregate(pipeline).to_list()
             else:
-                entities = await self._model.find(filter_data).to_list()
+                self._observe_find(filter_data=filter_data, sort=sort, limit=limit)
+                entities = await self._model.find(filter_data).sort(sort).limit(limit).to_list()
 
             if not entities:
                 raise NotFoundError(filter_data)
@@ -92,6 +97,212 @@ class ProductRepository(BaseRepository[Product]):
         except PyMongoError as e:
             raise DatabaseOperationError(str(e)) from e
 
+    async def iterate(
+            self,
+            filter_data: dict,
+            sort: Optional[list] = None,
+            batch_size: Optional[int] = None,
+            fetch_related: bool = False,
+            projection: Optional[dict] = None,
+            rank_by_text_score: bool = False,
+            ranked_keyset: Optional[dict] = None,
+            **kwargs
+    ) -> AsyncIterator[Product | dict]:
+        try:
+            if fetch_related and not self._product_type_denormalized:
+                pipeline = self._build_related_pipeline(
+                    match=filter_data,
+                    sort=sort,
+                    projection=projection,
+                    rank_by_text_score=rank_by_text_score,
+                    ranked_keyset=ranked_keyset
+                )
+                self._observe_aggregate(pipeline)
+                cursor = self._model.aggregate(pipeline, **({"batchSize": batch_size} if batch_size else {}))
+            elif rank_by_text_score:
+                cursor = self._find_ranked(
+                    filter_data=filter_data, projection=projection, ranked_keyset=ranked_keyset, batch_size=batch_size
+                )
+            elif projection is not None:
+                self._observe_find(filter_data=filter_data, sort=sort)
+                cursor = self._find_projected(
+                    filter_data=filter_data, projection=projection, sort=sort, batch_size=batch_size
+                )
+            else:
+                self._observe_find(filter_data=filter_data, sort=sort)
+                cursor = self._model.find(filter_data, **({"batch_size": batch_size} if batch_size else {})).sort(sort)
+            async for entity in cursor:
+                yield entity
+        except PyMongoError as e:
+            raise DatabaseOperationError(str(e)) from e
+
+    async def sync_product_type_snapshots(
+            self,
+            snapshots: dict[uuid_pkg.UUID, tuple[int, Optional[dict]]]
+    ) -> None:
+        if not snapshots:
+            return
+        requests = [
+            UpdateMany(
+                {
+                    "product_type_id": product_type_id,
+                    "$or": [
+                        {"product_type": None},
+                        {"product_type.entity_version": {"$lt": entity_version}}
+                    ]
+                },
+                {"$set": {"product_type": snapshot}}
+            )
+            for product_type_id, (entity_version, snapshot) in snapshots.items()
+        ]
+        try:
+            await self._model.get_pymongo_collection().bulk_write(requests, ordered=False)
+        except PyMongoError as e:
+            raise DatabaseOperationError(str(e)) from e
+
+    async def iterate_snapshot_drift(self) -> AsyncIterator[dict]:
+        pipeline = [
+            {
+                "$lookup": {
+                    "from": "ProductType",
+                    "localField": "product_type_id",
+                    "foreignField": "_id",
+                    "as": "current_product_type"
+                }
+            },
+            {
+                "$unwind": {
+                    "path": "$current_product_type",
+                    "preserveNullAndEmptyArrays": True
+                }
+            },
+            {
+                "$match": {
+                    "$expr": {
+                        "$or": [
+                            {
+                                "$ne": [
+                                    {"$ifNull": ["$product_type.entity_version", None]},
+                                    {"$ifNull": ["$current_product_type.entity_version", None]}
+                                ]
+                            },
+                            {
+                                "$and": [
+                                    {"$ne": [{"$ifNull": ["$product_type", None]}, None]},
+                                    {"$ne": ["$product_type.id", "$product_type_id"]}
+                                ]
+                            }
+                        ]
+                    }
+                }
+            },
+            {"$project": {"_id": 1, "product_type_id": 1}}
+        ]
+        try:
+            async for document in await self._model.get_pymongo_collection().aggregate(pipeline):
+                yield document
+        except PyMongoError as e:
+            raise DatabaseOperationError(str(e)) from e
+
+    async def overwrite_product_type_snapshots(self, snapshots: dict[uuid_pkg.UUID, Optional[dict]]) -> int:
+        if not snapshots:
+            return 0
+        requests = [
+            UpdateMany({"product_type_id": product_type_id}, {"$set": {"product_type": snapshot}})
+            for product_type_id, snapshot in snapshots.items()
+        ]
+        try:
+            result = await self._model.get_pymongo_collection().bulk_write(requests, ordered=False)
+            return result.modified_count
+        except PyMongoError as e:
+            raise DatabaseOperationError(str(e)) from e
+
+    async def fetch_price_bounds(
+            self,
+            product_type_ids: list[uuid_pkg.UUID]
+    ) -> dict[uuid_pkg.UUID, Tuple[Optional[float], Optional[float]]]:
+        try:
+            bounds = await asyncio.gather(*(self._price_bounds(product_type_id) for product_type_id in product_type_ids))
+            return dict(zip(product_type_ids, bounds))
+        except PyMongoError as e:
+            raise DatabaseOperationError(str(e)) from e
+
+    async def write_type_stats(self, output_collection: str) -> None:
+        pipeline = [
+            {
+                "$group": {
+                    "_id": "$product_type_id",
+                    "product_count": {"$sum": 1},
+                    "total_quantity": {"$sum": "$quantity"},
+                    "price_sum": {"$sum": "$price"},
+                    "min_price": {"$min": "$price"},
+                    "max_price": {"$max": "$price"}
+                }
+            },
+            {"$set": {"bounds_version": 0}},
+            {"$out": output_collection}
+        ]
+        try:
+            await (await self._model.get_pymongo_collection().aggregate(pipeline)).to_list()
+        except PyMongoError as e:
+            raise DatabaseOperationError(str(e)) from e
+
+    async def _price_bounds(self, product_type_id: uuid_pkg.UUID) -> Tuple[Optional[float], Optional[float]]:
+        collection = self._model.get_pymongo_collection()
+        lowest, highest = await asyncio.gather(
+            collection.find_one({"product_type_id": product_type_id}, {"price": 1}, sort=[("price", pymongo.ASCENDING)]),
+            collection.find_one({"product_type_id": product_type_id}, {"price": 1}, sort=[("price", pymongo.DESCENDING)])
+        )
+        return (lowest["price"] if lowest else None), (highest["price"] if highest else None)
+
+    def _build_related_pipeline(
+            self,
+            match: dict,
+            sort: Optional[list] = None,
+            limit: Optional[int] = None,
+            projection: Optional[dict] = None,
+            rank_by_text_score: bool = False,
+            ranked_keyset: Optional[dict] = None
+    ) -> list[dict]:
+        if rank_by_text_score:
+            pipeline = self._ranked_stages(match=match, ranked_keyset=ranked_keyset, limit=limit)
+            if projection is not None:
+                projection = {**projection, TEXT_SCORE_FIELD: 1}
+        else:
+            pipeline = [{"$match": match}]
+            if sort:
+                pipeline.append({"$sort": dict(sort)})
+            if limit:
+                pipeline.append({"$limit": limit})
+        pipeline.extend([
+            {
+                "$lookup": {
+                    "from": "ProductType",
+                    "localField": "product_type_id",
+                    "foreignField": "_id",
+                    "as": "product_type"
+                }
+            },
+            {
+                "$unwind": {
+                    "path": "$product_type",
+                    "preserveNullAndEmptyArrays": True
+                }
+            },
+            {
+                "$set": {
+                    "id": "$_id",
+                    "product_type.id": "$product_type._id"
+                }
+            },
+            {
+                "$unset": ["_id", "product_type._id"]
+            }
+        ])
+        if projection is not None:
+            pipeline.append({"$project": projection})
+        return pipeline
+
 
-def get_product_repository() -> ProductRepository:
-    return ProductRepository()
+def get_product_repository(request: Request) -> ProductRepository:
+    return request.app.state.container.product_repository
@@ -1,34 +1,111 @@
+from typing import Optional, AsyncIterator
 import uuid as uuid_pkg
 
+from fastapi import Request
 from pymongo.errors import PyMongoError
 
-from app.models import ProductType
+from app.models import ProductType, ProductTypeSnapshot
 from app.repositories.base import BaseRepository
+from app.repositories.query_diagnostics import QueryDiagnostics
 from app.repositories.repositories_exceptions import NotFoundError, DatabaseOperationError
 
 
 class ProductTypeRepository(BaseRepository[ProductType]):
-    def __init__(self):
-        super().__init__(ProductType)
+    def __init__(self, diagnostics: Optional[QueryDiagnostics] = None):
+        super().__init__(ProductType, diagnostics=diagnostics)
 
-    async def fetch_single_record(self, reference: uuid_pkg.UUID, **kwargs) -> ProductType:
+    async def fetch_single_record(
+            self,
+            reference: uuid_pkg.UUID,
+            projection: Optional[dict] = None,
+            **kwargs
+    ) -> ProductType | dict:
         try:
-            entity = await self._model.get(reference)
+            if projection is not None:
+                entity = await self._find_one_projected(reference=reference, projection=projection)
+            else:
+                entity = await self._model.get(reference)
             if entity is None:
                 raise NotFoundError(reference)
             return entity
         except PyMongoError as e:
             raise DatabaseOperationError(str(e)) from e
 
-    async def fetch(self, filter_data: dict, **kwargs) -> list[ProductType]:
+    async def fetch(
+            self,
+            filter_data: dict,
+            sort: Optional[list] = None,
+            limit: Optional[int] = None,
+            projection: Optional[dict] = None,
+            rank_by_text_score: bool = False,
+            ranked_keyset: Optional[dict] = None,
+            **kwargs
+    ) -> list[ProductType | dict]:
         try:
-            entities = await self._model.find(filter_data).to_list()
+            if rank_by_text_score:
+                entities = [
+                    entity async for entity in self._find_ranked(
+                        filter_data=filter_data, projection=projection, ranked_keyset=ranked_keyset, limit=limit
+                    )
+                ]
+            elif projection is not None:
+                self._observe_find(filter_data=filter_data, sort=sort, limit=limit)
+                entities = [
+                    entity async for entity in self._find_projected(
+                        filter_data=filter_data, projection=projection, sort=sort, limit=limit
+                    )
+                ]
+            else:
+                self._observe_find(filter_data=filter_data, sort=sort, limit=limit)
+                entities = await self._model.find(filter_data).sort(sort).limit(limit).to_list()
             if not entities:
                 raise NotFoundError(filter_data)
             return entities
         except PyMongoError as e:
             raise DatabaseOperationError(str(e)) from e
 
+    async def iterate(
+            self,
+            filter_data: dict,
+            sort: Optional[list] = None,
+            batch_size: Optional[int] = None,
+            projection: Optional[dict] = None,
+            rank_by_text_score: bool = False,
+            ranked_keyset: Optional[dict] = None,
+            **kwargs
+    ) -> AsyncIterator[ProductType | dict]:
+        try:
+            if rank_by_text_score:
+                cursor = self._find_ranked(
+                    filter_data=filter_data, projection=projection, ranked_keyset=ranked_keyset, batch_size=batch_size
+                )
+            elif projection is not None:
+                self._observe_find(filter_data=filter_data, sort=sort)
+                cursor = self._find_projected(
+                    filter_data=filter_data, projection=projection, sort=sort, batch_size=batch_size
+                )
+            else:
+                self._observe_find(filter_data=filter_data, sort=sort)
+                cursor = self._model.find(filter_data, **({"batch_size": batch_size} if batch_size else {})).sort(sort)
+            async for entity in cursor:
+                yield entity
+        except PyMongoError as e:
+            raise DatabaseOperationError(str(e)) from e
+
+    async def fetch_snapshots(self, reference_ids: list[uuid_pkg.UUID]) -> dict[uuid_pkg.UUID, dict]:
+        try:
+            cursor = self._model.get_pymongo_collection().find(
+                {"_id": {"$in": reference_ids}},
+                {"name": 1, "description": 1, "entity_version": 1}
+            )
+            snapshots = {}
+            async for document in cursor:
+                reference_id = document.pop("_id")
+                snapshots[reference_id] = ProductTypeSnapshot(id=reference_id, **document).model_dump()
+            return snapshots
+        except PyMongoError as e:
+            raise DatabaseOperationError(str(e)) from e
+
 
-def get_product_type_repository() -> ProductTypeRepository:
-    return ProductTypeRepository()
+def get_product_type_repository(request: Request) -> ProductTypeRepository:
+    return request.app.state.container.product_type_repository
@@ -0,0 +1,225 @@
+import asyncio
+import hashlib
+import json
+import random
+import warnings
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Optional, Any
+
+from pymongo.asynchronous.collection import AsyncCollection
+from pymongo.errors import PyMongoError
+
+from app.config import get_settings
+from app.metrics import MetricsRegistry, get_metrics_registry
+
+
+SHAPE_PLACEHOLDER = "?"
+
+
+def normalize_query_shape(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: normalize_query_shape(value[key]) for key in sorted(value)}
+    if isinstance(value, (list, tuple)):
+        shapes = [normalize_query_shape(item) for item in value]
+        if all(not isinstance(item, (dict, list)) for item in shapes):
+            return [SHAPE_PLACEHOLDER]
+        return shapes
+    return SHAPE_PLACEHOLDER
+
+
+def describe_query_shape(collection: str, query: dict, sort: Optional[list], pipeline: bool) -> str:
+    return json.dumps(
+        {
+            "collection": collection,
+            "filter": normalize_query_shape(query),
+            "sort": [field_name for field_name, _ in sort or []],
+            "pipeline": pipeline
+        },
+        sort_keys=True
+    )
+
+
+def summarize_plan(plan: dict) -> str:
+    stage = plan.get("stage", "?")
+    if plan.get("indexName"):
+        stage = f"{stage}({plan['indexName']})"
+    children = [plan["inputStage"]] if "inputStage" in plan else plan.get("inputStages", [])
+    if not children:
+        return stage
+    return f"{stage}>" + "|".join(summarize_plan(child) for child in children)
+
+
+def _find_explain_section(explain: Any, section: str) -> Optional[dict]:
+    if isinstance(explain, dict):
+        if section in explain:
+            return explain[section]
+        for value in explain.values():
+            found = _find_explain_section(value, section)
+            if found is not None:
+                return found
+    elif isinstance(explain, list):
+        for value in explain:
+            found = _find_explain_section(value, section)
+            if found is not None:
+                return found
+    return None
+
+
+@dataclass
+class QueryShapeStats:
+    shape: str
+    samples: int = 0
+    total_execution_time_ms: float = 0.0
+    max_execution_time_ms: float = 0.0
+    total_keys_examined: int = 0
+    total_docs_examined: int = 0
+    total_returned: int = 0
+    winning_plans: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def collection_scan(self) -> bool:
+        return any("COLLSCAN" in plan for plan in self.winning_plans)
+
+    def as_dict(self) -> dict:
+        return {
+            "shape": json.loads(self.shape),
+            "samples": self.samples,
+            "avg_execution_time_ms": self.total_execution_time_ms / self.samples if self.samples else 0.0,
+            "max_execution_time_ms": self.max_execution_time_ms,
+            "avg_keys_examined": self.total_keys_examined / self.samples if self.samples else 0.0,
+            "avg_docs_examined": self.total_docs_examined / self.samples if self.samples else 0.0,
+            "avg_returned": self.total_returned / self.samples if self.samples else 0.0,
+            "winning_plans": self.winning_plans,
+            "collection_scan": self.collection_scan
+        }
+
+
+class QueryDiagnostics:
+    def __init__(
+            self,
+            sample_rate: float,
+            max_concurrent_explains: int,
+            max_shapes: int,
+            metrics_registry: MetricsRegistry
+    ):
+        self._sample_rate = sample_rate
+        self._max_concurrent_explains = max_concurrent_explains
+        self._max_shapes = max_shapes
+        self._stats: dict[str, QueryShapeStats] = {}
+        self._in_flight: set[asyncio.Task] = set()
+        self._explain_samples = metrics_registry.counter(
+            "query_explain_samples_total",
+            "Number of explained query samples per query shape",
+            ["collection", "shape_id", "winning_plan"]
+        )
+        self._execution_time = metrics_registry.histogram(
+            "query_explain_execution_time_ms",
+            "Server execution time reported by explain per query shape",
+            ["collection", "shape_id"]
+        )
+        self._keys_examined = metrics_registry.counter(
+            "query_explain_keys_examined_total",
+            "Index keys examined by explained queries per query shape",
+            ["collection", "shape_id"]
+        )
+        self._docs_examined = metrics_registry.counter(
+            "query_explain_docs_examined_total",
+            "Documents examined by explained queries per query shape",
+            ["collection", "shape_id"]
+        )
+
+    def observe_find(self, collection: AsyncCollection, query: dict, sort: Optional[list], limit: Optional[int]) -> None:
+        command = {"find": collection.name, "filter": query}
+        if sort:
+            command["sort"] = dict(sort)
+        if limit:
+            command["limit"] = limit
+        self._sample(collection=collection, command=command, query=query, sort=sort, pipeline=False)
+
+    def observe_aggregate(self, collection: AsyncCollection, pipeline: list[dict]) -> None:
+        match_stage = pipeline[0].get("$match", {}) if pipeline else {}
+        sort_stage = next((stage["$sort"] for stage in pipeline if "$sort" in stage), {})
+        self._sample(
+            collection=collection,
+            command={"aggregate": collection.name, "pipeline": pipeline, "cursor": {}},
+            query=match_stage,
+            sort=list(sort_stage.items()),
+            pipeline=True
+        )
+
+    def snapshot(self) -> list[dict]:
+        return sorted(
+            (stats.as_dict() for stats in self._stats.values()),
+            key=lambda stats: stats["avg_execution_time_ms"],
+            reverse=True
+        )
+
+    def _sample(self, collection: AsyncCollection, command: dict, query: dict, sort: Optional[list], pipeline: bool) -> None:
+        if random.random() >= self._sample_rate or len(self._in_flight) >= self._max_concurrent_explains:
+            return
+        shape = describe_query_shape(collection=collection.name, query=query, sort=sort, pipeline=pipeline)
+        task = asyncio.create_task(self._explain(collection=collection, command=command, shape=shape))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _explain(self, collection: AsyncCollection, command: dict, shape: str) -> None:
+        try:
+            explain = await collection.database.command({"explain": command, "verbosity": "executionStats"})
+        except PyMongoError as e:
+            warnings.warn(f"Explain failed for query shape {shape}: {e}")
+            return
+        query_planner = _find_explain_section(explain, "queryPlanner") or {}
+        execution_stats = _find_explain_section(explain, "executionStats") or {}
+        winning_plan = query_planner.get("winningPlan", {})
+        self._record(
+            collection=collection.name,
+            shape=shape,
+            winning_plan=summarize_plan(winning_plan.get("queryPlan", winning_plan)),
+            execution_time_ms=float(execution_stats.get("executionTimeMillis", 0)),
+            keys_examined=int(execution_stats.get("totalKeysExamined", 0)),
+            docs_examined=int(execution_stats.get("totalDocsExamined", 0)),
+            returned=int(execution_stats.get("nReturned", 0))
+        )
+
+    def _record(
+            self,
+            collection: str,
+            shape: str,
+            winning_plan: str,
+            execution_time_ms: float,
+            keys_examined: int,
+            docs_examined: int,
+            returned: int
+    ) -> None:
+        stats = self._stats.get(shape)
+        if stats is None:
+            if len(self._stats) >= self._max_shapes:
+                return
+            stats = self._stats[shape] = QueryShapeStats(shape=shape)
+        stats.samples += 1
+        stats.total_execution_time_ms += execution_time_ms
+        stats.max_execution_time_ms = max(stats.max_execution_time_ms, execution_time_ms)
+        stats.total_keys_examined += keys_examined
+        stats.total_docs_examined += docs_examined
+        stats.total_returned += returned
+        stats.winning_plans[winning_plan] = stats.winning_plans.get(winning_plan, 0) + 1
+
+        shape_id = hashlib.sha1(shape.encode("utf-8")).hexdigest()[:12]
+        self._explain_samples.inc(collection=collection, shape_id=shape_id, winning_plan=winning_plan)
+        self._execution_time.observe(execution_time_ms, collection=collection, shape_id=shape_id)
+        self._keys_examined.inc(keys_examined, collection=collection, shape_id=shape_id)
+        self._docs_examined.inc(docs_examined, collection=collection, shape_id=shape_id)
+
+
+@lru_cache
+def get_query_diagnostics() -> Optional[QueryDiagnostics]:
+    settings = get_settings()
+    if not settings.query_diagnostics_enabled:
+        return None
+    return QueryDiagnostics(
+        sample_rate=settings.query_diagnostics_sample_rate,
+        max_concurrent_explains=settings.query_diagnostics_max_concurrent_explains,
+        max_shapes=settings.query_diagnostics_max_shapes,
+        metrics_registry=get_metrics_registry()
+    )
@@ -0,0 +1,78 @@
+from dataclasses import dataclass
+import uuid as uuid_pkg
+
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError, BulkWriteError
+
+from app.models import SearchPrefix
+from app.repositories.repositories_exceptions import DatabaseOperationError
+
+
+DUPLICATE_KEY_ERROR_CODE = 11000
+
+
+@dataclass
+class IndexedLabel:
+    entity_id: uuid_pkg.UUID
+    label: str
+    prefixes: list[str]
+    entity_version: int
+
+
+class SearchPrefixRepository:
+    def __init__(self):
+        self._model = SearchPrefix
+
+    async def sync(self, aggregate_type: str, labels: list[IndexedLabel]) -> None:
+        if not labels:
+            return
+        requests = [
+            UpdateOne(
+                {
+                    "_id": self._key(aggregate_type, label.entity_id),
+                    "entity_version": {"$lte": label.entity_version}
+                },
+                {
+                    "$set": {
+                        "aggregate_type": aggregate_type,
+                        "entity_id": label.entity_id,
+                        "label": label.label,
+                        "prefixes": label.prefixes,
+                        "entity_version": label.entity_version
+                    }
+                },
+                upsert=True
+            )
+            for label in labels
+        ]
+        try:
+            await self._model.get_pymongo_collection().bulk_write(requests, ordered=False)
+        except BulkWriteError as e:
+            if any(error["code"] != DUPLICATE_KEY_ERROR_CODE for error in e.details.get("writeErrors", [])):
+                raise DatabaseOperationError(str(e)) from e
+        except PyMongoError as e:
+            raise DatabaseOperationError(str(e)) from e
+
+    async def remove(self, aggregate_type: str, entity_ids: list[uuid_pkg.UUID]) -> None:
+        if not entity_ids:
+            return
+        try:
+            await self._model.get_pymongo_collection().delete_many(
+                {"_id": {"$in": [self._key(aggregate_type, entity_id) for entity_id in entity_ids]}}
+            )
+        except PyMongoError as e:
+            raise DatabaseOperationError(str(e)) from e
+
+    async def suggest(self, aggregate_type: str, prefixes: list[str], limit: int) -> list[dict]:
+        try:
+            cursor = self._model.get_pymongo_collection().find(
+                {"aggregate_type": aggregate_type, "prefixes": {"$all": prefixes}},
+                {"_id": 0, "entity_id": 1, "label": 1}
+            ).sort("label").limit(limit)
+            return [document async for document in cursor]
+        except PyMongoError as e:
+            raise DatabaseOperationError(str(e)) from e
+
+    @staticmethod
+    def _key(aggregate_type: str, entity_id: uuid_pkg.UUID) -> str:
+        return f"{aggregate_type}:{entity_id}"
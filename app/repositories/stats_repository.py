@@ -0,0 +1,127 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Optional, Tuple
+import uuid as uuid_pkg
+
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+from app.models import ProductTypeStats
+from app.repositories.repositories_exceptions import DatabaseOperationError, NotFoundError
+
+
+@dataclass
+class ProductTypeStatsDelta:
+    product_count: int = 0
+    total_quantity: int = 0
+    price_sum: float = 0
+    lowest_added_price: Optional[float] = None
+    highest_added_price: Optional[float] = None
+    price_removed: bool = False
+
+    def add(self, quantity: int, price: float) -> None:
+        self.product_count += 1
+        self.total_quantity += quantity
+        self.price_sum += price
+        self.lowest_added_price = price if self.lowest_added_price is None else min(self.lowest_added_price, price)
+        self.highest_added_price = price if self.highest_added_price is None else max(self.highest_added_price, price)
+
+    def remove(self, quantity: int, price: float) -> None:
+        self.product_count -= 1
+        self.total_quantity -= quantity
+        self.price_sum -= price
+        self.price_removed = True
+
+
+class StatsRepository:
+    def __init__(self):
+        self._model = ProductTypeStats
+
+    @property
+    def collection_name(self) -> str:
+        return self._model.get_pymongo_collection().name
+
+    async def fetch_all(self) -> list[dict]:
+        try:
+            cursor = self._model.get_pymongo_collection().find({"product_count": {"$gt": 0}}).sort("_id")
+            return [document async for document in cursor]
+        except PyMongoError as e:
+            raise DatabaseOperationError(str(e)) from e
+
+    async def fetch_single_record(self, reference: uuid_pkg.UUID) -> dict:
+        try:
+            document = await self._model.get_pymongo_collection().find_one(
+                {"_id": reference, "product_count": {"$gt": 0}}
+            )
+            if document is None:
+                raise NotFoundError(reference)
+            return document
+        except PyMongoError as e:
+            raise DatabaseOperationError(str(e)) from e
+
+    async def apply_deltas(self, deltas: dict[uuid_pkg.UUID, ProductTypeStatsDelta]) -> None:
+        if not deltas:
+            return
+        requests = [
+            UpdateOne({"_id": product_type_id}, self._delta_update(delta), upsert=True)
+            for product_type_id, delta in deltas.items()
+        ]
+        try:
+            collection = self._model.get_pymongo_collection()
+            await collection.bulk_write(requests, ordered=False)
+            await collection.delete_many({"_id": {"$in": list(deltas)}, "product_count": {"$lte": 0}})
+        except PyMongoError as e:
+            raise DatabaseOperationError(str(e)) from e
+
+    async def fetch_bounds_versions(self, product_type_ids: list[uuid_pkg.UUID]) -> dict[uuid_pkg.UUID, int]:
+        try:
+            cursor = self._model.get_pymongo_collection().find(
+                {"_id": {"$in": product_type_ids}},
+                {"bounds_version": 1}
+            )
+            return {document["_id"]: document.get("bounds_version", 0) async for document in cursor}
+        except PyMongoError as e:
+            raise DatabaseOperationError(str(e)) from e
+
+    async def set_price_bounds(
+            self,
+            bounds: dict[uuid_pkg.UUID, Tuple[Optional[float], Optional[float]]],
+            bounds_versions: dict[uuid_pkg.UUID, int]
+    ) -> list[uuid_pkg.UUID]:
+        product_type_ids = [product_type_id for product_type_id in bounds if product_type_id in bounds_versions]
+        if not product_type_ids:
+            return []
+        collection = self._model.get_pymongo_collection()
+        try:
+            results = await asyncio.gather(*(
+                collection.update_one(
+                    {"_id": product_type_id, "bounds_version": bounds_versions[product_type_id]},
+                    {
+                        "$set": {"min_price": bounds[product_type_id][0], "max_price": bounds[product_type_id][1]},
+                        "$inc": {"bounds_version": 1}
+                    }
+                )
+                for product_type_id in product_type_ids
+            ))
+        except PyMongoError as e:
+            raise DatabaseOperationError(str(e)) from e
+        return [
+            product_type_id
+            for product_type_id, result in zip(product_type_ids, results)
+            if result.matched_count == 0
+        ]
+
+    @staticmethod
+    def _delta_update(delta: ProductTypeStatsDelta) -> dict:
+        update = {
+            "$inc": {
+                "product_count": delta.product_count,
+                "total_quantity": delta.total_quantity,
+                "price_sum": delta.price_sum,
+                "bounds_version": 1
+            }
+        }
+        if delta.lowest_added_price is not None:
+            update["$min"] = {"min_price": delta.lowest_added_price}
+            update["$max"] = {"max_price": delta.highest_added_price}
+        return update
@@ -1,29 +1,56 @@
+from typing import Optional
+
 from pydantic import ValidationError
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.encoders import jsonable_encoder
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, StreamingResponse, PlainTextResponse
 import uuid as uuid_pkg
 
+from app.config import Settings, get_settings
+from app.metrics import MetricsRegistry, get_metrics_registry, PROMETHEUS_CONTENT_TYPE
+
+from app.r_services.change_feed import ChangeFeed, get_change_feed
 from app.r_services.product_service import ProductService, get_product_service
 from app.r_services.product_type_service import get_product_type_service, ProductTypeService
-from app.r_services.services_exceptions import DBException
+from app.r_services.stats_service import StatsService, get_stats_service
+from app.r_services.services_exceptions import DBException, InvalidCursorError, InvalidFieldSelectionError, \
+    InvalidSearchError
+from app.repositories.query_diagnostics import QueryDiagnostics, get_query_diagnostics
 from app.repositories.repositories_exceptions import NotFoundError
+from app.schemas.base_schemas import SuggestDTO
 from app.schemas.product_schemas import ProductFetch
 from app.schemas.product_type_schemas import ProductTypeFetch
+from app.streaming import resolve_stream_media_type, stream_chunks, json_response, etag_matches, \
+    not_modified_response, sse_chunks, SSE_MEDIA_TYPE, SSE_HEADERS
 
 r_router = APIRouter(prefix="/api/v1/r")
+metrics_router = APIRouter()
 
 
 @r_router.get("/products/")
 async def get_product_list(
+        request: Request,
+        stream: bool = False,
         product_filters: ProductFetch = Depends(),
-        product_service: ProductService = Depends(get_product_service)
+        product_service: ProductService = Depends(get_product_service),
+        settings: Settings = Depends(get_settings)
 ):
     try:
-        data = await product_service.fetch(filter_data=product_filters)
-        json_compatible_data = jsonable_encoder(data)
-        return JSONResponse(content=json_compatible_data)
-    except (ValidationError, NotFoundError) as e:
+        stream_media_type = resolve_stream_media_type(request=request, stream=stream)
+        if stream_media_type:
+            items = await product_service.stream(filter_data=product_filters, batch_size=settings.stream_batch_size)
+            return StreamingResponse(
+                content=stream_chunks(items=items, media_type=stream_media_type, batch_size=settings.stream_batch_size),
+                media_type=stream_media_type
+            )
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            etag = await product_service.fetch_page_etag(filter_data=product_filters)
+            if etag_matches(if_none_match=if_none_match, etag=etag):
+                return not_modified_response(etag)
+        tagged = await product_service.fetch_tagged(filter_data=product_filters)
+        return json_response(tagged.value, etag=tagged.etag)
+    except (ValidationError, NotFoundError, InvalidCursorError, InvalidFieldSelectionError, InvalidSearchError) as e:
         raise HTTPException(
             status_code=400,
             detail=str(e)
@@ -35,16 +62,67 @@ async def get_product_list(
         )
 
 
+@r_router.get("/products/autocomplete")
+async def get_product_suggestions(
+        suggest_filter: SuggestDTO = Depends(),
+        product_service: ProductService = Depends(get_product_service)
+):
+    try:
+        data = await product_service.suggest(data=suggest_filter)
+        return json_response(data)
+    except DBException as e:
+        raise HTTPException(
+            status_code=500,
+            detail=str(e)
+        )
+
+
+@r_router.get("/products/subscribe")
+async def subscribe_products(
+        product_filters: ProductFetch = Depends(),
+        product_service: ProductService = Depends(get_product_service),
+        change_feed: Optional[ChangeFeed] = Depends(get_change_feed),
+        settings: Settings = Depends(get_settings)
+):
+    if change_feed is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Live updates are disabled, set LIVE_UPDATES_ENABLED and RABBIT_MQ_HOST to enable them"
+        )
+    try:
+        subscription = product_service.subscribe(change_feed=change_feed, filter_data=product_filters)
+    except InvalidFieldSelectionError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=str(e)
+        )
+    return StreamingResponse(
+        content=sse_chunks(
+            next_event=subscription.next_event,
+            on_close=subscription.close,
+            heartbeat_interval_s=settings.live_updates_heartbeat_s
+        ),
+        media_type=SSE_MEDIA_TYPE,
+        headers=SSE_HEADERS
+    )
+
+
 @r_router.get("/product/{product_id}")
 async def get_product(
+        request: Request,
         product_id: uuid_pkg.UUID,
+        fields: Optional[str] = None,
         product_service: ProductService = Depends(get_product_service)
 ):
     try:
-        data = await product_service.fetch_single_record(reference_id=product_id)
-        json_compatible_data = jsonable_encoder(data)
-        return JSONResponse(content=json_compatible_data)
-    except (ValidationError, NotFoundError) as e:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            etag = await product_service.fetch_etag(reference_id=product_id, fields=fields)
+            if etag_matches(if_none_match=if_none_match, etag=etag):
+                return not_modified_response(etag)
+        tagged = await product_service.fetch_tagged_record(reference_id=product_id, fields=fields)
+        return json_response(tagged.value, etag=tagged.etag)
+    except (ValidationError, NotFoundError, InvalidFieldSelectionError) as e:
         raise HTTPException(
             status_code=400,
             detail=str(e)
@@ -58,14 +136,31 @@ async def get_product(
 
 @r_router.get("/product-types/")
 async def get_product_type_list(
+        request: Request,
+        stream: bool = False,
         product_type_filter: ProductTypeFetch = Depends(),
-        product_type_service: ProductTypeService = Depends(get_product_type_service)
+        product_type_service: ProductTypeService = Depends(get_product_type_service),
+        settings: Settings = Depends(get_settings)
 ):
     try:
-        data = await product_type_service.fetch(filter_data=product_type_filter)
-        json_compatible_data = jsonable_encoder(data)
-        return JSONResponse(content=json_compatible_data)
-    except (ValidationError, NotFoundError) as e:
+        stream_media_type = resolve_stream_media_type(request=request, stream=stream)
+        if stream_media_type:
+            items = await product_type_service.stream(
+                filter_data=product_type_filter,
+                batch_size=settings.stream_batch_size
+            )
+            return StreamingResponse(
+                content=stream_chunks(items=items, media_type=stream_media_type, batch_size=settings.stream_batch_size),
+                media_type=stream_media_type
+            )
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            etag = await product_type_service.fetch_page_etag(filter_data=product_type_filter)
+            if etag_matches(if_none_match=if_none_match, etag=etag):
+                return not_modified_response(etag)
+        tagged = await product_type_service.fetch_tagged(filter_data=product_type_filter)
+        return json_response(tagged.value, etag=tagged.etag)
+    except (ValidationError, NotFoundError, InvalidCursorError, InvalidFieldSelectionError, InvalidSearchError) as e:
         raise HTTPException(
             status_code=400,
             detail=str(e)
@@ -77,16 +172,67 @@ async def get_product_type_list(
         )
 
 
+@r_router.get("/product-types/autocomplete")
+async def get_product_type_suggestions(
+        suggest_filter: SuggestDTO = Depends(),
+        product_type_service: ProductTypeService = Depends(get_product_type_service)
+):
+    try:
+        data = await product_type_service.suggest(data=suggest_filter)
+        return json_response(data)
+    except DBException as e:
+        raise HTTPException(
+            status_code=500,
+            detail=str(e)
+        )
+
+
+@r_router.get("/product-types/subscribe")
+async def subscribe_product_types(
+        product_type_filter: ProductTypeFetch = Depends(),
+        product_type_service: ProductTypeService = Depends(get_product_type_service),
+        change_feed: Optional[ChangeFeed] = Depends(get_change_feed),
+        settings: Settings = Depends(get_settings)
+):
+    if change_feed is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Live updates are disabled, set LIVE_UPDATES_ENABLED and RABBIT_MQ_HOST to enable them"
+        )
+    try:
+        subscription = product_type_service.subscribe(change_feed=change_feed, filter_data=product_type_filter)
+    except InvalidFieldSelectionError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=str(e)
+        )
+    return StreamingResponse(
+        content=sse_chunks(
+            next_event=subscription.next_event,
+            on_close=subscription.close,
+            heartbeat_interval_s=settings.live_updates_heartbeat_s
+        ),
+        media_type=SSE_MEDIA_TYPE,
+        headers=SSE_HEADERS
+    )
+
+
 @r_router.get("/product-type/{product_type_id}")
 async def get_product_type(
+        request: Request,
         product_type_id: uuid_pkg.UUID,
+        fields: Optional[str] = None,
         product_typ_service: ProductTypeService = Depends(get_product_type_service)
 ):
     try:
-        data = await product_typ_service.fetch_single_record(reference_id=product_type_id)
-        json_compatible_data = jsonable_encoder(data)
-        return JSONResponse(content=json_compatible_data)
-    except (ValidationError, NotFoundError) as e:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            etag = await product_typ_service.fetch_etag(reference_id=product_type_id, fields=fields)
+            if etag_matches(if_none_match=if_none_match, etag=etag):
+                return not_modified_response(etag)
+        tagged = await product_typ_service.fetch_tagged_record(reference_id=product_type_id, fields=fields)
+        return json_response(tagged.value, etag=tagged.etag)
+    except (ValidationError, NotFoundError, InvalidFieldSelectionError) as e:
         raise HTTPException(
             status_code=400,
             detail=str(e)
@@ -96,3 +242,70 @@ async def get_product_type(
             status_code=500,
             detail=str(e)
         )
+
+
+@r_router.get("/stats/catalogue")
+async def get_catalogue_stats(
+        stats_service: StatsService = Depends(get_stats_service)
+):
+    try:
+        data = await stats_service.fetch_catalogue_stats()
+        return json_response(data)
+    except DBException as e:
+        raise HTTPException(
+            status_code=500,
+            detail=str(e)
+        )
+
+
+@r_router.get("/stats/product-types")
+async def get_product_type_stats_list(
+        stats_service: StatsService = Depends(get_stats_service)
+):
+    try:
+        data = await stats_service.fetch_product_type_stats()
+        return json_response(data)
+    except DBException as e:
+        raise HTTPException(
+            status_code=500,
+            detail=str(e)
+        )
+
+
+@r_router.get("/stats/product-types/{product_type_id}")
+async def get_product_type_stats(
+        product_type_id: uuid_pkg.UUID,
+        stats_service: StatsService = Depends(get_stats_service)
+):
+    try:
+        data = await stats_service.fetch_single_product_type_stats(product_type_id=product_type_id)
+        return json_response(data)
+    except NotFoundError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=str(e)
+        )
+    except DBException as e:
+        raise HTTPException(
+            status_code=500,
+            detail=str(e)
+        )
+
+
+@r_router.get("/admin/query-stats")
+async def get_query_stats(
+        diagnostics: Optional[QueryDiagnostics] = Depends(get_query_diagnostics)
+):
+    if diagnostics is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Query diagnostics are disabled, set QUERY_DIAGNOSTICS_ENABLED to enable them"
+        )
+    return JSONResponse(content=jsonable_encoder(diagnostics.snapshot()))
+
+
+@metrics_router.get("/metrics")
+async def get_metrics(
+        registry: MetricsRegistry = Depends(get_metrics_registry)
+):
+    return PlainTextResponse(content=registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
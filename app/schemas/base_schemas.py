@@ -1,9 +1,17 @@
-from typing import Optional
+from typing import Optional, Generic, TypeVar, List
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 import uuid as uuid_pkg
 
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+DEFAULT_SUGGESTION_LIMIT = 10
+MAX_SUGGESTION_LIMIT = 50
+
+ItemSchema = TypeVar('ItemSchema', bound=BaseModel)
+
+
 class OutputDTO(BaseModel):
     id: uuid_pkg.UUID
     name: str
@@ -12,11 +20,35 @@ class OutputDTO(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class PageOut(BaseModel, Generic[ItemSchema]):
+    items: List[ItemSchema]
+    next_cursor: Optional[str] = None
+
+
 class FetchDTO(BaseModel):
     name: Optional[str] = None
+    limit: int = Field(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+    after: Optional[str] = None
+    sort_by: Optional[str] = None
+    fields: Optional[str] = None
+
+
+class SuggestDTO(BaseModel):
+    q: str = Field(..., min_length=1, max_length=100)
+    limit: int = Field(default=DEFAULT_SUGGESTION_LIMIT, ge=1, le=MAX_SUGGESTION_LIMIT)
+
+
+class SuggestionOut(BaseModel):
+    id: uuid_pkg.UUID
+    name: str
+
+
+class SuggestionsOut(BaseModel):
+    items: List[SuggestionOut]
 
 
 class CreateDTO(BaseModel):
+    id: Optional[uuid_pkg.UUID] = None
     name: str
     entity_version: int
 
@@ -1,7 +1,9 @@
 from enum import Enum, StrEnum
-from typing import Literal, Union
+from functools import lru_cache
+from typing import Literal, Union, List, Optional, Annotated
+import uuid as uuid_pkg
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
 
 from app.schemas.product_schemas import ProductUpdate, ProductCreate, ProductDelete
 from app.schemas.product_type_schemas import ProductTypeUpdate, ProductTypeCreate, ProductTypeDelete
@@ -13,7 +15,16 @@ class AggregateType(str, Enum):
     DELETE = "delete"
 
 
+class WorkerTypes(StrEnum):
+    Product = 'product'
+    ProductType = 'producttype'
+
+
+WorkerTypeValue = Literal[tuple(member.value for member in WorkerTypes)]
+
+
 class OutboxEventDTO(BaseModel):
+    aggregate_type: Optional[WorkerTypes] = None
     event_type: AggregateType
     payload: Union[
         ProductCreate,
@@ -27,9 +38,69 @@ class OutboxEventDTO(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
-class WorkerTypes(StrEnum):
-    Product = 'product'
-    ProductType = 'producttype'
+class ProductCreateEvent(OutboxEventDTO):
+    aggregate_type: Literal[WorkerTypes.Product] = WorkerTypes.Product
+    event_type: Literal[AggregateType.CREATE]
+    payload: ProductCreate
 
 
-WorkerTypeValue = Literal[tuple(member.value for member in WorkerTypes)]
+class ProductUpdateEvent(OutboxEventDTO):
+    aggregate_type: Literal[WorkerTypes.Product] = WorkerTypes.Product
+    event_type: Literal[AggregateType.UPDATE]
+    payload: ProductUpdate
+
+
+class ProductDeleteEvent(OutboxEventDTO):
+    aggregate_type: Literal[WorkerTypes.Product] = WorkerTypes.Product
+    event_type: Literal[AggregateType.DELETE]
+    payload: ProductDelete
+
+
+class ProductTypeCreateEvent(OutboxEventDTO):
+    aggregate_type: Literal[WorkerTypes.ProductType] = WorkerTypes.ProductType
+    event_type: Literal[AggregateType.CREATE]
+    payload: ProductTypeCreate
+
+
+class ProductTypeUpdateEvent(OutboxEventDTO):
+    aggregate_type: Literal[WorkerTypes.ProductType] = WorkerTypes.ProductType
+    event_type: Literal[AggregateType.UPDATE]
+    payload: ProductTypeUpdate
+
+
+class ProductTypeDeleteEvent(OutboxEventDTO):
+    aggregate_type: Literal[WorkerTypes.ProductType] = WorkerTypes.ProductType
+    event_type: Literal[AggregateType.DELETE]
+    payload: ProductTypeDelete
+
+
+ProductOutboxEvent = Annotated[
+    Union[ProductCreateEvent, ProductUpdateEvent, ProductDeleteEvent],
+    Field(discriminator="event_type")
+]
+ProductTypeOutboxEvent = Annotated[
+    Union[ProductTypeCreateEvent, ProductTypeUpdateEvent, ProductTypeDeleteEvent],
+    Field(discriminator="event_type")
+]
+
+
+@lru_cache
+def get_outbox_event_adapter(worker_type: WorkerTypes) -> TypeAdapter[OutboxEventDTO]:
+    match worker_type:
+        case WorkerTypes.Product:
+            return TypeAdapter(ProductOutboxEvent)
+        case WorkerTypes.ProductType:
+            return TypeAdapter(ProductTypeOutboxEvent)
+        case _:
+            raise ValueError(f"Unknown worker type: {worker_type}")
+
+
+class EntityChangedDTO(BaseModel):
+    aggregate_type: WorkerTypes
+    event_type: AggregateType
+    id: uuid_pkg.UUID
+    entity_version: int
+
+
+class EntityChangesDTO(BaseModel):
+    changes: List[EntityChangedDTO]
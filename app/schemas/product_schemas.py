@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Optional, Literal
 
 import uuid as uuid_pkg
 
@@ -30,6 +30,7 @@ class ProductFetch(FetchDTO):
     gt_price: Optional[float] = None
     lt_price: Optional[float] = None
     product_type_id: Optional[uuid_pkg.UUID] = None
+    sort_by: Optional[Literal["name", "price", "quantity", "relevance"]] = None
 
 
 class ProductCreate(CreateDTO):
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Optional, Literal
 
 from app.schemas.base_schemas import FetchDTO, UpdateDTO, CreateDTO, DeleteDTO, OutputDTO
 
@@ -9,6 +9,7 @@ class ProductTypeOut(OutputDTO):
 
 class ProductTypeFetch(FetchDTO):
     description: Optional[str] = None
+    sort_by: Optional[Literal["name", "relevance"]] = None
 
 
 class ProductTypeCreate(CreateDTO):
@@ -0,0 +1,27 @@
+from typing import Optional, List
+
+from pydantic import BaseModel
+import uuid as uuid_pkg
+
+
+class ProductTypeStatsOut(BaseModel):
+    product_type_id: uuid_pkg.UUID
+    product_type_name: Optional[str] = None
+    product_count: int
+    total_quantity: int
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    avg_price: Optional[float] = None
+
+
+class ProductTypeStatsListOut(BaseModel):
+    items: List[ProductTypeStatsOut]
+
+
+class CatalogueStatsOut(BaseModel):
+    product_type_count: int
+    product_count: int
+    total_quantity: int
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    avg_price: Optional[float] = None
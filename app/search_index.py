@@ -0,0 +1,70 @@
+import argparse
+import asyncio
+from typing import Type
+
+from beanie import Document, init_beanie
+
+from app.config import get_maintenance_settings
+from app.db_handler.async_db_handler import AsyncDatabaseClient
+from app.models import DOCUMENT_MODELS, Product, ProductType
+from app.r_services.search_prefixes import label_prefixes
+from app.repositories.search_prefix_repository import SearchPrefixRepository, IndexedLabel
+from app.schemas.db_sync_schema import WorkerTypes
+
+
+REBUILD_BATCH_SIZE = 500
+
+INDEXED_MODELS: dict[WorkerTypes, Type[Document]] = {
+    WorkerTypes.Product: Product,
+    WorkerTypes.ProductType: ProductType
+}
+
+
+async def rebuild(search_prefix_repository: SearchPrefixRepository, aggregate_type: WorkerTypes) -> int:
+    cursor = INDEXED_MODELS[aggregate_type].get_pymongo_collection().find(
+        {},
+        {"name": 1, "entity_version": 1}
+    ).batch_size(REBUILD_BATCH_SIZE)
+    indexed = 0
+    batch = []
+    async for document in cursor:
+        batch.append(IndexedLabel(
+            entity_id=document["_id"],
+            label=document["name"],
+            prefixes=label_prefixes(document["name"]),
+            entity_version=document["entity_version"]
+        ))
+        if len(batch) >= REBUILD_BATCH_SIZE:
+            await search_prefix_repository.sync(aggregate_type=aggregate_type.value, labels=batch)
+            indexed += len(batch)
+            batch = []
+    await search_prefix_repository.sync(aggregate_type=aggregate_type.value, labels=batch)
+    indexed += len(batch)
+    print(f"Indexed search prefixes for {indexed} {aggregate_type.value} document(s)")
+    return indexed
+
+
+async def main(aggregate_types: list[WorkerTypes]) -> int:
+    settings = get_maintenance_settings()
+    async_db_client = AsyncDatabaseClient(connection_string=settings.db_async_connection_string)
+    try:
+        await init_beanie(database=async_db_client.db_client.get_database(), document_models=DOCUMENT_MODELS)
+
+        search_prefix_repository = SearchPrefixRepository()
+        for aggregate_type in aggregate_types:
+            await rebuild(search_prefix_repository=search_prefix_repository, aggregate_type=aggregate_type)
+        return 0
+    finally:
+        await async_db_client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the autocomplete prefix index from the read models")
+    parser.add_argument(
+        "aggregate_types",
+        nargs="*",
+        choices=[member.value for member in WorkerTypes],
+        default=[member.value for member in WorkerTypes]
+    )
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(main(aggregate_types=[WorkerTypes(value) for value in args.aggregate_types])))
@@ -0,0 +1,121 @@
+import asyncio
+import logging
+from typing import AsyncIterator, Optional, Callable, Awaitable
+
+from fastapi import Request
+from pydantic import BaseModel
+from pydantic_core import to_json
+from starlette.responses import Response
+
+from app.r_services.services_exceptions import DBException
+
+
+stream_logger = logging.getLogger("app.streaming")
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+JSON_MEDIA_TYPE = "application/json"
+SSE_MEDIA_TYPE = "text/event-stream"
+SSE_HEARTBEAT = b": keep-alive\n\n"
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def resolve_stream_media_type(request: Request, stream: bool) -> Optional[str]:
+    if NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+        return NDJSON_MEDIA_TYPE
+    if stream:
+        return JSON_MEDIA_TYPE
+    return None
+
+
+def json_response(data: BaseModel, etag: Optional[str] = None) -> Response:
+    return Response(
+        content=to_json(data),
+        media_type=JSON_MEDIA_TYPE,
+        headers={"ETag": etag} if etag else None
+    )
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+
+def not_modified_response(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+def stream_error(e: DBException) -> bytes:
+    stream_logger.error("Database error after the stream started, ending it with an error record: %s", e)
+    return to_json({"error": str(e)})
+
+
+async def ndjson_chunks(items: AsyncIterator[BaseModel], batch_size: int) -> AsyncIterator[bytes]:
+    batch = bytearray()
+    batch_count = 0
+    try:
+        async for item in items:
+            batch += to_json(item)
+            batch += b"\n"
+            batch_count += 1
+            if batch_count >= batch_size:
+                yield bytes(batch)
+                batch.clear()
+                batch_count = 0
+    except DBException as e:
+        batch += stream_error(e)
+        batch += b"\n"
+    if batch:
+        yield bytes(batch)
+
+
+async def json_array_chunks(items: AsyncIterator[BaseModel], batch_size: int) -> AsyncIterator[bytes]:
+    batch = bytearray(b"[")
+    batch_count = 0
+    separator = b""
+    try:
+        async for item in items:
+            batch += separator
+            batch += to_json(item)
+            separator = b","
+            batch_count += 1
+            if batch_count >= batch_size:
+                yield bytes(batch)
+                batch.clear()
+                batch_count = 0
+    except DBException as e:
+        batch += separator
+        batch += stream_error(e)
+    batch += b"]"
+    yield bytes(batch)
+
+
+def stream_chunks(items: AsyncIterator[BaseModel], media_type: str, batch_size: int) -> AsyncIterator[bytes]:
+    if media_type == NDJSON_MEDIA_TYPE:
+        return ndjson_chunks(items=items, batch_size=batch_size)
+    return json_array_chunks(items=items, batch_size=batch_size)
+
+
+def sse_frame(event: str, event_id: str, data: bytes) -> bytes:
+    return b"event: " + event.encode("utf-8") + b"\nid: " + event_id.encode("utf-8") + b"\ndata: " + data + b"\n\n"
+
+
+async def sse_chunks(
+        next_event: Callable[[], Awaitable[Optional[bytes]]],
+        on_close: Callable[[], None],
+        heartbeat_interval_s: float
+) -> AsyncIterator[bytes]:
+    try:
+        yield SSE_HEARTBEAT
+        while True:
+            try:
+                frame = await asyncio.wait_for(next_event(), timeout=heartbeat_interval_s)
+            except asyncio.TimeoutError:
+                yield SSE_HEARTBEAT
+                continue
+            if frame is None:
+                return
+            yield frame
+    finally:
+        on_close()
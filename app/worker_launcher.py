@@ -0,0 +1,88 @@
+import argparse
+import asyncio
+import os
+import signal
+import sys
+from typing import Optional
+
+from app.config import get_worker_settings
+from app.db_sync.partitions import parse_partitions, split_partitions
+
+
+RESTART_BACKOFF_S = 1.0
+MAX_RESTART_BACKOFF_S = 30.0
+
+
+class WorkerProcess:
+    def __init__(self, worker_type: str, partitions: list[int], metrics_port: Optional[int]):
+        self._environment = {
+            **os.environ,
+            "WORKER_TYPE": worker_type,
+            "WORKER_PARTITIONS": ",".join(str(partition) for partition in partitions)
+        }
+        if metrics_port:
+            self._environment["WORKER_METRICS_PORT"] = str(metrics_port)
+        self._process: Optional[asyncio.subprocess.Process] = None
+
+    async def run(self, stopping: asyncio.Event) -> None:
+        backoff_s = RESTART_BACKOFF_S
+        while not stopping.is_set():
+            self._process = await asyncio.create_subprocess_exec(
+                sys.executable, "-m", "app.worker_runner",
+                env=self._environment
+            )
+            return_code = await self._process.wait()
+            if stopping.is_set():
+                return
+            print(
+                f"Worker for partitions {self._environment['WORKER_PARTITIONS']} exited with {return_code}, "
+                f"restarting in {backoff_s:.0f}s"
+            )
+            try:
+                await asyncio.wait_for(stopping.wait(), timeout=backoff_s)
+            except asyncio.TimeoutError:
+                backoff_s = min(backoff_s * 2, MAX_RESTART_BACKOFF_S)
+
+    def signal(self, sig: signal.Signals) -> None:
+        if self._process is not None and self._process.returncode is None:
+            self._process.send_signal(sig)
+
+
+async def main(worker_type: str, process_count: Optional[int]) -> int:
+    settings = get_worker_settings()
+    if not settings.partition_count:
+        print("ERROR: WORKER_PARTITION_COUNT environment variable is not set")
+        return 1
+
+    claimed = parse_partitions(spec=settings.partitions, partition_count=settings.partition_count)
+    process_count = process_count or min(os.cpu_count() or 1, len(claimed))
+    workers = [
+        WorkerProcess(
+            worker_type=worker_type,
+            partitions=partitions,
+            metrics_port=settings.metrics_port + process_index if settings.metrics_port else None
+        )
+        for process_index, partitions in enumerate(split_partitions(claimed, process_count))
+    ]
+
+    stopping = asyncio.Event()
+
+    def shutdown(sig: signal.Signals) -> None:
+        stopping.set()
+        for worker in workers:
+            worker.signal(sig)
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, shutdown, sig)
+
+    await asyncio.gather(*(worker.run(stopping) for worker in workers))
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run several partitioned sync workers of one type on this host")
+    parser.add_argument("--worker-type", default=os.getenv("WORKER_TYPE"), required=not os.getenv("WORKER_TYPE"))
+    parser.add_argument("--processes", type=int, help="defaults to one per core, capped at the claimed partitions")
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(main(worker_type=args.worker_type, process_count=args.processes)))
@@ -5,8 +5,11 @@ import sys
 
 from app.config import get_worker_settings
 from app.db_handler.async_db_handler import AsyncDatabaseClient
-from app.db_sync.mq_client import get_async_mq_client
+from app.db_handler.base import pool_options
+from app.db_sync.metrics_server import MetricsServer
+from app.db_sync.mq_client import get_async_mq_client, get_entity_changes_mq_client
 from app.db_sync.worker_factory import WorkerFactory
+from app.metrics import get_metrics_registry
 from app.r_services.service_factory import ServiceFactory
 
 
@@ -14,7 +17,8 @@ async def main(worker_type: str) -> None:
     settings = get_worker_settings()
 
     mongo_async_client = AsyncDatabaseClient(
-        connection_string=settings.db_async_connection_string
+        connection_string=settings.db_async_connection_string,
+        **pool_options(settings, process_name=f"worker_{worker_type}")
     )
 
     async_mq_client = get_async_mq_client(
@@ -24,15 +28,39 @@ async def main(worker_type: str) -> None:
 
     worker_factory = WorkerFactory(
         async_mq_client=async_mq_client,
-        service_factory=ServiceFactory(),
-        async_mongo_client=mongo_async_client
+        service_factory=ServiceFactory(product_type_denormalized=settings.product_type_denormalized),
+        async_mongo_client=mongo_async_client,
+        entity_changes_mq_client=get_entity_changes_mq_client(
+            settings=settings,
+            subscribe=False
+        ),
+        ack_batch_size=settings.ack_batch_size,
+        ack_flush_interval_ms=settings.ack_flush_interval_ms,
+        batch_size=settings.sync_batch_size,
+        batch_window_ms=settings.sync_batch_window_ms,
+        reorder_buffer_size=settings.reorder_buffer_size,
+        reorder_timeout_ms=settings.reorder_timeout_ms,
+        slow_message_threshold_ms=settings.slow_message_threshold_ms,
+        outbox_timestamp_header=settings.outbox_timestamp_header,
+        metrics_server=MetricsServer(
+            metrics_registry=get_metrics_registry(),
+            host=settings.metrics_host,
+            port=settings.metrics_port
+        ) if settings.metrics_port else None
     )
 
     worker = worker_factory.create_worker(worker_type=worker_type)
 
+    shutdown_tasks: set[asyncio.Task] = set()
+
+    def shutdown(sig: signal.Signals) -> None:
+        shutdown_task = asyncio.create_task(worker.handle_shutdown_signal(sig.name))
+        shutdown_tasks.add(shutdown_task)
+        shutdown_task.add_done_callback(shutdown_tasks.discard)
+
     loop = asyncio.get_running_loop()
     for sig in (signal.SIGINT, signal.SIGTERM):
-        loop.add_signal_handler(sig, lambda s=sig: worker.handle_shutdown_signal(s))
+        loop.add_signal_handler(sig, shutdown, sig)
 
     await worker.sync_db()
 
@@ -0,0 +1,66 @@
+import math
+import time
+from dataclasses import dataclass, field
+
+from beanie import init_beanie
+
+from app.db_handler.async_db_handler import AsyncDatabaseClient
+from app.models import DOCUMENT_MODELS
+
+
+def percentile(sorted_values: list[float], quantile: float) -> float:
+    if not sorted_values:
+        return math.nan
+    index = min(int(math.ceil(quantile * len(sorted_values))) - 1, len(sorted_values) - 1)
+    return sorted_values[max(index, 0)]
+
+
+@dataclass
+class LatencyReport:
+    name: str
+    latencies_ms: list[float] = field(default_factory=list)
+    errors: int = 0
+    started_at: float = field(default_factory=time.perf_counter)
+    finished_at: float = 0.0
+
+    def record(self, latency_ms: float, ok: bool) -> None:
+        self.latencies_ms.append(latency_ms)
+        if not ok:
+            self.errors += 1
+
+    def finish(self) -> "LatencyReport":
+        self.finished_at = time.perf_counter()
+        return self
+
+    @property
+    def elapsed_s(self) -> float:
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    def summary(self) -> dict:
+        latencies = sorted(self.latencies_ms)
+        return {
+            "scenario": self.name,
+            "requests": len(latencies),
+            "errors": self.errors,
+            "rps": len(latencies) / self.elapsed_s if self.elapsed_s else math.nan,
+            "p50_ms": percentile(latencies, 0.50),
+            "p95_ms": percentile(latencies, 0.95),
+            "p99_ms": percentile(latencies, 0.99),
+        }
+
+
+def print_reports(reports: list[dict]) -> None:
+    header = f"{'scenario':<32}{'requests':>10}{'errors':>8}{'rps':>10}{'p50_ms':>10}{'p95_ms':>10}{'p99_ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for report in reports:
+        print(
+            f"{report['scenario']:<32}{report['requests']:>10}{report['errors']:>8}{report['rps']:>10.1f}"
+            f"{report['p50_ms']:>10.2f}{report['p95_ms']:>10.2f}{report['p99_ms']:>10.2f}"
+        )
+
+
+async def connect_database(connection_string: str) -> AsyncDatabaseClient:
+    async_db_client = AsyncDatabaseClient(connection_string=connection_string)
+    await init_beanie(database=async_db_client.db_client.get_database(), document_models=DOCUMENT_MODELS)
+    return async_db_client
@@ -0,0 +1,153 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+import httpx
+
+from app.models import Product, ProductType
+from benchmarks.common import LatencyReport, connect_database, print_reports
+
+
+@dataclass
+class Scenario:
+    name: str
+    paths: list[str]
+
+
+def build_scenarios(product_ids: list, product_type_ids: list) -> list[Scenario]:
+    products = "/api/v1/r/products/"
+    return [
+        Scenario("products_list", [products]),
+        Scenario("products_list_limit_500", [f"{products}?limit=500"]),
+        Scenario("products_sort_price", [f"{products}?sort_by=price"]),
+        Scenario("products_price_range", [f"{products}?gt_price=100&lt_price=1000"]),
+        Scenario("products_price_range_sorted", [f"{products}?gt_price=100&lt_price=1000&sort_by=price"]),
+        Scenario("products_quantity", [f"{products}?quantity={quantity}" for quantity in range(0, 1000, 37)]),
+        Scenario("products_by_type", [f"{products}?product_type_id={type_id}" for type_id in product_type_ids]),
+        Scenario(
+            "products_by_type_price_sorted",
+            [f"{products}?product_type_id={type_id}&lt_price=2500&sort_by=price" for type_id in product_type_ids]
+        ),
+        Scenario("products_text_search", [f"{products}?name={word}" for word in ("steel", "valve", "motor")]),
+        Scenario("products_sparse_fields", [f"{products}?fields=name,price,product_type.name"]),
+        Scenario("product_single", [f"/api/v1/r/product/{product_id}" for product_id in product_ids]),
+        Scenario("product_types_list", ["/api/v1/r/product-types/"]),
+        Scenario(
+            "product_type_single",
+            [f"/api/v1/r/product-type/{product_type_id}" for product_type_id in product_type_ids]
+        ),
+    ]
+
+
+async def run_scenario(
+        client: httpx.AsyncClient,
+        scenario: Scenario,
+        concurrency: int,
+        requests: int,
+        generator: random.Random
+) -> LatencyReport:
+    report = LatencyReport(name=scenario.name)
+    remaining = iter(range(requests))
+
+    async def user() -> None:
+        for _ in remaining:
+            path = generator.choice(scenario.paths)
+            started = time.perf_counter()
+            try:
+                response = await client.get(path)
+                ok = response.status_code < 500
+            except httpx.HTTPError:
+                ok = False
+            report.record((time.perf_counter() - started) * 1000, ok)
+
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    return report.finish()
+
+
+@asynccontextmanager
+async def http_client(base_url: Optional[str]) -> AsyncIterator[httpx.AsyncClient]:
+    if base_url:
+        async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+            yield client
+        return
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=30) as client:
+            yield client
+
+
+async def sample_ids(sample_size: int) -> tuple[list, list]:
+    async_db_client = await connect_database(os.environ["MONGO_DB_CONNECTION_STRING"])
+    try:
+        pipeline = [{"$sample": {"size": sample_size}}, {"$project": {"_id": 1}}]
+        product_ids = [
+            document["_id"] async for document in await Product.get_pymongo_collection().aggregate(pipeline)
+        ]
+        product_type_ids = [
+            document["_id"] async for document in await ProductType.get_pymongo_collection().aggregate(pipeline)
+        ]
+        return product_ids, product_type_ids
+    finally:
+        await async_db_client.close()
+
+
+async def main(
+        base_url: Optional[str],
+        concurrency: int,
+        requests: int,
+        warmup: int,
+        only: Optional[list[str]],
+        output: Optional[str]
+) -> None:
+    product_ids, product_type_ids = await sample_ids(sample_size=200)
+    if not product_ids or not product_type_ids:
+        raise SystemExit("No data to benchmark against, run `python -m benchmarks.seed` first")
+    scenarios = [
+        scenario for scenario in build_scenarios(product_ids=product_ids, product_type_ids=product_type_ids)
+        if not only or scenario.name in only
+    ]
+    generator = random.Random(42)
+    reports = []
+    async with http_client(base_url=base_url) as client:
+        for scenario in scenarios:
+            if warmup:
+                await run_scenario(client, scenario, concurrency=concurrency, requests=warmup, generator=generator)
+            report = await run_scenario(
+                client,
+                scenario,
+                concurrency=concurrency,
+                requests=requests,
+                generator=generator
+            )
+            reports.append(report.summary())
+    print_reports(reports)
+    if output:
+        with open(output, "w") as output_file:
+            json.dump(reports, output_file, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drive the read API and report latency percentiles and RPS")
+    parser.add_argument("--base-url", help="Benchmark a running server instead of the in-process app")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per scenario")
+    parser.add_argument("--warmup", type=int, default=100, help="Unmeasured requests per scenario")
+    parser.add_argument("--only", nargs="*", help="Scenario names to run")
+    parser.add_argument("--output", help="Write the summary as JSON to this path")
+    args = parser.parse_args()
+    asyncio.run(main(
+        base_url=args.base_url,
+        concurrency=args.concurrency,
+        requests=args.requests,
+        warmup=args.warmup,
+        only=args.only,
+        output=args.output
+    ))
@@ -0,0 +1,89 @@
+import argparse
+import asyncio
+import os
+import random
+import uuid as uuid_pkg
+
+from beanie.odm.utils.dump import get_dict
+
+from app.models import Product, ProductType, ProductTypeSnapshot
+from benchmarks.common import connect_database
+
+
+SEED_BATCH_SIZE = 1000
+PRODUCT_NAME_WORDS = ["steel", "bolt", "frame", "panel", "valve", "gear", "motor", "sensor", "pipe", "bracket"]
+
+
+async def seed(
+        product_count: int,
+        product_type_count: int,
+        drop: bool = False,
+        denormalized: bool = False,
+        random_seed: int = 42
+) -> None:
+    generator = random.Random(random_seed)
+    product_type_collection = ProductType.get_pymongo_collection()
+    product_collection = Product.get_pymongo_collection()
+    if drop:
+        await product_type_collection.delete_many({})
+        await product_collection.delete_many({})
+
+    product_types = [
+        ProductType(
+            id=uuid_pkg.uuid4(),
+            name=f"type-{index}",
+            description=f"{generator.choice(PRODUCT_NAME_WORDS)} product type {index}",
+            entity_version=1
+        )
+        for index in range(product_type_count)
+    ]
+    await product_type_collection.insert_many([get_dict(product_type, to_db=True) for product_type in product_types])
+
+    for start in range(0, product_count, SEED_BATCH_SIZE):
+        products = []
+        for index in range(start, min(start + SEED_BATCH_SIZE, product_count)):
+            product_type = generator.choice(product_types)
+            products.append(Product(
+                id=uuid_pkg.uuid4(),
+                name=f"{generator.choice(PRODUCT_NAME_WORDS)} {generator.choice(PRODUCT_NAME_WORDS)} {index}",
+                entity_version=1,
+                quantity=generator.randint(0, 1000),
+                price=round(generator.uniform(1, 5000), 2),
+                product_type_id=product_type.id,
+                product_type=ProductTypeSnapshot(
+                    id=product_type.id,
+                    name=product_type.name,
+                    description=product_type.description,
+                    entity_version=product_type.entity_version
+                ) if denormalized else None
+            ))
+        await product_collection.insert_many([get_dict(product, to_db=True) for product in products])
+    print(f"Seeded {product_type_count} product type(s) and {product_count} product(s)")
+
+
+async def main(product_count: int, product_type_count: int, drop: bool, denormalized: bool) -> None:
+    async_db_client = await connect_database(os.environ["MONGO_DB_CONNECTION_STRING"])
+    try:
+        await seed(
+            product_count=product_count,
+            product_type_count=product_type_count,
+            drop=drop,
+            denormalized=denormalized
+        )
+    finally:
+        await async_db_client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed the benchmark database with synthetic products")
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--product-types", type=int, default=100)
+    parser.add_argument("--drop", action="store_true", help="Delete existing products and product types first")
+    parser.add_argument("--denormalized", action="store_true", help="Embed product type snapshots into products")
+    args = parser.parse_args()
+    asyncio.run(main(
+        product_count=args.products,
+        product_type_count=args.product_types,
+        drop=args.drop,
+        denormalized=args.denormalized
+    ))
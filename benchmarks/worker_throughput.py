@@ -0,0 +1,186 @@
+import argparse
+import asyncio
+import os
+import time
+import uuid as uuid_pkg
+from typing import Callable, Awaitable, Union, Optional
+
+from app.db_handler.async_db_handler import AsyncDatabaseClient
+from app.db_sync.tracing import DEFAULT_OUTBOX_TIMESTAMP_HEADER
+from app.db_sync.worker_factory import WorkerFactory
+from app.r_services.service_factory import ServiceFactory
+from app.schemas.db_sync_schema import WorkerTypes, ProductTypeCreateEvent, ProductTypeUpdateEvent, \
+    ProductTypeDeleteEvent
+from app.schemas.product_type_schemas import ProductTypeCreate, ProductTypeUpdate, ProductTypeDelete
+
+
+class StubMessage:
+    def __init__(self, body: bytes, delivery_tag: int, mq_client: "StubMQClient"):
+        self.body = body
+        self.delivery_tag = delivery_tag
+        self.headers = {DEFAULT_OUTBOX_TIMESTAMP_HEADER: time.time()}
+        self.timestamp = None
+        self.channel = mq_client
+        self._mq_client = mq_client
+
+    async def ack(self, multiple: bool = False) -> None:
+        self._mq_client.acknowledge(delivery_tag=self.delivery_tag, multiple=multiple)
+
+    async def nack(self, requeue: bool = True) -> None:
+        self._mq_client.acknowledge(delivery_tag=self.delivery_tag, multiple=False)
+
+
+class StubMQClient:
+    retry_tiers = 1
+
+    def __init__(self, bodies: list[bytes]):
+        self._bodies = bodies
+        self._acked: set[int] = set()
+        self._acked_up_to = 0
+        self._done = asyncio.Event()
+        self._stopped = asyncio.Event()
+        self.dead_lettered = 0
+        self.finished_at: Optional[float] = None
+
+    async def connect(self) -> None:
+        pass
+
+    async def stop_consuming(self) -> None:
+        pass
+
+    async def disconnect(self) -> None:
+        self._stopped.set()
+
+    async def publish_data(
+            self,
+            msg: Union[bytes, str],
+            dead_letter_queue: bool = False,
+            headers: Optional[dict] = None,
+            retry_tier: int = 0
+    ) -> None:
+        if dead_letter_queue:
+            self.dead_lettered += 1
+
+    async def publish_pipelined(
+            self,
+            msg: Union[bytes, str],
+            dead_letter_queue: bool = False,
+            headers: Optional[dict] = None,
+            retry_tier: int = 0
+    ) -> asyncio.Task:
+        return asyncio.create_task(self.publish_data(
+            msg=msg,
+            dead_letter_queue=dead_letter_queue,
+            headers=headers,
+            retry_tier=retry_tier
+        ))
+
+    async def wait_for_publishes(self) -> None:
+        pass
+
+    async def consume_data(self, callback_fn: Callable[[StubMessage], Awaitable[None]]) -> None:
+        for delivery_tag, body in enumerate(self._bodies, start=1):
+            await callback_fn(StubMessage(body=body, delivery_tag=delivery_tag, mq_client=self))
+        await self._stopped.wait()
+
+    def acknowledge(self, delivery_tag: int, multiple: bool) -> None:
+        if multiple:
+            self._acked_up_to = max(self._acked_up_to, delivery_tag)
+        else:
+            self._acked.add(delivery_tag)
+        while self._acked_up_to + 1 in self._acked:
+            self._acked_up_to += 1
+        if self._acked_up_to >= len(self._bodies) and not self._done.is_set():
+            self.finished_at = time.perf_counter()
+            self._done.set()
+
+    async def wait_until_acked(self) -> None:
+        await self._done.wait()
+
+
+def synthetic_events(aggregate_count: int, updates_per_aggregate: int, delete: bool) -> list[bytes]:
+    aggregate_ids = [uuid_pkg.uuid4() for _ in range(aggregate_count)]
+    events = [
+        ProductTypeCreateEvent(
+            event_type="create",
+            payload=ProductTypeCreate(id=aggregate_id, name=f"type-{index}", description="benchmark", entity_version=1)
+        )
+        for index, aggregate_id in enumerate(aggregate_ids)
+    ]
+    for version in range(2, updates_per_aggregate + 2):
+        events.extend(
+            ProductTypeUpdateEvent(
+                event_type="update",
+                payload=ProductTypeUpdate(id=aggregate_id, description=f"benchmark v{version}", entity_version=version)
+            )
+            for aggregate_id in aggregate_ids
+        )
+    if delete:
+        events.extend(
+            ProductTypeDeleteEvent(
+                event_type="delete",
+                payload=ProductTypeDelete(id=aggregate_id, entity_version=updates_per_aggregate + 2)
+            )
+            for aggregate_id in aggregate_ids
+        )
+    return [event.model_dump_json().encode("utf-8") for event in events]
+
+
+async def main(
+        aggregate_count: int,
+        updates_per_aggregate: int,
+        delete: bool,
+        ack_batch_size: int,
+        batch_size: int,
+        batch_window_ms: int
+) -> None:
+    bodies = synthetic_events(
+        aggregate_count=aggregate_count,
+        updates_per_aggregate=updates_per_aggregate,
+        delete=delete
+    )
+    mq_client = StubMQClient(bodies=bodies)
+    worker = WorkerFactory(
+        async_mq_client=mq_client,
+        service_factory=ServiceFactory(),
+        async_mongo_client=AsyncDatabaseClient(connection_string=os.environ["MONGO_DB_CONNECTION_STRING"]),
+        ack_batch_size=ack_batch_size,
+        batch_size=batch_size,
+        batch_window_ms=batch_window_ms
+    ).create_worker(worker_type=WorkerTypes.ProductType.value)
+
+    started_at = time.perf_counter()
+    consuming = asyncio.create_task(worker.sync_db())
+    acked = asyncio.create_task(mq_client.wait_until_acked())
+    await asyncio.wait([consuming, acked], return_when=asyncio.FIRST_COMPLETED)
+    if consuming.done():
+        acked.cancel()
+        consuming.result()
+        raise SystemExit("Worker stopped before all events were acknowledged")
+    await worker.handle_shutdown_signal("SIGTERM")
+    await consuming
+
+    elapsed_s = mq_client.finished_at - started_at
+    print(f"events:          {len(bodies)}")
+    print(f"dead lettered:   {mq_client.dead_lettered}")
+    print(f"elapsed:         {elapsed_s:.3f}s")
+    print(f"events/s:        {len(bodies) / elapsed_s:.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure DBSyncWorker throughput on a synthetic outbox stream")
+    parser.add_argument("--aggregates", type=int, default=2000)
+    parser.add_argument("--updates", type=int, default=4, help="Update events per aggregate after its create")
+    parser.add_argument("--delete", action="store_true", help="Finish every aggregate with a delete event")
+    parser.add_argument("--ack-batch-size", type=int, default=32)
+    parser.add_argument("--batch-size", type=int, default=1, help="Events folded into one bulk write, 1 disables")
+    parser.add_argument("--batch-window-ms", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(
+        aggregate_count=args.aggregates,
+        updates_per_aggregate=args.updates,
+        delete=args.delete,
+        ack_batch_size=args.ack_batch_size,
+        batch_size=args.batch_size,
+        batch_window_ms=args.batch_window_ms
+    ))
@@ -0,0 +1,33 @@
+import uuid as uuid_pkg
+
+from app.db_sync.batching import PendingEvent
+from app.schemas.db_sync_schema import ProductCreateEvent, ProductUpdateEvent, ProductDeleteEvent
+from app.schemas.product_schemas import ProductCreate, ProductUpdate, ProductDelete
+
+
+def product_created(aggregate_id: uuid_pkg.UUID, version: int = 1, message=None) -> PendingEvent:
+    return PendingEvent(message=message, event=ProductCreateEvent(
+        event_type="create",
+        payload=ProductCreate(
+            id=aggregate_id,
+            name="bolt",
+            quantity=1,
+            price=1.0,
+            product_type_id=uuid_pkg.UUID(int=1),
+            entity_version=version
+        )
+    ))
+
+
+def product_updated(aggregate_id: uuid_pkg.UUID, version: int, message=None, **fields) -> PendingEvent:
+    return PendingEvent(message=message, event=ProductUpdateEvent(
+        event_type="update",
+        payload=ProductUpdate(id=aggregate_id, entity_version=version, **fields)
+    ))
+
+
+def product_deleted(aggregate_id: uuid_pkg.UUID, version: int, message=None) -> PendingEvent:
+    return PendingEvent(message=message, event=ProductDeleteEvent(
+        event_type="delete",
+        payload=ProductDelete(id=aggregate_id, entity_version=version)
+    ))
@@ -0,0 +1,108 @@
+import asyncio
+
+from app.db_sync.dispatcher import AckBatcher, PartitionedDispatcher
+
+
+class FakeChannel:
+    pass
+
+
+class FakeMessage:
+    def __init__(self, delivery_tag: int, channel: FakeChannel):
+        self.delivery_tag = delivery_tag
+        self.channel = channel
+        self.acked_multiple = None
+        self.requeued = False
+
+    async def ack(self, multiple: bool = False) -> None:
+        self.acked_multiple = multiple
+
+    async def nack(self, requeue: bool = True) -> None:
+        self.requeued = requeue
+
+
+def deliver(batcher: AckBatcher, channel: FakeChannel, count: int, first_tag: int = 1) -> list[FakeMessage]:
+    messages = [FakeMessage(delivery_tag=tag, channel=channel) for tag in range(first_tag, first_tag + count)]
+    for message in messages:
+        batcher.track(message)
+    return messages
+
+
+def test_acks_up_to_the_lowest_outstanding_delivery():
+    async def run():
+        batcher = AckBatcher(batch_size=10, flush_interval_s=1)
+        messages = deliver(batcher, FakeChannel(), 4)
+
+        await batcher.complete(messages[0])
+        await batcher.complete(messages[2])
+        await batcher.flush()
+        assert messages[0].acked_multiple is True
+        assert messages[2].acked_multiple is None
+
+        await batcher.complete(messages[1])
+        await batcher.flush()
+        assert messages[2].acked_multiple is True
+    asyncio.run(run())
+
+
+def test_flushes_once_the_batch_is_full():
+    async def run():
+        batcher = AckBatcher(batch_size=2, flush_interval_s=1)
+        messages = deliver(batcher, FakeChannel(), 2)
+
+        await batcher.complete(messages[0])
+        assert messages[0].acked_multiple is None
+        await batcher.complete(messages[1])
+        assert messages[1].acked_multiple is True
+    asyncio.run(run())
+
+
+def test_released_delivery_is_requeued_and_does_not_block_the_watermark():
+    async def run():
+        batcher = AckBatcher(batch_size=10, flush_interval_s=1)
+        messages = deliver(batcher, FakeChannel(), 2)
+
+        await batcher.release(messages[0])
+        await batcher.complete(messages[1])
+        await batcher.flush()
+
+        assert messages[0].requeued
+        assert messages[1].acked_multiple is True
+    asyncio.run(run())
+
+
+def test_reconnected_channel_restarts_delivery_tags():
+    async def run():
+        batcher = AckBatcher(batch_size=10, flush_interval_s=1)
+        old_messages = deliver(batcher, FakeChannel(), 3)
+        await batcher.complete(old_messages[2])
+        await batcher.complete(old_messages[0])
+        await batcher.flush()
+
+        new_messages = deliver(batcher, FakeChannel(), 2)
+        await batcher.complete(old_messages[1])
+        await batcher.complete(new_messages[0])
+        await batcher.flush()
+
+        assert old_messages[1].acked_multiple is None
+        assert new_messages[0].acked_multiple is True
+    asyncio.run(run())
+
+
+def test_dispatcher_keeps_per_key_order_and_runs_keys_concurrently():
+    async def run():
+        dispatcher = PartitionedDispatcher()
+        order = []
+
+        async def job(name: str, delay_s: float):
+            await asyncio.sleep(delay_s)
+            order.append(name)
+
+        dispatcher.submit(partition_key="a", job=lambda: job("a1", 0.02))
+        dispatcher.submit(partition_key="a", job=lambda: job("a2", 0))
+        dispatcher.submit(partition_key="b", job=lambda: job("b1", 0))
+        await dispatcher.drain()
+
+        assert order == ["b1", "a1", "a2"]
+        assert dispatcher.in_flight == 0
+    asyncio.run(run())
@@ -0,0 +1,226 @@
+import asyncio
+import uuid as uuid_pkg
+
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+from app.r_services.change_feed import ChangeFeed, Subscription, REMOVE_EVENT
+from app.r_services.product_type_loader import ProductTypeLoader, current_product_type_loader
+from app.schemas.db_sync_schema import EntityChangedDTO, EntityChangesDTO, AggregateType, WorkerTypes
+
+
+class Entity(BaseModel):
+    id: uuid_pkg.UUID
+    entity_version: int
+    quantity: int
+
+
+def render(output_schema: type[BaseModel], entity: BaseModel) -> bytes:
+    return to_json(output_schema.model_validate(entity, from_attributes=True))
+
+
+def change(entity_id: uuid_pkg.UUID, event_type: AggregateType, entity_version: int) -> EntityChangedDTO:
+    return EntityChangedDTO(
+        aggregate_type=WorkerTypes.Product,
+        event_type=event_type,
+        id=entity_id,
+        entity_version=entity_version
+    )
+
+
+def in_stock_subscription(max_pending_events: int = 10, closed: list = None) -> Subscription:
+    return Subscription(
+        aggregate_type=WorkerTypes.Product,
+        matches=lambda entity: entity.quantity > 0,
+        output_schema=Entity,
+        max_pending_events=max_pending_events,
+        on_close=(closed if closed is not None else []).append
+    )
+
+
+def drain(subscription: Subscription) -> list:
+    frames = []
+    while not subscription._events.empty():
+        frames.append(subscription._events.get_nowait())
+    return frames
+
+
+def test_offer_pushes_matching_entities_and_removes_ones_that_stop_matching():
+    async def run():
+        subscription = in_stock_subscription()
+        entity_id = uuid_pkg.uuid4()
+
+        subscription.offer(
+            change=change(entity_id, AggregateType.CREATE, 1),
+            entity=Entity(id=entity_id, entity_version=1, quantity=3),
+            render=render
+        )
+        subscription.offer(
+            change=change(entity_id, AggregateType.UPDATE, 2),
+            entity=Entity(id=entity_id, entity_version=2, quantity=0),
+            render=render
+        )
+        subscription.offer(
+            change=change(entity_id, AggregateType.UPDATE, 3),
+            entity=Entity(id=entity_id, entity_version=3, quantity=0),
+            render=render
+        )
+
+        created, removed, removed_again = drain(subscription)
+        assert created.startswith(b"event: create\nid: " + f"{entity_id}-1".encode())
+        assert removed.startswith(b"event: " + REMOVE_EVENT.encode() + b"\nid: " + f"{entity_id}-2".encode())
+        assert removed_again.startswith(b"event: " + REMOVE_EVENT.encode() + b"\nid: " + f"{entity_id}-3".encode())
+
+    asyncio.run(run())
+
+
+def test_offer_removes_updated_entities_the_subscription_never_sent():
+    async def run():
+        subscription = in_stock_subscription()
+        entity_id = uuid_pkg.uuid4()
+
+        subscription.offer(
+            change=change(entity_id, AggregateType.UPDATE, 4),
+            entity=Entity(id=entity_id, entity_version=4, quantity=0),
+            render=render
+        )
+
+        removed, = drain(subscription)
+        assert removed.startswith(b"event: " + REMOVE_EVENT.encode() + b"\nid: " + f"{entity_id}-4".encode())
+
+    asyncio.run(run())
+
+
+def test_offer_skips_created_entities_that_do_not_match():
+    async def run():
+        subscription = in_stock_subscription()
+        entity_id = uuid_pkg.uuid4()
+
+        subscription.offer(
+            change=change(entity_id, AggregateType.CREATE, 1),
+            entity=Entity(id=entity_id, entity_version=1, quantity=0),
+            render=render
+        )
+
+        assert drain(subscription) == []
+
+    asyncio.run(run())
+
+
+def test_offer_sends_a_delete_frame_for_deleted_or_missing_entities():
+    async def run():
+        subscription = in_stock_subscription()
+        deleted_id, missing_id = uuid_pkg.uuid4(), uuid_pkg.uuid4()
+
+        subscription.offer(change=change(deleted_id, AggregateType.DELETE, 5), entity=None, render=render)
+        subscription.offer(change=change(missing_id, AggregateType.UPDATE, 2), entity=None, render=render)
+
+        deleted, missing = drain(subscription)
+        assert deleted.startswith(b"event: delete\nid: " + f"{deleted_id}-5".encode())
+        assert missing.startswith(b"event: delete\nid: " + f"{missing_id}-2".encode())
+
+    asyncio.run(run())
+
+
+def test_slow_subscriber_is_closed_once_its_queue_is_full():
+    async def run():
+        closed = []
+        subscription = in_stock_subscription(max_pending_events=2, closed=closed)
+        entities = [Entity(id=uuid_pkg.uuid4(), entity_version=1, quantity=1) for _ in range(3)]
+
+        for entity in entities:
+            subscription.offer(change=change(entity.id, AggregateType.CREATE, 1), entity=entity, render=render)
+
+        assert closed == [subscription]
+        assert drain(subscription)[-1] is None
+
+    asyncio.run(run())
+
+
+class FakeMQClient:
+    def __init__(self):
+        self._stopped = asyncio.Event()
+
+    async def connect(self) -> None:
+        pass
+
+    async def consume_data(self, callback) -> None:
+        await self._stopped.wait()
+
+    async def disconnect(self) -> None:
+        self._stopped.set()
+
+
+class FakeMessage:
+    def __init__(self, changes: list[EntityChangedDTO]):
+        self.body = EntityChangesDTO(changes=changes).model_dump_json().encode()
+
+    async def ack(self) -> None:
+        pass
+
+
+def test_fan_out_keeps_running_after_a_failing_fetch():
+    async def run():
+        entity = Entity(id=uuid_pkg.uuid4(), entity_version=1, quantity=1)
+        calls = []
+
+        async def fetch(ids):
+            calls.append(ids)
+            if len(calls) == 1:
+                raise RuntimeError("boom")
+            return [entity]
+
+        feed = ChangeFeed(async_mq_client=FakeMQClient(), fetchers={WorkerTypes.Product: fetch})
+        await feed.start()
+        subscription = feed.subscribe(WorkerTypes.Product, matches=lambda _: True, output_schema=Entity)
+
+        await feed._on_message(FakeMessage([change(entity.id, AggregateType.CREATE, 1)]))
+        await asyncio.sleep(0)
+        await feed._on_message(FakeMessage([change(entity.id, AggregateType.CREATE, 1)]))
+        frame = await asyncio.wait_for(subscription.next_event(), timeout=1)
+
+        assert len(calls) == 2
+        assert frame.startswith(b"event: create")
+        await feed.stop()
+
+    asyncio.run(run())
+
+
+def test_full_pending_queue_closes_subscribers():
+    async def run():
+        feed = ChangeFeed(async_mq_client=FakeMQClient(), fetchers={}, max_pending_events=1)
+        subscription = feed.subscribe(WorkerTypes.Product, matches=lambda _: True, output_schema=Entity)
+        entity_id = uuid_pkg.uuid4()
+
+        await feed._on_message(FakeMessage([change(entity_id, AggregateType.UPDATE, 1)]))
+        await feed._on_message(FakeMessage([change(entity_id, AggregateType.UPDATE, 2)]))
+
+        assert await subscription.next_event() is None
+        assert feed._subscriptions[WorkerTypes.Product] == set()
+
+    asyncio.run(run())
+
+
+def test_fan_out_binds_a_fresh_product_type_loader_per_batch():
+    async def run():
+        entity = Entity(id=uuid_pkg.uuid4(), entity_version=1, quantity=1)
+        loaders = []
+
+        async def fetch(ids):
+            loaders.append(current_product_type_loader())
+            return [entity]
+
+        feed = ChangeFeed(
+            async_mq_client=FakeMQClient(),
+            fetchers={WorkerTypes.Product: fetch},
+            product_type_loader_factory=lambda: ProductTypeLoader(repository=None)
+        )
+        feed.subscribe(WorkerTypes.Product, matches=lambda _: True, output_schema=Entity)
+
+        await feed._fan_out([change(entity.id, AggregateType.CREATE, 1)])
+        await feed._fan_out([change(entity.id, AggregateType.UPDATE, 2)])
+
+        assert all(isinstance(loader, ProductTypeLoader) for loader in loaders)
+        assert loaders[0] is not loaders[1]
+
+    asyncio.run(run())
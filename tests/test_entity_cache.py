@@ -0,0 +1,73 @@
+from types import SimpleNamespace
+import uuid as uuid_pkg
+
+from app.r_services import cache as cache_module
+from app.r_services.cache import EntityCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_put_with_a_version_older_than_an_invalidation_is_ignored():
+    cache = EntityCache(max_size=10, ttl_s=30)
+    key = uuid_pkg.uuid4()
+    cache.put(key, "v1", version=1)
+
+    cache.invalidate(key, version=2)
+    cache.put(key, "stale v1", version=1)
+
+    assert cache.get(key) is None
+    cache.put(key, "v2", version=2)
+    assert cache.get(key) == "v2"
+
+
+def test_invalidate_keeps_an_entry_that_is_already_newer():
+    cache = EntityCache(max_size=10, ttl_s=30)
+    key = uuid_pkg.uuid4()
+    cache.put(key, "v3", version=3)
+
+    cache.invalidate(key, version=2)
+
+    assert cache.get(key) == "v3"
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache_module.time, "monotonic", clock)
+    cache = EntityCache(max_size=10, ttl_s=30)
+    key = uuid_pkg.uuid4()
+    cache.put(key, "v1", version=1)
+
+    clock.now += 29
+    assert cache.get(key) == "v1"
+    clock.now += 2
+    assert cache.get(key) is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted_first():
+    cache = EntityCache(max_size=2, ttl_s=30)
+    first, second, third = uuid_pkg.uuid4(), uuid_pkg.uuid4(), uuid_pkg.uuid4()
+    cache.put(first, "first", version=1)
+    cache.put(second, "second", version=1)
+
+    cache.get(first)
+    cache.put(third, "third", version=1)
+
+    assert cache.get(second) is None
+    assert cache.get(first) == "first"
+    assert cache.get(third) == "third"
+
+
+def test_cache_is_disabled_without_an_invalidation_listener(monkeypatch):
+    settings = SimpleNamespace(cache_enabled=True, rabbit_mq_host=None, cache_max_size=10, cache_ttl_s=30)
+    monkeypatch.setattr(cache_module, "get_settings", lambda: settings)
+
+    assert cache_module._entity_cache() is None
+    settings.rabbit_mq_host = "rabbitmq"
+    assert isinstance(cache_module._entity_cache(), EntityCache)
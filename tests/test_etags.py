@@ -0,0 +1,49 @@
+import uuid as uuid_pkg
+
+import pytest
+
+from app.r_services.etags import entity_etag, page_etag
+from app.schemas.product_schemas import ProductFetch
+from app.streaming import etag_matches
+
+
+REFERENCE_ID = uuid_pkg.UUID(int=7)
+
+
+def test_entity_etag_is_quoted_and_encodes_every_version():
+    assert entity_etag(REFERENCE_ID, (3, None), None) == f'"{REFERENCE_ID}-3.0"'
+
+
+def test_entity_etag_changes_with_any_version():
+    assert entity_etag(REFERENCE_ID, (3, 1), None) != entity_etag(REFERENCE_ID, (3, 2), None)
+
+
+def test_entity_etag_depends_on_selection_but_not_its_order():
+    first = entity_etag(REFERENCE_ID, (3,), {"name": None, "product_type": frozenset({"name", "description"})})
+    second = entity_etag(REFERENCE_ID, (3,), {"product_type": frozenset({"description", "name"}), "name": None})
+
+    assert first == second
+    assert first != entity_etag(REFERENCE_ID, (3,), None)
+    assert first != entity_etag(REFERENCE_ID, (3,), {"name": None})
+
+
+def test_page_etag_covers_filters_and_item_versions():
+    page = [(REFERENCE_ID, (1,)), (uuid_pkg.UUID(int=8), (2,))]
+    etag = page_etag(ProductFetch(limit=10), page)
+
+    assert etag == page_etag(ProductFetch(limit=10), page)
+    assert etag != page_etag(ProductFetch(limit=20), page)
+    assert etag != page_etag(ProductFetch(limit=10), [(REFERENCE_ID, (2,)), page[1]])
+    assert etag != page_etag(ProductFetch(limit=10), page[::-1])
+
+
+@pytest.mark.parametrize("if_none_match, expected", [
+    (None, False),
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"other", "abc"', True),
+    ("*", True),
+    ('"other"', False)
+])
+def test_if_none_match(if_none_match, expected):
+    assert etag_matches(if_none_match, '"abc"') is expected
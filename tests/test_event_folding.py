@@ -0,0 +1,134 @@
+import asyncio
+from types import SimpleNamespace
+import uuid as uuid_pkg
+
+from app.db_sync.batching import fold_events
+from app.repositories.product_repository import ProductRepository
+from app.schemas.db_sync_schema import AggregateType
+from tests.helpers import product_created, product_updated, product_deleted
+
+
+def test_create_and_following_updates_fold_into_one_create():
+    aggregate_id = uuid_pkg.uuid4()
+    events = [
+        product_created(aggregate_id),
+        product_updated(aggregate_id, 2, price=2.0),
+        product_updated(aggregate_id, 3, quantity=5)
+    ]
+
+    operations, leftovers = fold_events(events)
+
+    assert leftovers == []
+    assert len(operations) == 1
+    operation = operations[0]
+    assert operation.event_type == AggregateType.CREATE
+    assert operation.base_version is None
+    assert operation.final_version == 3
+    assert operation.fields["price"] == 2.0
+    assert operation.fields["quantity"] == 5
+    assert operation.events == events
+
+
+def test_updates_then_delete_fold_into_a_delete_guarded_on_the_first_base_version():
+    aggregate_id = uuid_pkg.uuid4()
+
+    operations, leftovers = fold_events([
+        product_updated(aggregate_id, 4, price=2.0),
+        product_deleted(aggregate_id, 5)
+    ])
+
+    assert leftovers == []
+    assert operations[0].event_type == AggregateType.DELETE
+    assert operations[0].base_version == 3
+    assert operations[0].final_version == 5
+    assert operations[0].fields == {}
+
+
+def test_version_gap_breaks_the_chain_and_keeps_the_rest_as_leftovers():
+    aggregate_id = uuid_pkg.uuid4()
+    gap = product_updated(aggregate_id, 4, price=3.0)
+    after_gap = product_updated(aggregate_id, 3, price=2.0)
+
+    operations, leftovers = fold_events([product_updated(aggregate_id, 2, price=1.0), gap, after_gap])
+
+    assert [operation.final_version for operation in operations] == [2]
+    assert leftovers == [gap, after_gap]
+
+
+def test_create_after_delete_is_not_folded():
+    aggregate_id = uuid_pkg.uuid4()
+    recreate = product_created(aggregate_id, 3)
+
+    operations, leftovers = fold_events([product_deleted(aggregate_id, 2), recreate])
+
+    assert operations[0].event_type == AggregateType.DELETE
+    assert leftovers == [recreate]
+
+
+def test_aggregates_fold_independently():
+    first_id, second_id = uuid_pkg.uuid4(), uuid_pkg.uuid4()
+
+    operations, leftovers = fold_events([
+        product_updated(first_id, 2, price=1.0),
+        product_updated(second_id, 7, price=1.0),
+        product_updated(first_id, 3, price=2.0)
+    ])
+
+    assert leftovers == []
+    assert {operation.aggregate_id: operation.final_version for operation in operations} == {first_id: 3, second_id: 7}
+
+
+def test_confirmation_checks_the_final_version():
+    update, delete = fold_events([
+        product_updated(uuid_pkg.uuid4(), 2, price=1.0),
+        product_deleted(uuid_pkg.uuid4(), 3)
+    ])[0]
+
+    assert update.is_confirmed_by(2)
+    assert not update.is_confirmed_by(1)
+    assert delete.is_confirmed_by(current_version=None, previous_version=2)
+
+
+def test_delete_of_an_absent_document_is_not_confirmed():
+    operations, _ = fold_events([product_deleted(uuid_pkg.uuid4(), 3)])
+    delete = operations[0]
+
+    assert not delete.is_confirmed_by(current_version=None, previous_version=None)
+    assert not delete.is_confirmed_by(current_version=1, previous_version=1)
+
+
+class FakeCollection:
+    def __init__(self, versions: dict):
+        self.versions = versions
+
+    def find(self, filter_data: dict, projection: dict):
+        async def documents():
+            for reference_id in filter_data["_id"]["$in"]:
+                if reference_id in self.versions:
+                    yield {"_id": reference_id, "entity_version": self.versions[reference_id]}
+        return documents()
+
+    async def bulk_write(self, requests: list, ordered: bool):
+        deleted_count = 0
+        for request in requests:
+            document_filter = request._filter
+            if self.versions.get(document_filter["_id"]) == document_filter["entity_version"]:
+                del self.versions[document_filter["_id"]]
+                deleted_count += 1
+        return SimpleNamespace(inserted_count=0, matched_count=0, deleted_count=deleted_count)
+
+
+def bulk_apply(versions: dict, writes: list) -> list:
+    repository = ProductRepository()
+    collection = FakeCollection(versions)
+    repository._model = SimpleNamespace(get_pymongo_collection=lambda: collection)
+    return asyncio.run(repository.bulk_apply(writes))
+
+
+def test_out_of_order_delete_in_a_batch_stays_unconfirmed():
+    missing_id, existing_id = uuid_pkg.uuid4(), uuid_pkg.uuid4()
+    operations, _ = fold_events([product_deleted(missing_id, 2), product_deleted(existing_id, 3)])
+
+    unconfirmed = bulk_apply({existing_id: 2}, operations)
+
+    assert [write.aggregate_id for write in unconfirmed] == [missing_id]
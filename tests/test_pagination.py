@@ -0,0 +1,73 @@
+import uuid as uuid_pkg
+
+import pymongo
+import pytest
+
+from app.r_services.filter_builder import MongoCriteriaFilterBuilder
+from app.r_services.pagination import encode_cursor, decode_cursor
+from app.r_services.services_exceptions import InvalidCursorError
+
+
+def test_cursor_round_trip():
+    reference_id = uuid_pkg.uuid4()
+    cursor = encode_cursor(sort_field="price", sort_value=12.5, reference_id=reference_id)
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor, sort_field="price") == (12.5, reference_id)
+
+
+def test_cursor_rejects_other_sort_field():
+    cursor = encode_cursor(sort_field="price", sort_value=1, reference_id=uuid_pkg.uuid4())
+
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor, sort_field="name")
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "", encode_cursor("_id", None, uuid_pkg.uuid4())[:-4]])
+def test_cursor_rejects_malformed_input(cursor):
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor, sort_field="_id")
+
+
+def test_keyset_after_id_seeks_on_id_only():
+    last_id = uuid_pkg.uuid4()
+    builder = MongoCriteriaFilterBuilder()
+    builder.add_keyset_after(sort_field="_id", last_value=None, last_id=last_id)
+    builder.set_sort("_id")
+
+    criteria = builder.build()
+
+    assert criteria.query == {"$and": [{"_id": {"$gt": last_id}}]}
+    assert criteria.sort == [("_id", pymongo.ASCENDING)]
+
+
+def test_keyset_after_field_breaks_ties_on_id():
+    last_id = uuid_pkg.uuid4()
+    builder = MongoCriteriaFilterBuilder()
+    builder.add_exact_match("name", "bolt")
+    builder.add_keyset_after(sort_field="price", last_value=3.0, last_id=last_id)
+    builder.set_sort("price")
+
+    criteria = builder.build()
+
+    assert criteria.query == {
+        "name": "bolt",
+        "$and": [{"$or": [{"price": {"$gt": 3.0}}, {"price": 3.0, "_id": {"$gt": last_id}}]}]
+    }
+    assert criteria.sort == [("price", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)]
+
+
+def test_score_keyset_seeks_below_last_score():
+    last_id = uuid_pkg.uuid4()
+    builder = MongoCriteriaFilterBuilder()
+    builder.add_text_search("bolt")
+    builder.add_score_keyset_after(score_field="text_score", last_score=1.5, last_id=last_id)
+    builder.set_text_score_sort("text_score")
+
+    criteria = builder.build()
+
+    assert criteria.rank_by_text_score
+    assert criteria.ranked_keyset == {
+        "$or": [{"text_score": {"$lt": 1.5}}, {"text_score": 1.5, "_id": {"$gt": last_id}}]
+    }
+    assert criteria.sort == [("text_score", pymongo.DESCENDING), ("_id", pymongo.ASCENDING)]
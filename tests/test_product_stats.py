@@ -0,0 +1,121 @@
+import asyncio
+import uuid as uuid_pkg
+
+from app.r_services.base import EntityChange
+from app.r_services.product_service import ProductService
+from app.repositories.base import VersionedWrite
+from app.schemas.db_sync_schema import AggregateType
+
+
+TYPE_ID = uuid_pkg.uuid4()
+
+
+def product(price: float, quantity: int = 1, product_type_id: uuid_pkg.UUID = TYPE_ID) -> dict:
+    return {"product_type_id": product_type_id, "quantity": quantity, "price": price, "entity_version": 1}
+
+
+class FakeStatsRepository:
+    def __init__(self, min_price: float, max_price: float):
+        self.stats = {"min_price": min_price, "max_price": max_price, "bounds_version": 0}
+        self.before_set = None
+
+    async def apply_deltas(self, deltas) -> None:
+        self.stats["bounds_version"] += 1
+
+    async def fetch_bounds_versions(self, product_type_ids):
+        return {product_type_id: self.stats["bounds_version"] for product_type_id in product_type_ids}
+
+    async def set_price_bounds(self, bounds, bounds_versions):
+        if self.before_set is not None:
+            before_set, self.before_set = self.before_set, None
+            before_set()
+        if bounds_versions[TYPE_ID] != self.stats["bounds_version"]:
+            return [TYPE_ID]
+        self.stats["min_price"], self.stats["max_price"] = bounds[TYPE_ID]
+        self.stats["bounds_version"] += 1
+        return []
+
+
+class FakeProductRepository:
+    def __init__(self, prices: list[float]):
+        self.prices = prices
+
+    async def fetch_price_bounds(self, product_type_ids):
+        return {product_type_id: (min(self.prices), max(self.prices)) for product_type_id in product_type_ids}
+
+
+def test_deltas_move_a_product_between_types():
+    other_type_id = uuid_pkg.uuid4()
+
+    deltas = ProductService._stats_deltas([
+        EntityChange(previous=product(price=5.0, quantity=2), current=product(5.0, 2, other_type_id)),
+        EntityChange(previous=None, current=product(price=3.0))
+    ])
+
+    assert deltas[TYPE_ID].product_count == 0
+    assert deltas[TYPE_ID].price_removed
+    assert deltas[TYPE_ID].lowest_added_price == 3.0
+    assert deltas[other_type_id].product_count == 1
+    assert deltas[other_type_id].total_quantity == 2
+
+
+def test_unchanged_stats_values_produce_no_delta():
+    assert ProductService._stats_deltas([EntityChange(previous=product(2.0), current=product(2.0))]) == {}
+
+
+def test_price_bounds_recompute_retries_when_a_concurrent_write_moves_them():
+    products = FakeProductRepository(prices=[4.0, 9.0])
+    stats = FakeStatsRepository(min_price=1.0, max_price=9.0)
+    service = ProductService(repository=products, stats_repository=stats)
+
+    def concurrent_cheaper_create():
+        products.prices.append(0.5)
+        stats.stats["min_price"] = 0.5
+        stats.stats["bounds_version"] += 1
+
+    stats.before_set = concurrent_cheaper_create
+    asyncio.run(service._record_changes([EntityChange(previous=product(price=1.0), current=None)]))
+
+    assert (stats.stats["min_price"], stats.stats["max_price"]) == (0.5, 9.0)
+
+
+class RecordingStatsRepository:
+    def __init__(self):
+        self.deltas = []
+
+    async def apply_deltas(self, deltas) -> None:
+        self.deltas.append(deltas)
+
+
+class BatchProductRepository:
+    def __init__(self, existing: dict):
+        self.existing = existing
+
+    async def fetch_fields(self, reference_ids, projection):
+        return {
+            reference_id: self.existing[reference_id] for reference_id in reference_ids if reference_id in self.existing
+        }
+
+    async def bulk_apply(self, writes):
+        self.existing.update({write.aggregate_id: write.fields for write in writes})
+        return []
+
+
+def test_redelivered_batch_create_is_not_counted_twice():
+    product_id = uuid_pkg.uuid4()
+    create = VersionedWrite(
+        aggregate_id=product_id,
+        event_type=AggregateType.CREATE,
+        fields=product(price=5.0, quantity=2),
+        base_version=None,
+        final_version=1
+    )
+    stats = RecordingStatsRepository()
+    service = ProductService(repository=BatchProductRepository(existing={}), stats_repository=stats)
+
+    asyncio.run(service.apply_batch([create]))
+    asyncio.run(service.apply_batch([create]))
+
+    assert len(stats.deltas) == 1
+    assert stats.deltas[0][TYPE_ID].product_count == 1
+    assert stats.deltas[0][TYPE_ID].total_quantity == 2
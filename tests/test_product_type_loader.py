@@ -0,0 +1,57 @@
+import asyncio
+import uuid as uuid_pkg
+
+from app.r_services.product_type_loader import ProductTypeLoader
+
+
+class FakeProductTypeRepository:
+    def __init__(self, snapshots: dict, fail: bool = False):
+        self._snapshots = snapshots
+        self._fail = fail
+        self.calls: list[list[uuid_pkg.UUID]] = []
+
+    async def fetch_snapshots(self, reference_ids: list[uuid_pkg.UUID]) -> dict:
+        self.calls.append(reference_ids)
+        if self._fail:
+            raise RuntimeError("database down")
+        return {reference_id: self._snapshots[reference_id] for reference_id in reference_ids if reference_id in self._snapshots}
+
+
+def test_concurrent_loads_share_one_batched_read():
+    first_id, second_id, missing_id = uuid_pkg.uuid4(), uuid_pkg.uuid4(), uuid_pkg.uuid4()
+    repository = FakeProductTypeRepository({first_id: {"name": "a"}, second_id: {"name": "b"}})
+    loader = ProductTypeLoader(repository=repository)
+
+    async def run():
+        return await asyncio.gather(
+            loader.load(first_id),
+            loader.load_many([second_id, first_id, missing_id])
+        )
+
+    single, many = asyncio.run(run())
+
+    assert single == {"name": "a"}
+    assert many == {second_id: {"name": "b"}, first_id: {"name": "a"}, missing_id: None}
+    assert repository.calls == [[first_id, second_id, missing_id]]
+
+
+def test_loaded_ids_are_memoized_for_the_request():
+    reference_id = uuid_pkg.uuid4()
+    repository = FakeProductTypeRepository({reference_id: {"name": "a"}})
+    loader = ProductTypeLoader(repository=repository)
+
+    async def run():
+        await loader.load(reference_id)
+        return await loader.load(reference_id)
+
+    assert asyncio.run(run()) == {"name": "a"}
+    assert len(repository.calls) == 1
+
+
+def test_read_failure_reaches_every_waiter():
+    loader = ProductTypeLoader(repository=FakeProductTypeRepository({}, fail=True))
+
+    async def run():
+        return await asyncio.gather(loader.load(uuid_pkg.uuid4()), loader.load(uuid_pkg.uuid4()), return_exceptions=True)
+
+    assert all(isinstance(result, RuntimeError) for result in asyncio.run(run()))
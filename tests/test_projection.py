@@ -0,0 +1,62 @@
+import uuid as uuid_pkg
+
+import pytest
+
+from app.r_services.projection import parse_field_selection, to_projection, output_schema_for, full_selection
+from app.r_services.services_exceptions import InvalidFieldSelectionError
+from app.schemas.product_schemas import ProductOut
+
+
+def test_no_fields_means_full_documents():
+    assert parse_field_selection(None, ProductOut) is None
+    assert to_projection(None) is None
+    assert output_schema_for(ProductOut, None) is ProductOut
+
+
+def test_selection_always_includes_required_fields():
+    selection = parse_field_selection("name, price", ProductOut)
+
+    assert selection == {"name": None, "price": None, "id": None}
+    assert to_projection(selection) == {"name": 1, "price": 1, "id": 1}
+
+
+def test_nested_paths_project_only_selected_subfields():
+    selection = parse_field_selection("product_type.name,product_type.description", ProductOut)
+
+    assert selection["product_type"] == frozenset({"name", "description"})
+    assert to_projection(selection) == {"product_type.name": 1, "product_type.description": 1, "id": 1}
+
+
+def test_whole_nested_field_wins_over_subfields():
+    selection = parse_field_selection("product_type,product_type.name", ProductOut)
+
+    assert selection["product_type"] is None
+
+
+@pytest.mark.parametrize("fields", ["colour", "product_type.colour", "price.amount"])
+def test_unknown_fields_are_rejected(fields):
+    with pytest.raises(InvalidFieldSelectionError):
+        parse_field_selection(fields, ProductOut)
+
+
+def test_trimmed_schema_serializes_only_selected_fields():
+    selection = parse_field_selection("price,product_type.name", ProductOut)
+    schema = output_schema_for(ProductOut, selection)
+    reference_id = uuid_pkg.uuid4()
+
+    item = schema.model_validate({"id": reference_id, "price": 2.5, "product_type": {"name": "bolt"}})
+
+    assert item.model_dump() == {"id": reference_id, "price": 2.5, "product_type": {"name": "bolt"}}
+    assert output_schema_for(ProductOut, selection) is schema
+
+
+def test_trimmed_schema_keeps_empty_product_type_as_empty_object():
+    schema = output_schema_for(ProductOut, parse_field_selection("product_type", ProductOut))
+
+    item = schema.model_validate({"id": uuid_pkg.uuid4(), "product_type": {}})
+
+    assert item.model_dump()["product_type"] == {}
+
+
+def test_full_selection_lists_every_output_field():
+    assert set(full_selection(ProductOut)) == set(ProductOut.model_fields)
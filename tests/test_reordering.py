@@ -0,0 +1,240 @@
+import asyncio
+from types import SimpleNamespace
+import uuid as uuid_pkg
+
+import pytest
+from pydantic import ValidationError
+
+from app.config import WorkerSettings
+from app.db_sync.db_sync_worker import DBSyncWorker
+from app.db_sync.reordering import ReorderBuffer
+from app.db_sync.tracing import MessageTrace
+from app.schemas.db_sync_schema import WorkerTypes
+from tests.helpers import product_updated
+
+
+def reorder_buffer(max_events: int = 10, timeout_s: float = 60, expired: list = None) -> ReorderBuffer:
+    async def on_expired(pending) -> None:
+        expired.append(pending)
+
+    return ReorderBuffer(max_events=max_events, timeout_s=timeout_s, on_expired=on_expired)
+
+
+def test_is_ahead_only_once_a_version_has_been_applied():
+    async def run():
+        buffer = reorder_buffer()
+        aggregate_id = uuid_pkg.uuid4()
+
+        assert not buffer.is_ahead(aggregate_id, 5)
+        buffer.applied(aggregate_id, 2)
+        assert not buffer.is_ahead(aggregate_id, 3)
+        assert buffer.is_ahead(aggregate_id, 4)
+
+    asyncio.run(run())
+
+
+def test_held_events_are_released_in_version_order():
+    async def run():
+        buffer = reorder_buffer()
+        aggregate_id = uuid_pkg.uuid4()
+        buffer.applied(aggregate_id, 1)
+        third, fourth = product_updated(aggregate_id, 3), product_updated(aggregate_id, 4)
+
+        assert buffer.hold(aggregate_id, fourth)
+        assert buffer.hold(aggregate_id, third)
+        assert len(buffer) == 2
+
+        assert buffer.applied(aggregate_id, 2) is third
+        assert buffer.applied(aggregate_id, 3) is fourth
+        assert buffer.applied(aggregate_id, 4) is None
+        assert len(buffer) == 0
+
+    asyncio.run(run())
+
+
+def test_hold_refuses_duplicates_and_events_beyond_capacity():
+    async def run():
+        buffer = reorder_buffer(max_events=2)
+        aggregate_id = uuid_pkg.uuid4()
+
+        assert buffer.hold(aggregate_id, product_updated(aggregate_id, 3))
+        assert not buffer.hold(aggregate_id, product_updated(aggregate_id, 3))
+        assert buffer.hold(aggregate_id, product_updated(aggregate_id, 4))
+        assert not buffer.hold(aggregate_id, product_updated(aggregate_id, 5))
+        assert len(buffer) == 2
+
+    asyncio.run(run())
+
+
+def test_held_events_expire_after_the_timeout():
+    async def run():
+        expired = []
+        buffer = reorder_buffer(timeout_s=0.01, expired=expired)
+        aggregate_id = uuid_pkg.uuid4()
+        pending = product_updated(aggregate_id, 3)
+        buffer.hold(aggregate_id, pending)
+
+        await asyncio.sleep(0.05)
+
+        assert expired == [pending]
+        assert len(buffer) == 0
+
+    asyncio.run(run())
+
+
+def test_expire_all_hands_every_held_event_back():
+    async def run():
+        expired = []
+        buffer = reorder_buffer(expired=expired)
+        first_id, second_id = uuid_pkg.uuid4(), uuid_pkg.uuid4()
+        held = [product_updated(first_id, 3), product_updated(first_id, 4), product_updated(second_id, 7)]
+        buffer.hold(first_id, held[0])
+        buffer.hold(first_id, held[1])
+        buffer.hold(second_id, held[2])
+
+        await buffer.expire_all()
+
+        assert sorted(expired, key=id) == sorted(held, key=id)
+        assert len(buffer) == 0
+
+    asyncio.run(run())
+
+
+class FakeMessage:
+    def __init__(self, delivery_tag: int):
+        self.delivery_tag = delivery_tag
+        self.headers = {}
+        self.channel = None
+
+    async def ack(self, multiple: bool = False) -> None:
+        pass
+
+
+class RecordingService:
+    def __init__(self):
+        self.batches = []
+
+    async def apply_batch(self, writes: list) -> list:
+        self.batches.append([(write.aggregate_id, write.final_version) for write in writes])
+        return []
+
+
+def test_batches_route_events_that_are_ahead_to_the_reorder_buffer():
+    async def run():
+        service = RecordingService()
+        worker = DBSyncWorker(
+            service=SimpleNamespace(create=None, update=None, delete=None, apply_batch=service.apply_batch),
+            aggregate_type=WorkerTypes.Product,
+            async_mq_client=None,
+            async_mongo_client=None,
+            batch_size=10,
+            reorder_buffer_size=10,
+            reorder_timeout_ms=60000
+        )
+        ahead_id, in_order_id = uuid_pkg.uuid4(), uuid_pkg.uuid4()
+        worker._reorder_buffer.applied(ahead_id, 1)
+        worker._reorder_buffer.applied(in_order_id, 1)
+        batch = [
+            product_updated(ahead_id, 3, message=FakeMessage(1)),
+            product_updated(in_order_id, 2, message=FakeMessage(2)),
+            product_updated(ahead_id, 4, message=FakeMessage(3))
+        ]
+        for pending in batch:
+            pending.trace = MessageTrace(delivery_tag=pending.message.delivery_tag, received_at=0.0)
+            worker._ack_batcher.track(pending.message)
+
+        await worker._apply_batch(batch)
+
+        assert service.batches == [[(in_order_id, 2)]]
+        assert len(worker._reorder_buffer) == 2
+        assert worker._reorder_buffer.is_ahead(ahead_id, 3)
+
+    asyncio.run(run())
+
+
+class PrefetchBroker:
+    def __init__(self, bodies: list[bytes], prefetch_count: int):
+        self._bodies = bodies
+        self._prefetch_count = prefetch_count
+        self.delivered = 0
+        self.acked_up_to = 0
+
+    def deliverable(self) -> list["BrokerMessage"]:
+        messages = []
+        while self.delivered < len(self._bodies) and self.delivered - self.acked_up_to < self._prefetch_count:
+            self.delivered += 1
+            messages.append(BrokerMessage(self, self.delivered, self._bodies[self.delivered - 1]))
+        return messages
+
+
+class BrokerMessage:
+    def __init__(self, broker: PrefetchBroker, delivery_tag: int, body: bytes):
+        self._broker = broker
+        self.delivery_tag = delivery_tag
+        self.body = body
+        self.headers = {}
+        self.timestamp = None
+        self.channel = broker
+
+    async def ack(self, multiple: bool = False) -> None:
+        assert multiple
+        self._broker.acked_up_to = max(self._broker.acked_up_to, self.delivery_tag)
+
+
+def test_gap_is_closed_by_a_delivery_after_many_completed_ones():
+    async def run():
+        async def update(payload):
+            return SimpleNamespace(id=payload.id)
+
+        worker = DBSyncWorker(
+            service=SimpleNamespace(create=None, update=update, delete=None),
+            aggregate_type=WorkerTypes.Product,
+            async_mq_client=None,
+            async_mongo_client=None,
+            ack_batch_size=1000,
+            reorder_buffer_size=32,
+            reorder_timeout_ms=60000
+        )
+        late_id = uuid_pkg.uuid4()
+        worker._reorder_buffer.applied(late_id, 1)
+        events = [product_updated(late_id, 3, price=3.0)]
+        events += [product_updated(uuid_pkg.uuid4(), 2, price=1.0) for _ in range(60)]
+        events += [product_updated(late_id, 2, price=2.0)]
+        broker = PrefetchBroker([pending.event.model_dump_json().encode() for pending in events], prefetch_count=64)
+
+        completed_before_gap = None
+        while messages := broker.deliverable():
+            for message in messages:
+                if message.delivery_tag == len(events):
+                    await worker._dispatcher.drain()
+                    await worker._ack_batcher.flush()
+                    completed_before_gap = broker.acked_up_to
+                await worker._dispatch_message(message)
+            await worker._dispatcher.drain()
+            await worker._ack_batcher.flush()
+
+        assert completed_before_gap == 0
+        assert len(worker._reorder_buffer) == 0
+        assert broker.acked_up_to == len(events)
+
+    asyncio.run(run())
+
+
+def test_prefetch_must_leave_room_beyond_held_events(monkeypatch):
+    for name, value in {
+        "RABBIT_MQ_EXCHANGE_NAME": "sync",
+        "RABBIT_MQ_EXCHANGE_NAME_DLX": "sync_dlx",
+        "RABBIT_MQ_HOST": "localhost",
+        "RABBIT_MQ_PORT": "5672",
+        "RABBIT_MQ_USER": "user",
+        "RABBIT_MQ_PASSWORD": "password",
+        "MONGO_DB_CONNECTION_STRING": "mongodb://localhost",
+        "REORDER_BUFFER_SIZE": "32"
+    }.items():
+        monkeypatch.setenv(name, value)
+
+    monkeypatch.setenv("RABBIT_MQ_PREFETCH_COUNT", "64")
+    assert WorkerSettings().prefetch_count == 64
+    monkeypatch.setenv("RABBIT_MQ_PREFETCH_COUNT", "40")
+    with pytest.raises(ValidationError, match="REORDER_BUFFER_SIZE"):
+        WorkerSettings()
@@ -0,0 +1,163 @@
+import asyncio
+import logging
+from types import SimpleNamespace
+import uuid as uuid_pkg
+
+import pytest
+
+from app.db_sync import db_sync_worker
+from app.db_sync.db_sync_worker import DBSyncWorker
+from app.db_sync.exceptions import MQPublishException
+from app.db_sync.mq_client import AsyncMQClient, ExchangeType, QueueOverflow
+from app.db_sync.retries import RETRY_COUNT_HEADER, PARKING_LOT_SUFFIX, parse_retry_delays, retry_count, \
+    with_retry_count
+from app.db_sync.tracing import MessageTrace
+from app.schemas.db_sync_schema import WorkerTypes
+from tests.helpers import product_updated
+
+
+def test_parse_retry_delays():
+    assert parse_retry_delays("100, 1000,,60000") == [100, 1000, 60000]
+
+
+@pytest.mark.parametrize("spec", ["", ",", "100,0", "100,-5"])
+def test_parse_retry_delays_rejects_empty_or_non_positive_delays(spec):
+    with pytest.raises(ValueError):
+        parse_retry_delays(spec)
+
+
+@pytest.mark.parametrize("headers, expected", [
+    (None, 0),
+    ({}, 0),
+    ({RETRY_COUNT_HEADER: 3}, 3),
+    ({RETRY_COUNT_HEADER: "2"}, 2),
+    ({RETRY_COUNT_HEADER: "many"}, 0),
+    ({RETRY_COUNT_HEADER: -1}, 0)
+])
+def test_retry_count(headers, expected):
+    assert retry_count(headers) == expected
+
+
+def test_with_retry_count_keeps_other_headers():
+    headers = {"x-partition-key": "abc", RETRY_COUNT_HEADER: 1}
+
+    assert with_retry_count(headers, 2) == {"x-partition-key": "abc", RETRY_COUNT_HEADER: 2}
+    assert headers[RETRY_COUNT_HEADER] == 1
+
+
+def test_retry_tiers_route_to_delay_queues_then_the_parking_lot():
+    client = AsyncMQClient(
+        exchange_type=ExchangeType.DIRECT,
+        exchange_name="sync",
+        routing_key="product",
+        host="localhost",
+        port=5672,
+        user="user",
+        password="password",
+        exchange_name_dlx="sync_dlx",
+        routing_key_dlx="product_dlx",
+        retry_delays_ms=[100, 1000]
+    )
+
+    assert client.retry_tiers == 2
+    assert [client._retry_routing_key(tier) for tier in range(4)] == [
+        "product_dlx.t0",
+        "product_dlx.t1",
+        f"product_dlx.{PARKING_LOT_SUFFIX}",
+        f"product_dlx.{PARKING_LOT_SUFFIX}"
+    ]
+
+
+class RejectingMQClient:
+    retry_tiers = 2
+
+    def __init__(self):
+        self.published = []
+
+    async def publish_pipelined(self, msg, dead_letter_queue=False, headers=None, retry_tier=0) -> asyncio.Task:
+        self.published.append((headers, retry_tier))
+
+        async def rejected() -> None:
+            raise MQPublishException("Broker did not confirm publish")
+
+        return asyncio.create_task(rejected())
+
+
+class FakeMessage:
+    def __init__(self, retries: int):
+        self.body = b"{}"
+        self.headers = {RETRY_COUNT_HEADER: retries}
+        self.delivery_tag = 1
+        self.channel = None
+        self.acked = False
+        self.requeued = False
+
+    async def ack(self, multiple: bool = False) -> None:
+        self.acked = True
+
+    async def nack(self, requeue: bool = True) -> None:
+        self.requeued = requeue
+
+
+async def dead_letter_rejected(retries: int) -> tuple[FakeMessage, RejectingMQClient]:
+    mq_client = RejectingMQClient()
+    worker = DBSyncWorker(
+        service=SimpleNamespace(create=None, update=None, delete=None),
+        aggregate_type=WorkerTypes.Product,
+        async_mq_client=mq_client,
+        async_mongo_client=None
+    )
+    message = FakeMessage(retries=retries)
+    pending = product_updated(uuid_pkg.uuid4(), version=2, message=message)
+    pending.trace = MessageTrace(delivery_tag=message.delivery_tag, received_at=0.0)
+    worker._ack_batcher.track(message)
+
+    await worker._dead_letter(pending)
+    await asyncio.gather(*worker._settling)
+    await worker._ack_batcher.flush()
+    return message, mq_client
+
+
+def test_rejected_retry_publish_requeues_the_message():
+    async def run():
+        with pytest.warns(UserWarning, match="requeueing"):
+            message, mq_client = await dead_letter_rejected(retries=0)
+
+        assert mq_client.published == [({RETRY_COUNT_HEADER: 1}, 0)]
+        assert message.requeued is True
+        assert message.acked is False
+
+    asyncio.run(run())
+
+
+def test_rejected_parking_publish_alerts_and_requeues_after_a_delay(monkeypatch, caplog):
+    monkeypatch.setattr(db_sync_worker, "PARKING_REJECTED_REQUEUE_DELAY_S", 0)
+
+    async def run():
+        with pytest.warns(UserWarning, match="requeueing"):
+            message, mq_client = await dead_letter_rejected(retries=2)
+
+        assert mq_client.published == [({RETRY_COUNT_HEADER: 3}, 2)]
+        assert message.requeued is True
+        assert message.acked is False
+
+    with caplog.at_level(logging.ERROR, logger="app.db_sync.parking_lot"):
+        asyncio.run(run())
+    assert "Parking lot rejected" in caplog.text
+
+
+def test_parking_lot_is_not_capped_by_the_main_queue_limit():
+    client = AsyncMQClient(
+        exchange_type=ExchangeType.DIRECT,
+        exchange_name="sync",
+        routing_key="product",
+        host="localhost",
+        port=5672,
+        user="user",
+        password="password",
+        queue_max_length=1000,
+        queue_overflow=QueueOverflow.REJECT_PUBLISH
+    )
+
+    assert client._queue_arguments({})["x-max-length"] == 1000
+    assert client._parking_lot_arguments() == {"x-queue-type": "classic"}
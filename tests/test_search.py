@@ -0,0 +1,125 @@
+import asyncio
+from types import SimpleNamespace
+import uuid as uuid_pkg
+
+import pytest
+from pydantic import BaseModel
+from pymongo.errors import BulkWriteError
+
+from app.r_services.base import BaseService
+from app.r_services.filter_builder import MongoCriteriaFilterBuilder
+from app.r_services.pagination import encode_cursor, decode_cursor
+from app.r_services.product_service import ProductService
+from app.r_services.search_prefixes import MAX_PREFIX_LENGTH, MAX_QUERY_TERMS, label_prefixes, query_prefixes, \
+    text_matches
+from app.r_services.services_exceptions import InvalidSearchError, InvalidCursorError
+from app.repositories.base import TEXT_SCORE_FIELD
+from app.repositories.repositories_exceptions import DatabaseOperationError
+from app.repositories.search_prefix_repository import SearchPrefixRepository, IndexedLabel, DUPLICATE_KEY_ERROR_CODE
+from app.schemas.product_schemas import ProductFetch
+
+
+def test_label_prefixes_fold_accents_and_case():
+    prefixes = label_prefixes("Café CRÈME")
+
+    assert "cafe" in prefixes
+    assert "creme" in prefixes
+    assert "c" in prefixes
+    assert all(prefix == prefix.casefold() for prefix in prefixes)
+
+
+def test_label_prefixes_casefold_beyond_lowercase():
+    assert "strasse" in label_prefixes("Straße")
+
+
+def test_label_prefixes_are_capped_at_the_max_length():
+    prefixes = label_prefixes("a" * 30)
+
+    assert max(len(prefix) for prefix in prefixes) == MAX_PREFIX_LENGTH
+    assert len(prefixes) == MAX_PREFIX_LENGTH
+
+
+def test_query_prefixes_dedupe_truncate_and_cap_terms():
+    long_term = "x" * 30
+
+    assert query_prefixes(f"Bolt bolt BÖLT {long_term}") == ["bolt", "x" * MAX_PREFIX_LENGTH]
+    assert len(query_prefixes("a b c d e f g")) == MAX_QUERY_TERMS
+
+
+def test_text_matches_on_term_prefixes():
+    assert text_matches(search="cre", text="Café Crème")
+    assert not text_matches(search="reme", text="Café Crème")
+
+
+def test_score_cursor_round_trip():
+    reference_id = uuid_pkg.uuid4()
+    cursor = encode_cursor(sort_field=TEXT_SCORE_FIELD, sort_value=1.375, reference_id=reference_id)
+
+    assert decode_cursor(cursor, sort_field=TEXT_SCORE_FIELD) == (1.375, reference_id)
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor, sort_field="price")
+
+
+def test_relevance_sort_without_a_text_term_is_rejected():
+    with pytest.raises(InvalidSearchError):
+        BaseService._add_pagination(MongoCriteriaFilterBuilder(), ProductFetch(sort_by="relevance"))
+
+
+def test_relevance_cursor_seeks_on_score_and_id():
+    last_id = uuid_pkg.uuid4()
+    builder = MongoCriteriaFilterBuilder()
+    builder.add_text_search("bolt")
+
+    BaseService._add_pagination(builder, ProductFetch(
+        name="bolt",
+        sort_by="relevance",
+        after=encode_cursor(sort_field=TEXT_SCORE_FIELD, sort_value=2.0, reference_id=last_id)
+    ))
+
+    assert builder.build().ranked_keyset == {
+        "$or": [{TEXT_SCORE_FIELD: {"$lt": 2.0}}, {TEXT_SCORE_FIELD: 2.0, "_id": {"$gt": last_id}}]
+    }
+
+
+class Item(BaseModel):
+    id: uuid_pkg.UUID
+    name: str
+
+
+def test_relevance_page_cursor_carries_the_last_items_score():
+    documents = [
+        {"id": uuid_pkg.uuid4(), "name": f"bolt {score}", TEXT_SCORE_FIELD: score}
+        for score in (3.0, 2.5, 1.0)
+    ]
+    service = ProductService(repository=None)
+
+    page = service._build_page(documents, ProductFetch(name="bolt", sort_by="relevance", limit=2), Item)
+
+    assert [item.name for item in page.items] == ["bolt 3.0", "bolt 2.5"]
+    assert decode_cursor(page.next_cursor, sort_field=TEXT_SCORE_FIELD) == (2.5, documents[1]["id"])
+
+
+class FakePrefixCollection:
+    def __init__(self, error_code: int):
+        self.error_code = error_code
+
+    async def bulk_write(self, requests: list, ordered: bool) -> None:
+        raise BulkWriteError({"writeErrors": [{"code": self.error_code, "errmsg": "write failed"}]})
+
+
+def sync_labels(error_code: int) -> None:
+    repository = SearchPrefixRepository()
+    collection = FakePrefixCollection(error_code)
+    repository._model = SimpleNamespace(get_pymongo_collection=lambda: collection)
+    asyncio.run(repository.sync(aggregate_type="product", labels=[
+        IndexedLabel(entity_id=uuid_pkg.uuid4(), label="Bolt", prefixes=label_prefixes("Bolt"), entity_version=2)
+    ]))
+
+
+def test_prefix_sync_ignores_duplicate_upserts_from_older_versions():
+    sync_labels(DUPLICATE_KEY_ERROR_CODE)
+
+
+def test_prefix_sync_surfaces_other_write_errors():
+    with pytest.raises(DatabaseOperationError):
+        sync_labels(121)
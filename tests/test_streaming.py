@@ -0,0 +1,49 @@
+import asyncio
+import json
+
+from pydantic import BaseModel
+
+from app.r_services.services_exceptions import DBException
+from app.streaming import ndjson_chunks, json_array_chunks
+
+
+class Item(BaseModel):
+    value: int
+
+
+async def items(count: int, fail: bool = False):
+    for value in range(count):
+        yield Item(value=value)
+    if fail:
+        raise DBException("cursor lost")
+
+
+def collect(chunks) -> bytes:
+    async def run():
+        return b"".join([chunk async for chunk in chunks])
+    return asyncio.run(run())
+
+
+def test_ndjson_batches_items():
+    body = collect(ndjson_chunks(items(5), batch_size=2))
+
+    assert [json.loads(line) for line in body.splitlines()] == [{"value": value} for value in range(5)]
+
+
+def test_ndjson_ends_with_error_record_on_database_error():
+    body = collect(ndjson_chunks(items(3, fail=True), batch_size=2))
+
+    lines = [json.loads(line) for line in body.splitlines()]
+    assert lines[:3] == [{"value": value} for value in range(3)]
+    assert lines[3] == {"error": "cursor lost"}
+
+
+def test_json_array_is_valid_when_empty():
+    assert json.loads(collect(json_array_chunks(items(0), batch_size=2))) == []
+
+
+def test_json_array_stays_valid_and_ends_with_error_on_database_error():
+    body = json.loads(collect(json_array_chunks(items(3, fail=True), batch_size=2)))
+
+    assert body[:3] == [{"value": value} for value in range(3)]
+    assert body[3] == {"error": "cursor lost"}
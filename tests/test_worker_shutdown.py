@@ -0,0 +1,80 @@
+import asyncio
+from types import SimpleNamespace
+
+from app.db_sync import db_sync_worker
+from app.db_sync.db_sync_worker import DBSyncWorker
+from app.schemas.db_sync_schema import WorkerTypes
+
+
+class RecordingMQClient:
+    retry_tiers = 0
+
+    def __init__(self, name: str, calls: list[str]):
+        self._name = name
+        self._calls = calls
+        self._stopped = asyncio.Event()
+
+    async def connect(self) -> None:
+        pass
+
+    async def consume_data(self, callback_fn) -> None:
+        await self._stopped.wait()
+
+    async def stop_consuming(self) -> None:
+        self._calls.append(f"{self._name}.stop_consuming")
+
+    async def wait_for_publishes(self) -> None:
+        await asyncio.sleep(0)
+        self._calls.append(f"{self._name}.wait_for_publishes")
+
+    async def disconnect(self) -> None:
+        self._calls.append(f"{self._name}.disconnect")
+        self._stopped.set()
+
+
+class RecordingMongoClient:
+    def __init__(self, calls: list[str]):
+        self._calls = calls
+        self.db_client = SimpleNamespace(get_database=lambda: None)
+
+    async def warm_up(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        await asyncio.sleep(0)
+        self._calls.append("mongo.close")
+
+
+def test_sync_db_returns_only_after_shutdown_has_drained_and_closed_everything(monkeypatch):
+    async def no_beanie(**kwargs) -> None:
+        pass
+
+    monkeypatch.setattr(db_sync_worker, "init_beanie", no_beanie)
+
+    async def run():
+        calls = []
+        worker = DBSyncWorker(
+            service=SimpleNamespace(create=None, update=None, delete=None),
+            aggregate_type=WorkerTypes.ProductType,
+            async_mq_client=RecordingMQClient("events", calls),
+            async_mongo_client=RecordingMongoClient(calls),
+            change_publisher=db_sync_worker.EntityChangePublisher(RecordingMQClient("changes", calls))
+        )
+        consuming = asyncio.create_task(worker.sync_db())
+        await asyncio.sleep(0)
+
+        shutdown = asyncio.create_task(worker.handle_shutdown_signal("SIGTERM"))
+        await consuming
+        calls.append("sync_db returned")
+        await shutdown
+
+        assert calls == [
+            "events.stop_consuming",
+            "changes.wait_for_publishes",
+            "changes.disconnect",
+            "events.disconnect",
+            "mongo.close",
+            "sync_db returned"
+        ]
+
+    asyncio.run(run())